@@ -5,11 +5,14 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from . import schemas, database
+from sqlalchemy.orm.attributes import set_committed_value
+from . import schemas, database, geoip, workers
+from .cache import TTLCache
+from .session_activity import SessionActivityBuffer, SESSION_IDLE_TIMEOUT
 import os
 import json
+import logging
 import secrets
-import requests
 from dotenv import load_dotenv
 
 # Carrega variáveis de ambiente
@@ -20,9 +23,35 @@ SECRET_KEY = os.getenv("SECRET_KEY", "sua-chave-secreta-muito-segura-aqui-123456
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Cache de sessões autenticadas (por processo)
+SESSION_CACHE_TTL_SECONDS = int(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+SESSION_CACHE_MAXSIZE = int(os.getenv("SESSION_CACHE_MAXSIZE", "1024"))
+
+# Gravação em lote da atividade das sessões
+SESSION_ACTIVITY_FLUSH_SECONDS = float(os.getenv("SESSION_ACTIVITY_FLUSH_SECONDS", "30"))
+SESSION_ACTIVITY_FLUSH_MAX = int(os.getenv("SESSION_ACTIVITY_FLUSH_MAX", "500"))
+
+# Limpeza periódica de sessões
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "300"))
+SESSION_RETENTION_DAYS = int(os.getenv("SESSION_RETENTION_DAYS", "30"))
+SESSION_PURGE_BATCH = int(os.getenv("SESSION_PURGE_BATCH", "1000"))
+
+logger = logging.getLogger(__name__)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# session_token -> {"usuario": dados do usuário, "usuario_id": id, "expires_at": expiração}
+# Cada processo tem seu próprio cache; o TTL limita por quanto tempo uma sessão
+# invalidada em outro worker ainda pode ser aceita aqui.
+session_cache = TTLCache(maxsize=SESSION_CACHE_MAXSIZE, ttl=SESSION_CACHE_TTL_SECONDS)
+
+# Renovações de last_activity/expires_at aguardando gravação em lote
+activity_buffer = SessionActivityBuffer(
+    flush_interval=SESSION_ACTIVITY_FLUSH_SECONDS,
+    max_pending=SESSION_ACTIVITY_FLUSH_MAX
+)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -67,25 +96,57 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    user = get_user(db, username=token_data.username)
+    # Sessão já validada recentemente: responde sem consultar o banco
+    cached = session_cache.get(session_token)
+    if cached is not None:
+        if cached["usuario"]["username"] == token_data.username and cached["expires_at"] > datetime.utcnow():
+            # Renova a expiração no buffer; a gravação acontece em lote
+            cached["expires_at"] = activity_buffer.touch(session_token)
+            if activity_buffer.should_flush():
+                await workers.run_db_work(flush_session_activity_if_due)
+            return database.Usuario(**cached["usuario"])
+        session_cache.pop(session_token)
+    
+    # Consulta ao banco fora do event loop
+    user = await workers.run_db_work(load_session_user, db, token_data.username, session_token)
     if user is None:
         raise credentials_exception
     
-    # Verifica se a sessão específica do token ainda está ativa
-    active_session = db.query(database.UserSession).filter(
-        database.UserSession.usuario_id == user.id,
+    return user
+
+def load_session_user(db: Session, username: str, session_token: str):
+    """Valida a sessão no banco, renova sua atividade e a coloca no cache; retorna o usuário ou None"""
+    # Verifica usuário e sessão específica do token em uma única consulta
+    row = db.query(database.Usuario, database.UserSession.expires_at).join(
+        database.UserSession, database.UserSession.usuario_id == database.Usuario.id
+    ).filter(
+        database.Usuario.username == username,
         database.UserSession.session_token == session_token,
-        database.UserSession.is_active == True,
-        database.UserSession.expires_at > datetime.utcnow()
+        database.UserSession.is_active == True
     ).first()
     
-    if not active_session:
-        # Limpa sessões expiradas
-        cleanup_expired_sessions(db)
-        raise credentials_exception
+    # A expiração efetiva considera renovações ainda não gravadas no banco
+    if row is not None:
+        pending_expiry = activity_buffer.pending_expiry(session_token)
+        expires_at = max(row[1], pending_expiry) if pending_expiry else row[1]
+    
+    if row is None or expires_at <= datetime.utcnow():
+        # Sessões expiradas são desativadas pela tarefa periódica (sweep_sessions)
+        return None
+    
+    user = row[0]
+    usuario = {
+        "id": user.id,
+        "username": user.username,
+        "nome_completo": user.nome_completo,
+        "created_at": user.created_at
+    }
     
     # Atualiza atividade da sessão (renova expiração automaticamente)
-    update_session_activity(db, active_session.session_token)
+    expires_at = activity_buffer.touch(session_token)
+    flush_session_activity_if_due()
+    
+    session_cache.set(session_token, {"usuario": usuario, "usuario_id": usuario["id"], "expires_at": expires_at})
     
     return user
 
@@ -139,20 +200,20 @@ def get_device_info(request: Request) -> dict:
     return device_info
 
 def get_location_from_ip(ip_address: str) -> str:
-    """Obtém localização aproximada a partir do IP"""
+    """Obtém localização aproximada a partir do IP (resolvedor configurado em geoip)"""
+    return geoip.resolve_location(ip_address)
+
+def update_session_location(session_id: int, ip_address: str):
+    """Preenche a localização da sessão; executado em segundo plano após o login"""
+    location = get_location_from_ip(ip_address)
+    db = database.SessionLocal()
     try:
-        # Usando um serviço gratuito de geolocalização
-        response = requests.get(f"http://ip-api.com/json/{ip_address}", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("status") == "success":
-                city = data.get("city", "")
-                region = data.get("regionName", "")
-                country = data.get("country", "")
-                return f"{city}, {region}, {country}"
-    except:
-        pass
-    return "Localização não disponível"
+        db.query(database.UserSession).filter(
+            database.UserSession.id == session_id
+        ).update({"location": location}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
 
 def create_user_session(db: Session, usuario_id: int, request: Request) -> database.UserSession:
     """Cria uma nova sessão de usuário com informações detalhadas"""
@@ -168,11 +229,8 @@ def create_user_session(db: Session, usuario_id: int, request: Request) -> datab
     # Obtém informações do dispositivo
     device_info = get_device_info(request)
     
-    # Obtém localização (opcional)
-    location = get_location_from_ip(ip_address)
-    
     # Define expiração da sessão (2 horas de inatividade)
-    expires_at = datetime.utcnow() + timedelta(hours=2)
+    expires_at = datetime.utcnow() + SESSION_IDLE_TIMEOUT
     
     # Cria a sessão no banco
     db_session = database.UserSession(
@@ -181,7 +239,7 @@ def create_user_session(db: Session, usuario_id: int, request: Request) -> datab
         ip_address=ip_address,
         user_agent=request.headers.get("user-agent", ""),
         device_info=json.dumps(device_info),
-        location=location,
+        location=None,  # Preenchida depois por update_session_location
         expires_at=expires_at
     )
     
@@ -191,22 +249,22 @@ def create_user_session(db: Session, usuario_id: int, request: Request) -> datab
     
     return db_session
 
-def update_session_activity(db: Session, session_token: str):
-    """Atualiza a última atividade da sessão e renova expiração"""
-    session = db.query(database.UserSession).filter(
-        database.UserSession.session_token == session_token,
-        database.UserSession.is_active == True
-    ).first()
-    
-    if session:
-        now = datetime.utcnow()
-        session.last_activity = now
-        # Renova expiração para mais 2 horas a partir da atividade atual
-        session.expires_at = now + timedelta(hours=2)
-        db.commit()
+def flush_session_activity_if_due():
+    """Grava as renovações pendentes se o intervalo ou o limite de tokens foi atingido"""
+    if not activity_buffer.should_flush():
+        return
+    try:
+        activity_buffer.flush()
+    except Exception:
+        # A falha já foi registrada e as renovações voltaram ao buffer: a tarefa
+        # periódica tenta de novo, sem derrubar a requisição que disparou o flush
+        pass
 
 def invalidate_user_session(db: Session, session_token: str):
     """Invalida uma sessão específica"""
+    session_cache.pop(session_token)
+    activity_buffer.discard(session_token)
+    
     session = db.query(database.UserSession).filter(
         database.UserSession.session_token == session_token
     ).first()
@@ -217,6 +275,10 @@ def invalidate_user_session(db: Session, session_token: str):
 
 def invalidate_all_user_sessions(db: Session, usuario_id: int, except_token: str = None):
     """Invalida todas as sessões de um usuário, exceto uma específica"""
+    session_cache.discard_where(
+        lambda token, cached: cached["usuario_id"] == usuario_id and token != except_token
+    )
+    
     query = db.query(database.UserSession).filter(
         database.UserSession.usuario_id == usuario_id,
         database.UserSession.is_active == True
@@ -231,23 +293,64 @@ def invalidate_all_user_sessions(db: Session, usuario_id: int, except_token: str
     
     db.commit()
 
-def cleanup_expired_sessions(db: Session):
-    """Remove sessões expiradas"""
-    expired_sessions = db.query(database.UserSession).filter(
-        database.UserSession.expires_at < datetime.utcnow()
-    ).all()
+def cleanup_expired_sessions(db: Session) -> int:
+    """Desativa sessões expiradas em um único UPDATE e retorna quantas foram desativadas"""
+    # Grava renovações pendentes antes, para não expirar sessões ainda em uso
+    activity_buffer.flush()
+    now = datetime.utcnow()
+    session_cache.discard_where(lambda token, cached: cached["expires_at"] < now)
     
-    for session in expired_sessions:
-        session.is_active = False
+    deactivated = db.query(database.UserSession).filter(
+        database.UserSession.is_active == True,
+        database.UserSession.expires_at < now
+    ).update({"is_active": False}, synchronize_session=False)
     
     db.commit()
+    return deactivated
+
+def purge_inactive_sessions(db: Session, older_than: datetime, batch_size: int = SESSION_PURGE_BATCH) -> int:
+    """Apaga sessões inativas expiradas antes de `older_than`, em lotes de `batch_size` linhas"""
+    purged = 0
+    while True:
+        ids = db.query(database.UserSession.id).filter(
+            database.UserSession.is_active == False,
+            database.UserSession.expires_at < older_than
+        ).limit(batch_size).subquery()
+        deleted = db.query(database.UserSession).filter(
+            database.UserSession.id.in_(ids.select())
+        ).delete(synchronize_session=False)
+        # Uma transação curta por lote, para não segurar o lock de escrita
+        db.commit()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+
+def sweep_sessions() -> dict:
+    """Tarefa periódica: desativa sessões expiradas e apaga as inativas antigas"""
+    db = database.SessionLocal()
+    try:
+        deactivated = cleanup_expired_sessions(db)
+        purged = purge_inactive_sessions(db, datetime.utcnow() - timedelta(days=SESSION_RETENTION_DAYS))
+    finally:
+        db.close()
+    logger.info("Limpeza de sessões: %d desativada(s), %d apagada(s)", deactivated, purged)
+    return {"desativadas": deactivated, "apagadas": purged}
 
 def get_user_sessions(db: Session, usuario_id: int) -> list:
-    """Obtém todas as sessões ativas de um usuário"""
+    """Obtém todas as sessões ativas de um usuário, com a atividade ainda no buffer"""
     sessions = db.query(database.UserSession).filter(
         database.UserSession.usuario_id == usuario_id,
-        database.UserSession.is_active == True,
-        database.UserSession.expires_at > datetime.utcnow()
-    ).order_by(database.UserSession.last_activity.desc()).all()
+        database.UserSession.is_active == True
+    ).all()
+    
+    # Renovações ainda não gravadas valem como gravadas, sem marcar a sessão como alterada
+    for session in sessions:
+        pending = activity_buffer.pending_activity(session.session_token)
+        if pending and pending[1] > session.expires_at:
+            set_committed_value(session, "last_activity", pending[0])
+            set_committed_value(session, "expires_at", pending[1])
     
-    return sessions
\ No newline at end of file
+    now = datetime.utcnow()
+    sessions = [session for session in sessions if session.expires_at > now]
+    sessions.sort(key=lambda session: session.last_activity, reverse=True)
+    return sessions
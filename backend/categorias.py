@@ -0,0 +1,202 @@
+from sqlalchemy import and_, event, inspect, or_, select, update
+from sqlalchemy.orm import Session
+import logging
+import os
+import time
+
+from . import database, rollup
+
+logger = logging.getLogger(__name__)
+
+# Linhas por transação na migração dos ids (cada lote é confirmado separadamente)
+MIGRACAO_CATEGORIAS_LOTE = int(os.getenv("MIGRACAO_CATEGORIAS_LOTE", "1000"))
+
+# Lançamentos que apontam para os cadastros: modelo -> [(coluna do nome, coluna do id, cadastro)]
+# O nome continua gravado (API e histórico); filtros, agrupamentos e dependências usam o id.
+REFERENCIAS = {
+    database.ContaPagar: [("categoria", "categoria_id", database.CategoriaPagar)],
+    database.ContaReceber: [
+        ("categoria", "categoria_id", database.CategoriaReceber),
+        ("origem", "origem_receber_id", database.OrigemReceber),
+    ],
+}
+
+def _referencia(modelo, coluna_nome: str):
+    for referencia in REFERENCIAS[modelo]:
+        if referencia[0] == coluna_nome:
+            return referencia
+    raise KeyError(f"{modelo.__name__}.{coluna_nome} não referencia um cadastro")
+
+def ids_por_nome(db: Session, cadastro, nomes) -> dict:
+    """{nome: id} dos nomes que existem no cadastro"""
+    nomes = {nome for nome in nomes if nome}
+    if not nomes:
+        return {}
+    return dict(db.execute(select(cadastro.nome, cadastro.id).where(cadastro.nome.in_(nomes))).all())
+
+def nomes_por_id(db: Session, cadastro, ids) -> dict:
+    """{id: nome atual} dos ids informados"""
+    ids = {id_ for id_ in ids if id_ is not None}
+    if not ids:
+        return {}
+    return dict(db.execute(select(cadastro.id, cadastro.nome).where(cadastro.id.in_(ids))).all())
+
+def preencher_ids(db: Session, modelo, linhas: list) -> list:
+    """Completa o id do cadastro nas linhas (dicionários de colunas) que trazem o nome sem o id"""
+    for coluna_nome, coluna_id, cadastro in REFERENCIAS[modelo]:
+        pendentes = [linha for linha in linhas if coluna_nome in linha and linha.get(coluna_id) is None]
+        ids = ids_por_nome(db, cadastro, (linha[coluna_nome] for linha in pendentes))
+        for linha in pendentes:
+            linha[coluna_id] = ids.get(linha[coluna_nome])
+    return linhas
+
+def atualizar_nomes(db: Session, modelo, linhas: list) -> list:
+    """Troca o nome gravado nas linhas pelo nome atual do cadastro (para linhas com id)"""
+    for coluna_nome, coluna_id, cadastro in REFERENCIAS[modelo]:
+        nomes = nomes_por_id(db, cadastro, (linha.get(coluna_id) for linha in linhas))
+        for linha in linhas:
+            if linha.get(coluna_id) in nomes:
+                linha[coluna_nome] = nomes[linha[coluna_id]]
+    return linhas
+
+def resolver(db: Session, modelo, coluna_nome: str, nomes=(), ids=()):
+    """(ids, nomes) de um filtro que pode vir por nome ou por id, completados um pelo outro"""
+    _, _, cadastro = _referencia(modelo, coluna_nome)
+    ids = set(ids or ()) | set(ids_por_nome(db, cadastro, nomes or ()).values())
+    nomes = set(nomes or ()) | set(nomes_por_id(db, cadastro, ids).values())
+    return ids, nomes
+
+def condicao(modelo, coluna_nome: str, ids, nomes):
+    """
+    Lançamentos que referenciam um dos cadastros: pelo id e, nas linhas ainda sem id (antes
+    da migração ou com nome fora do cadastro), pelo nome gravado.
+    """
+    _, coluna_id, _ = _referencia(modelo, coluna_nome)
+    coluna = getattr(modelo, coluna_id)
+    return or_(coluna.in_(ids), and_(coluna.is_(None), getattr(modelo, coluna_nome).in_(nomes)))
+
+def atende(modelo, coluna_nome: str, linha: dict, ids, nomes) -> bool:
+    """Mesma regra de `condicao` para linhas em memória (parcelas virtuais)"""
+    _, coluna_id, _ = _referencia(modelo, coluna_nome)
+    if linha.get(coluna_id) is not None:
+        return linha[coluna_id] in ids
+    return linha.get(coluna_nome) in nomes
+
+def _antes_do_flush(session, flush_context, instances):
+    """Preenche o id do cadastro nos lançamentos novos sem id e nos que tiveram o nome alterado"""
+    cache = {}
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty):
+            referencias = REFERENCIAS.get(type(obj))
+            if not referencias:
+                continue
+            estado = inspect(obj)
+            for coluna_nome, coluna_id, cadastro in referencias:
+                if obj in session.new:
+                    pendente = getattr(obj, coluna_id) is None
+                else:
+                    pendente = (estado.attrs[coluna_nome].history.has_changes()
+                                and not estado.attrs[coluna_id].history.has_changes())
+                if not pendente:
+                    continue
+                nome = getattr(obj, coluna_nome)
+                chave = (cadastro, nome)
+                if chave not in cache:
+                    cache[chave] = ids_por_nome(session, cadastro, [nome]).get(nome)
+                setattr(obj, coluna_id, cache[chave])
+
+def acompanhar(fabrica_sessoes):
+    """Mantém os ids dos cadastros nas sessões criadas por `fabrica_sessoes` (sessionmaker)"""
+    # Antes dos outros ouvintes: o resumo mensal (backend/rollup.py) agrupa pelo id
+    event.listen(fabrica_sessoes, "before_flush", _antes_do_flush, insert=True)
+
+acompanhar(database.SessionLocal)
+
+# Migração: preenche os ids das linhas gravadas antes das colunas existirem
+
+def pendentes(db: Session) -> dict:
+    """Quantidade de linhas com nome (não vazio) e sem id, por "tabela.coluna" """
+    resultado = {}
+    for modelo, referencias in REFERENCIAS.items():
+        for coluna_nome, coluna_id, _ in referencias:
+            resultado[f"{modelo.__tablename__}.{coluna_id}"] = db.query(modelo.id).filter(
+                getattr(modelo, coluna_id).is_(None), getattr(modelo, coluna_nome).isnot(None),
+                getattr(modelo, coluna_nome) != "",
+            ).count()
+    return resultado
+
+def cadastrar_ausentes(db: Session) -> int:
+    """
+    Cadastra (inativos) os nomes usados nos lançamentos que não existem no cadastro, para que
+    toda linha tenha um id. Inativos não aparecem nas listas de seleção, como antes.
+    """
+    criados = 0
+    for modelo, referencias in REFERENCIAS.items():
+        for coluna_nome, _, cadastro in referencias:
+            coluna = getattr(modelo, coluna_nome)
+            nomes = db.execute(
+                select(coluna).distinct().where(coluna.isnot(None), coluna != "", coluna.notin_(select(cadastro.nome)))
+            ).scalars().all()
+            for nome in nomes:
+                db.add(cadastro(nome=nome, descricao="Cadastrado na migração dos lançamentos", ativo=False))
+            criados += len(nomes)
+    db.commit()
+    return criados
+
+def migrar_coluna(db: Session, modelo, coluna_nome: str, lote: int = MIGRACAO_CATEGORIAS_LOTE, pausa: float = 0.0) -> int:
+    """
+    Preenche o id a partir do nome em lotes de `lote` linhas, cada um em sua própria transação
+    curta (as escritas da aplicação esperam no máximo um lote). Percorre a tabela pela chave
+    primária e retorna quantas linhas foram preenchidas.
+    """
+    _, coluna_id, cadastro = _referencia(modelo, coluna_nome)
+    nome = getattr(modelo, coluna_nome)
+    id_cadastro = getattr(modelo, coluna_id)
+    subconsulta = select(cadastro.id).where(cadastro.nome == nome).scalar_subquery()
+    # O resumo mensal agrupa pelo categoria_id
+    tipo = rollup.TIPO_POR_MODELO.get(modelo)
+    resumo = tipo is not None and coluna_id == "categoria_id"
+    ultimo, preenchidas = 0, 0
+    while True:
+        ids = db.execute(
+            select(modelo.id)
+            .where(modelo.id > ultimo, id_cadastro.is_(None), nome.isnot(None))
+            .order_by(modelo.id)
+            .limit(lote)
+        ).scalars().all()
+        if not ids:
+            return preenchidas
+        # O nome é lido de novo no UPDATE: vale a versão atual da linha, mesmo se editada no meio
+        atualizacao = (
+            update(modelo)
+            .where(modelo.id.in_(ids), id_cadastro.is_(None), nome.in_(select(cadastro.nome)))
+            .values({coluna_id: subconsulta})
+            .execution_options(synchronize_session=False)
+        )
+        if resumo:
+            # As linhas preenchidas mudam de chave no resumo mensal, na mesma transação
+            _, coluna_data, _ = rollup.ORIGENS[tipo]
+            linhas = [dict(linha._mapping) for linha in db.execute(atualizacao.returning(
+                getattr(modelo, coluna_data), modelo.conta_id, id_cadastro, nome, modelo.status, modelo.valor,
+            ))]
+            rollup.registrar_lancamentos(db.connection(), tipo, [{**linha, coluna_id: None} for linha in linhas], sinal=-1)
+            rollup.registrar_lancamentos(db.connection(), tipo, linhas)
+            atualizadas = len(linhas)
+        else:
+            atualizadas = db.execute(atualizacao).rowcount
+        db.commit()
+        preenchidas += atualizadas
+        ultimo = ids[-1]
+        if pausa:
+            time.sleep(pausa)
+
+def migrar(db: Session, lote: int = MIGRACAO_CATEGORIAS_LOTE, pausa: float = 0.0) -> dict:
+    """Cadastra os nomes ausentes e preenche todas as colunas de id; retorna as linhas por "tabela.coluna" """
+    cadastrar_ausentes(db)
+    resultado = {}
+    for modelo, referencias in REFERENCIAS.items():
+        for coluna_nome, coluna_id, _ in referencias:
+            chave = f"{modelo.__tablename__}.{coluna_id}"
+            resultado[chave] = migrar_coluna(db, modelo, coluna_nome, lote, pausa)
+            logger.info("Migração de cadastros: %s linhas preenchidas em %s", resultado[chave], chave)
+    return resultado
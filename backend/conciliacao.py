@@ -0,0 +1,102 @@
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+import logging
+import os
+
+from . import database, saldos
+
+logger = logging.getLogger(__name__)
+
+# Intervalo da conciliação automática e se ela corrige as divergências ou só as registra no log
+CONCILIACAO_INTERVAL_SECONDS = int(os.getenv("CONCILIACAO_INTERVAL_SECONDS", "86400"))
+CONCILIACAO_CORRIGIR = os.getenv("CONCILIACAO_CORRIGIR", "false").lower() in ("1", "true", "sim")
+
+# Diferença tolerada entre o saldo gravado e o recalculado (centavos)
+TOLERANCIA_SALDO = 0.005
+
+def _totais_financeiros():
+    """Soma com sinal das movimentações financeiras (pagamentos, recebimentos, doações) por conta"""
+    financeira = database.MovimentacaoFinanceira
+    return select(
+        financeira.conta_id.label("conta_id"),
+        func.sum(case(
+            (financeira.tipo_movimentacao == "ENTRADA", financeira.valor),
+            else_=-financeira.valor,
+        )).label("total"),
+    ).group_by(financeira.conta_id).subquery()
+
+def _totais_manuais():
+    """Soma com sinal das movimentações manuais de saldo por conta"""
+    manual = database.MovimentacaoConta
+    return select(
+        manual.conta_id.label("conta_id"),
+        func.sum(case(
+            (manual.tipo == "Entrada", manual.valor),
+            else_=-manual.valor,
+        )).label("total"),
+    ).group_by(manual.conta_id).subquery()
+
+def calcular_saldos(db: Session) -> list:
+    """
+    Saldo de cada conta recalculado a partir do razão: saldo inicial + movimentações.
+
+    Cada razão é agregado uma vez por conta (GROUP BY) e os dois são unidos às contas na
+    mesma consulta, então saldo gravado e recalculado vêm do mesmo instante do banco.
+    """
+    conta = database.Conta
+    financeiro = _totais_financeiros()
+    manual = _totais_manuais()
+    linhas = db.execute(
+        select(
+            conta.id, conta.nome_conta, conta.saldo_inicial, conta.saldo_atual,
+            func.coalesce(financeiro.c.total, 0), func.coalesce(manual.c.total, 0),
+        )
+        .outerjoin(financeiro, financeiro.c.conta_id == conta.id)
+        .outerjoin(manual, manual.c.conta_id == conta.id)
+        .order_by(conta.id)
+    ).all()
+
+    resultado = []
+    for conta_id, nome_conta, saldo_inicial, saldo_atual, total_financeiro, total_manual in linhas:
+        calculado = float(saldo_inicial or 0.0) + float(total_financeiro) + float(total_manual)
+        gravado = float(saldo_atual or 0.0)
+        resultado.append({
+            "conta_id": conta_id,
+            "nome_conta": nome_conta,
+            "saldo_gravado": round(gravado, 2),
+            "saldo_calculado": round(calculado, 2),
+            "diferenca": round(gravado - calculado, 2),
+        })
+    return resultado
+
+def verificar(db: Session) -> list:
+    """Contas cujo saldo gravado difere do recalculado"""
+    return [conta for conta in calcular_saldos(db) if abs(conta["diferenca"]) > TOLERANCIA_SALDO]
+
+def corrigir(db: Session) -> list:
+    """
+    Corrige as contas divergentes e retorna as divergências encontradas.
+
+    A correção subtrai a diferença com o UPDATE atômico de saldos.ajustar_saldo, em vez de
+    gravar o valor recalculado, para não apagar lançamentos feitos durante a conciliação.
+    """
+    divergencias = verificar(db)
+    for conta in divergencias:
+        saldos.ajustar_saldo(db, conta["conta_id"], -conta["diferenca"])
+    db.commit()
+    return divergencias
+
+def conciliar() -> int:
+    """Tarefa periódica: registra (e, com CONCILIACAO_CORRIGIR, corrige) as divergências de saldo"""
+    db = database.SessionLocal()
+    try:
+        divergencias = corrigir(db) if CONCILIACAO_CORRIGIR else verificar(db)
+        for conta in divergencias:
+            logger.warning(
+                "Saldo divergente na conta %s (%s): gravado %.2f, calculado %.2f%s",
+                conta["conta_id"], conta["nome_conta"], conta["saldo_gravado"], conta["saldo_calculado"],
+                " (corrigido)" if CONCILIACAO_CORRIGIR else "",
+            )
+        return len(divergencias)
+    finally:
+        db.close()
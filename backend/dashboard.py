@@ -0,0 +1,317 @@
+from datetime import date
+from sqlalchemy import Integer, String, case, cast, event, func, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import calendar
+import os
+import threading
+
+from . import categorias, database, previsao, recorrencia
+from .cache import TTLCache
+
+# Cache das respostas do painel. A chave inclui a versão dos dados deste processo, incrementada
+# depois de cada transação confirmada que grava dados exibidos no painel (ouvintes da sessão
+# abaixo), então um acerto do cache não executa SQL. Com vários workers, a mesma transação
+# também incrementa um contador no banco (configuração "versao_painel"), que a tarefa periódica
+# sincronizar_versao lê a cada DASHBOARD_CACHE_SYNC_SECONDS: uma escrita feita em outro worker
+# aparece aqui no máximo esse tempo depois (0 desliga o contador, para um único worker).
+# O TTL só limita o uso de memória e cobre escritas feitas direto no banco, fora da aplicação.
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "300"))
+DASHBOARD_CACHE_MAXSIZE = int(os.getenv("DASHBOARD_CACHE_MAXSIZE", "256"))
+DASHBOARD_CACHE_SYNC_SECONDS = float(os.getenv("DASHBOARD_CACHE_SYNC_SECONDS", "5"))
+CHAVE_VERSAO = "versao_painel"
+
+# Tabelas cujas escritas não mudam nada do que o painel mostra
+TABELAS_FORA_DO_PAINEL = {"usuarios", "user_sessions", "configuracoes", "saldos_checkpoint"}
+
+dashboard_cache = TTLCache(maxsize=DASHBOARD_CACHE_MAXSIZE, ttl=DASHBOARD_CACHE_TTL_SECONDS)
+
+_versao = 0
+_versao_banco = None  # Último valor do contador compartilhado lido por este processo
+_lock = threading.Lock()
+
+def versao_dados() -> int:
+    """Versão atual dos dados do painel neste processo"""
+    return _versao
+
+def invalidar_cache():
+    """Incrementa a versão dos dados; respostas em cache de versões anteriores deixam de ser usadas"""
+    global _versao
+    with _lock:
+        _versao += 1
+
+def incrementar_versao_compartilhada(connection):
+    """Incrementa o contador "versao_painel" do banco na transação de `connection`"""
+    configuracao = database.Configuracao.__table__
+    proxima = cast(cast(configuracao.c.valor, Integer) + 1, String)
+    dialeto = {"sqlite": sqlite, "postgresql": postgresql}.get(connection.dialect.name)
+    if dialeto is not None:
+        stmt = dialeto.insert(configuracao).values(chave=CHAVE_VERSAO, valor="1")
+        connection.execute(stmt.on_conflict_do_update(index_elements=["chave"], set_={"valor": proxima}))
+        return
+    if not connection.execute(
+        update(configuracao).where(configuracao.c.chave == CHAVE_VERSAO).values(valor=proxima)
+    ).rowcount:
+        connection.execute(configuracao.insert().values(chave=CHAVE_VERSAO, valor="1"))
+
+def sincronizar_versao() -> bool:
+    """
+    Tarefa periódica: lê o contador compartilhado e, se outro worker gravou desde a última
+    leitura, invalida o cache deste processo. Retorna se invalidou.
+    """
+    global _versao_banco
+    with database.engine.connect() as connection:
+        valor = connection.execute(
+            select(database.Configuracao.valor).where(database.Configuracao.chave == CHAVE_VERSAO)
+        ).scalar()
+    valor = int(valor or 0)
+    if valor == _versao_banco:
+        return False
+    _versao_banco = valor
+    invalidar_cache()
+    return True
+
+# Ouvintes da sessão: marcam a transação que grava dados do painel e invalidam depois do commit
+ALTERADO = "painel_alterado"
+
+def _marcar(session, tabela):
+    if tabela is not None and tabela not in TABELAS_FORA_DO_PAINEL:
+        session.info[ALTERADO] = True
+
+def _apos_flush(session, flush_context):
+    # Nesse ponto new/dirty/deleted ainda mostram o que foi gravado
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        _marcar(session, getattr(type(obj), "__tablename__", None))
+
+def _ao_executar(orm_execute_state):
+    """INSERT/UPDATE/DELETE em massa (session.execute), que não passam pelo flush"""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _marcar(orm_execute_state.session, getattr(orm_execute_state.statement.table, "name", None))
+
+def _antes_do_commit(session):
+    # O commit grava as alterações pendentes depois deste evento: grava antes, para marcá-las
+    session.flush()
+    if session.info.get(ALTERADO) and DASHBOARD_CACHE_SYNC_SECONDS > 0:
+        incrementar_versao_compartilhada(session.connection())
+
+def _apos_commit(session):
+    if session.info.pop(ALTERADO, False):
+        invalidar_cache()
+
+def _fim_da_transacao(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(ALTERADO, None)
+
+def acompanhar(fabrica_sessoes):
+    """Invalida o cache depois das transações das sessões de `fabrica_sessoes` (sessionmaker) que gravam dados"""
+    event.listen(fabrica_sessoes, "after_flush", _apos_flush)
+    event.listen(fabrica_sessoes, "do_orm_execute", _ao_executar)
+    event.listen(fabrica_sessoes, "before_commit", _antes_do_commit)
+    event.listen(fabrica_sessoes, "after_commit", _apos_commit)
+    event.listen(fabrica_sessoes, "after_transaction_end", _fim_da_transacao)
+
+acompanhar(database.SessionLocal)
+
+def em_cache(endpoint: str, params: tuple, calcular):
+    """
+    Retorna a resposta de (endpoint, params, versão dos dados, dia) do cache ou a calcula.
+
+    A versão é lida antes do cálculo: se uma escrita terminar durante o cálculo, o
+    resultado fica guardado sob a versão antiga e não é reaproveitado.
+    """
+    chave = (endpoint, params, versao_dados(), date.today())
+    resposta = dashboard_cache.get(chave)
+    if resposta is None:
+        resposta = calcular()
+        dashboard_cache.set(chave, resposta)
+    return resposta
+
+def cache_stats() -> dict:
+    return {**dashboard_cache.stats(), "versao_dados": versao_dados()}
+
+def _soma_condicional(coluna_valor, condicao):
+    """SUM(CASE WHEN condicao THEN valor ELSE 0 END), sempre numérico"""
+    return func.coalesce(func.sum(case((condicao, coluna_valor), else_=0)), 0)
+
+def limites_mes(referencia: date):
+    """Primeiro e último dia do mês de `referencia`"""
+    inicio = referencia.replace(day=1)
+    fim = referencia.replace(day=calendar.monthrange(referencia.year, referencia.month)[1])
+    return inicio, fim
+
+def calcular_totais(db: Session, hoje: date) -> dict:
+    """
+    Totais do painel em uma única consulta agrupada.
+
+    Os lançamentos pendentes do mês (pagar e receber) e as doações recebidas no mês
+    são unidos com UNION ALL, cada um filtrado pelo índice de vencimento/data, e
+    agregados por tipo com SUM(CASE) separando os baldes "hoje" e "mês". Nenhuma
+    linha é trazida para o Python, então o custo de memória é constante. Das parcelas
+    recorrentes só as vencidas estão gravadas; as futuras do mês são somadas como
+    virtuais aqui (no máximo uma por regra mensal).
+    """
+    inicio_mes, fim_mes = limites_mes(hoje)
+    pagar = database.ContaPagar
+    receber = database.ContaReceber
+    doacao = database.DoacaoAvulsa
+
+    lancamentos = union_all(
+        select(literal("pagar").label("tipo"), pagar.data_vencimento.label("data"), pagar.valor.label("valor")).where(
+            pagar.status == "Pendente",
+            pagar.data_vencimento.between(inicio_mes, fim_mes),
+        ),
+        select(literal("receber"), receber.data_vencimento, receber.valor).where(
+            receber.status == "Pendente",
+            receber.data_vencimento.between(inicio_mes, fim_mes),
+        ),
+        select(literal("doacao"), doacao.data, doacao.valor).where(
+            doacao.recebido == True,
+            doacao.data.between(inicio_mes, fim_mes),
+        ),
+    ).subquery()
+
+    linhas = db.execute(
+        select(
+            lancamentos.c.tipo,
+            _soma_condicional(lancamentos.c.valor, lancamentos.c.data == hoje),
+            func.coalesce(func.sum(lancamentos.c.valor), 0),
+        ).group_by(lancamentos.c.tipo)
+    ).all()
+    totais = {tipo: (float(dia), float(mes)) for tipo, dia, mes in linhas}
+
+    # Parcelas virtuais (futuras, ainda não gravadas) pendentes no mês
+    for tipo in ("pagar", "receber"):
+        dia, mes = totais.get(tipo, (0.0, 0.0))
+        for parcela in recorrencia.parcelas_virtuais(db, tipo, inicio_mes, fim_mes):
+            valor = parcela["valor"] or 0.0
+            mes += valor
+            if parcela["data_vencimento"] == hoje:
+                dia += valor
+        totais[tipo] = (dia, mes)
+
+    return {
+        "total_pagar_hoje": totais.get("pagar", (0.0, 0.0))[0],
+        "total_pagar_mes": totais.get("pagar", (0.0, 0.0))[1],
+        "total_receber_hoje": totais.get("receber", (0.0, 0.0))[0],
+        "total_receber_mes": totais.get("receber", (0.0, 0.0))[1],
+        "total_doacoes_mes": totais.get("doacao", (0.0, 0.0))[1],
+    }
+
+def saldos_contas(db: Session) -> list:
+    """Saldo atual de cada conta, lendo só as colunas necessárias"""
+    linhas = db.query(database.Conta.nome_conta, database.Conta.saldo_atual).order_by(database.Conta.id).all()
+    return [{"nome_conta": nome, "saldo": saldo} for nome, saldo in linhas]
+
+def get_dashboard(db: Session, hoje: date = None) -> dict:
+    """Monta os dados do painel (schemas.DashboardData)"""
+    hoje = hoje or date.today()
+    dados = calcular_totais(db, hoje)
+    dados["saldos_contas"] = saldos_contas(db)
+    dados["previsao_futura"] = previsao.projetar_saldos(db, hoje=hoje)
+    return dados
+
+def resumo_mensal(db: Session, ano: int, mes: int) -> dict:
+    """
+    Resumo de um mês (schemas.DashboardMensal) em uma única consulta agrupada.
+
+    Contas a receber, contas a pagar (pelo vencimento) e doações recebidas (pela data)
+    do mês são unidas e agrupadas por tipo, status, id da categoria e beneficiário; o
+    resultado tem poucas linhas e é distribuído entre os totais e as quebras.
+    """
+    inicio_mes, fim_mes = limites_mes(date(ano, mes, 1))
+    pagar = database.ContaPagar
+    receber = database.ContaReceber
+    doacao = database.DoacaoAvulsa
+    sem_beneficiario = literal(None, type_=pagar.beneficiario_id.type)
+
+    # Categoria agrupada pelo id; o texto gravado só separa as linhas ainda sem id
+    def sem_id(modelo):
+        return case((modelo.categoria_id.is_(None), modelo.categoria))
+
+    lancamentos = union_all(
+        select(
+            literal("receber").label("tipo"),
+            receber.status.label("status"),
+            receber.categoria_id.label("categoria_id"),
+            sem_id(receber).label("categoria"),
+            sem_beneficiario.label("beneficiario_id"),
+            receber.valor.label("valor"),
+        ).where(receber.data_vencimento.between(inicio_mes, fim_mes)),
+        select(
+            literal("pagar"), pagar.status, pagar.categoria_id, sem_id(pagar), pagar.beneficiario_id, pagar.valor,
+        ).where(pagar.data_vencimento.between(inicio_mes, fim_mes)),
+        select(
+            literal("doacao"), literal("Recebido"), literal(None, type_=pagar.categoria_id.type), literal(None),
+            sem_beneficiario, doacao.valor,
+        ).where(doacao.recebido == True, doacao.data.between(inicio_mes, fim_mes)),
+    ).subquery()
+
+    linhas = db.execute(
+        select(
+            lancamentos.c.tipo,
+            lancamentos.c.status,
+            lancamentos.c.categoria_id,
+            lancamentos.c.categoria,
+            lancamentos.c.beneficiario_id,
+            database.Beneficiario.nome,
+            func.coalesce(func.sum(lancamentos.c.valor), 0),
+        )
+        .outerjoin(database.Beneficiario, database.Beneficiario.id == lancamentos.c.beneficiario_id)
+        .group_by(
+            lancamentos.c.tipo,
+            lancamentos.c.status,
+            lancamentos.c.categoria_id,
+            lancamentos.c.categoria,
+            lancamentos.c.beneficiario_id,
+            database.Beneficiario.nome,
+        )
+    ).all()
+
+    # Nomes atuais dos cadastros (poucas linhas, uma consulta por tipo)
+    nomes = {
+        "receber": categorias.nomes_por_id(db, database.CategoriaReceber, (linha[2] for linha in linhas if linha[0] == "receber")),
+        "pagar": categorias.nomes_por_id(db, database.CategoriaPagar, (linha[2] for linha in linhas if linha[0] == "pagar")),
+    }
+
+    totais = {"receber": {}, "pagar": {}, "doacao": {}}
+    receitas, despesas, beneficiarios = {}, {}, {}
+    for tipo, status, categoria_id, categoria, beneficiario_id, nome, valor in linhas:
+        valor = float(valor)
+        totais[tipo][status] = totais[tipo].get(status, 0.0) + valor
+        categoria = nomes.get(tipo, {}).get(categoria_id) or categoria or "Sem categoria"
+        if tipo == "receber" and status == "Recebido":
+            receitas[categoria] = receitas.get(categoria, 0.0) + valor
+        elif tipo == "pagar" and status == "Pago":
+            despesas[categoria] = despesas.get(categoria, 0.0) + valor
+            if beneficiario_id:
+                chave = (beneficiario_id, nome or f"Beneficiário ID {beneficiario_id}")
+                beneficiarios[chave] = beneficiarios.get(chave, 0.0) + valor
+
+    def por_valor(itens):
+        return sorted(itens, key=lambda item: item["valor"], reverse=True)
+
+    # Parcelas virtuais (futuras, ainda não gravadas) das séries recorrentes entram como pendentes
+    for tipo in ("pagar", "receber"):
+        virtuais = recorrencia.parcelas_virtuais(db, tipo, inicio_mes, fim_mes)
+        if virtuais:
+            totais[tipo]["Pendente"] = totais[tipo].get("Pendente", 0.0) + sum(p["valor"] or 0.0 for p in virtuais)
+
+    total_recebido = totais["receber"].get("Recebido", 0.0)
+    total_pago = totais["pagar"].get("Pago", 0.0)
+    total_doacoes = totais["doacao"].get("Recebido", 0.0)
+    return {
+        "ano": ano,
+        "mes": mes,
+        "total_recebido": total_recebido,
+        "total_a_receber": totais["receber"].get("Pendente", 0.0),
+        "total_pago": total_pago,
+        "total_a_pagar": totais["pagar"].get("Pendente", 0.0),
+        "total_doacoes": total_doacoes,
+        "total_entradas": total_recebido + total_doacoes,
+        "total_saidas": total_pago,
+        "receitas_por_categoria": por_valor([{"categoria": c, "valor": v} for c, v in receitas.items()]),
+        "despesas_por_categoria": por_valor([{"categoria": c, "valor": v} for c, v in despesas.items()]),
+        "gastos_por_beneficiario": por_valor([
+            {"beneficiario_id": b_id, "nome": nome, "valor": v} for (b_id, nome), v in beneficiarios.items()
+        ]),
+    }
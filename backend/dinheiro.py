@@ -0,0 +1,30 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+import os
+
+# Como os valores monetários são gravados no banco: "reais" (ponto flutuante, o formato
+# original) ou "centavos" (inteiros, somas exatas no SQL). Fora do banco (Python e API) os
+# valores são sempre em reais. Um banco existente passa a centavos com migrate_centavos.py.
+DINHEIRO_ARMAZENAMENTO = os.getenv("DINHEIRO_ARMAZENAMENTO", "reais").lower()
+if DINHEIRO_ARMAZENAMENTO not in ("reais", "centavos"):
+    raise ValueError(f"DINHEIRO_ARMAZENAMENTO inválido: {DINHEIRO_ARMAZENAMENTO} (use reais ou centavos)")
+EM_CENTAVOS = DINHEIRO_ARMAZENAMENTO == "centavos"
+
+CENTAVO = Decimal("0.01")
+
+def para_centavos(reais) -> Optional[int]:
+    """Reais -> centavos inteiros, arredondando meio centavo para cima"""
+    if reais is None:
+        return None
+    # str() evita levar o erro binário do float (0.285 -> 0.28499...) para o arredondamento
+    return int((Decimal(str(reais)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def para_reais(centavos) -> Optional[float]:
+    """Centavos -> reais; aceita o inteiro gravado como REAL (ex.: 1234.0)"""
+    if centavos is None:
+        return None
+    return int(round(centavos)) / 100
+
+def arredondar(reais) -> Optional[float]:
+    """Valor em reais com no máximo duas casas (o que cabe em centavos)"""
+    return para_reais(para_centavos(reais))
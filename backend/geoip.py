@@ -0,0 +1,157 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from typing import Optional
+import csv
+import ipaddress
+import logging
+import os
+
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Configurações de geolocalização
+GEOIP_RESOLVER = os.getenv("GEOIP_RESOLVER", "offline")  # offline, ip-api ou none
+GEOIP_CSV_PATH = os.getenv("GEOIP_CSV_PATH", "./geoip.csv")
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", "4096"))
+GEOIP_CACHE_TTL_SECONDS = float(os.getenv("GEOIP_CACHE_TTL_SECONDS", "86400"))
+
+LOCALIZACAO_INDISPONIVEL = "Localização não disponível"
+LOCALIZACAO_REDE_LOCAL = "Rede local"
+
+class LocationResolver(ABC):
+    """Interface dos resolvedores de localização a partir do IP"""
+
+    @abstractmethod
+    def resolve(self, ip_address: str) -> Optional[str]:
+        """Localização do IP, ou None se não for encontrada"""
+
+class NullResolver(LocationResolver):
+    """Não resolve localização (GEOIP_RESOLVER=none)"""
+
+    def resolve(self, ip_address: str) -> Optional[str]:
+        return None
+
+class OfflineRangeResolver(LocationResolver):
+    """
+    Consulta uma tabela local de faixas de IP, sem acesso à rede.
+
+    O CSV tem as colunas `inicio,fim,cidade,regiao,pais`; `inicio` e `fim` podem ser
+    endereços (IPv4 ou IPv6) ou inteiros. As faixas ficam ordenadas em memória e cada
+    consulta é uma busca binária.
+    """
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        # versão do IP -> (inícios, fins, localizações), ordenados pelo início
+        self._tables = {4: ([], [], []), 6: ([], [], [])}
+        self._load()
+
+    @staticmethod
+    def _parse_ip(value: str) -> ipaddress._BaseAddress:
+        value = value.strip()
+        if value.isdigit():
+            number = int(value)
+            return ipaddress.ip_address(number) if number < 2 ** 32 else ipaddress.IPv6Address(number)
+        return ipaddress.ip_address(value)
+
+    def _load(self):
+        if not os.path.exists(self.csv_path):
+            logger.warning("Tabela de GeoIP não encontrada em %s", self.csv_path)
+            return
+
+        rows = {4: [], 6: []}
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            for line in csv.reader(f):
+                if len(line) < 5 or line[0].startswith("#"):
+                    continue
+                try:
+                    start, end = self._parse_ip(line[0]), self._parse_ip(line[1])
+                except ValueError:
+                    continue  # cabeçalho ou linha inválida
+                location = ", ".join(part.strip() for part in line[2:5] if part.strip())
+                rows[start.version].append((int(start), int(end), location))
+
+        for version, items in rows.items():
+            items.sort()
+            starts, ends, locations = self._tables[version]
+            for start, end, location in items:
+                starts.append(start)
+                ends.append(end)
+                locations.append(location)
+
+    def resolve(self, ip_address: str) -> Optional[str]:
+        address = ipaddress.ip_address(ip_address)
+        starts, ends, locations = self._tables[address.version]
+        number = int(address)
+        index = bisect_right(starts, number) - 1
+        if index >= 0 and number <= ends[index]:
+            return locations[index]
+        return None
+
+class IpApiResolver(LocationResolver):
+    """Consulta o serviço ip-api.com (rede); use apenas fora do caminho da requisição"""
+
+    def __init__(self, timeout: float = 5):
+        self.timeout = timeout
+
+    def resolve(self, ip_address: str) -> Optional[str]:
+        import requests
+
+        response = requests.get(f"http://ip-api.com/json/{ip_address}", timeout=self.timeout)
+        if response.status_code == 200:
+            data = response.json()
+            if data.get("status") == "success":
+                return f"{data.get('city', '')}, {data.get('regionName', '')}, {data.get('country', '')}"
+        return None
+
+def create_resolver(name: str = GEOIP_RESOLVER) -> LocationResolver:
+    """Cria o resolvedor configurado; sem a tabela local, o offline não resolve localização"""
+    if name == "offline":
+        if os.path.exists(GEOIP_CSV_PATH):
+            return OfflineRangeResolver(GEOIP_CSV_PATH)
+        # Consultar o ip-api.com envia os IPs a terceiros: só com GEOIP_RESOLVER=ip-api
+        logger.warning("Tabela de GeoIP não encontrada em %s; localização desativada", GEOIP_CSV_PATH)
+        return NullResolver()
+    if name == "ip-api":
+        return IpApiResolver()
+    return NullResolver()
+
+_resolver = None
+
+def get_resolver() -> LocationResolver:
+    global _resolver
+    if _resolver is None:
+        _resolver = create_resolver()
+    return _resolver
+
+# Só as localizações encontradas ficam em cache: uma falha (rede, IP fora da tabela) é
+# consultada de novo no próximo login desse IP
+location_cache = TTLCache(maxsize=GEOIP_CACHE_SIZE, ttl=GEOIP_CACHE_TTL_SECONDS)
+
+def set_resolver(resolver: LocationResolver):
+    """Troca o resolvedor em uso (e limpa o cache de consultas)"""
+    global _resolver
+    _resolver = resolver
+    location_cache.clear()
+
+def resolve_location(ip_address: str) -> str:
+    """Obtém localização aproximada a partir do IP, com cache LRU das consultas bem-sucedidas"""
+    try:
+        address = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return LOCALIZACAO_INDISPONIVEL
+    if address.is_private or address.is_loopback or address.is_link_local:
+        return LOCALIZACAO_REDE_LOCAL
+    location = location_cache.get(ip_address)
+    if location is not None:
+        return location
+    try:
+        location = get_resolver().resolve(ip_address)
+    except Exception:
+        logger.exception("Falha ao resolver localização do IP %s", ip_address)
+        return LOCALIZACAO_INDISPONIVEL
+    if not location:
+        return LOCALIZACAO_INDISPONIVEL
+    location_cache.set(ip_address, location)
+    return location
@@ -0,0 +1,122 @@
+from datetime import date, datetime
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from . import database, saldos
+
+# Lançamentos no razão: cada evento de negócio grava a movimentação e ajusta o saldo da conta
+# na transação da sessão, sem commit. A rota que chama confirma tudo com um único commit.
+
+ORIGEM_CONTA_PAGAR = "CONTA_PAGAR"
+ORIGEM_CONTA_RECEBER = "CONTA_RECEBER"
+ORIGEM_DOACAO = "DOACAO"
+
+def _id_da_origem(db: Session, origem) -> int:
+    """Id do lançamento de origem; um objeto novo é gravado (flush) para receber o id"""
+    if origem.id is None:
+        db.flush()
+    return origem.id
+
+def _movimentar(db: Session, conta_id: int, tipo_movimentacao: str, valor: float, descricao: str,
+                categoria: Optional[str], origem_tipo: str, origem_id: int, usuario_id: Optional[int],
+                observacao: Optional[str]) -> database.MovimentacaoFinanceira:
+    """Grava a movimentação e aplica o valor ao saldo da conta (incremento atômico)"""
+    movimentacao = database.MovimentacaoFinanceira(
+        conta_id=conta_id,
+        tipo_movimentacao=tipo_movimentacao,
+        valor=valor,
+        data_movimentacao=datetime.utcnow(),
+        descricao=descricao,
+        categoria=categoria,
+        origem_tipo=origem_tipo,
+        origem_id=origem_id,
+        usuario_id=usuario_id,
+        observacao=observacao,
+    )
+    db.add(movimentacao)
+    saldos.ajustar_saldo(db, conta_id, valor if tipo_movimentacao == "ENTRADA" else -valor)
+    return movimentacao
+
+def pagar(db: Session, conta: database.ContaPagar, usuario_id: Optional[int]) -> database.MovimentacaoFinanceira:
+    """Pagamento de uma conta a pagar: saída na conta bancária"""
+    if not conta.data_pagamento:
+        conta.data_pagamento = datetime.utcnow().date()
+
+    # Descritivo com o fornecedor (sempre obrigatório) e o beneficiário, se houver
+    fornecedor = db.get(database.FornecedorDoador, conta.fornecedor_id)
+    descricao = f"Pagamento - {fornecedor.nome_razao if fornecedor else 'Fornecedor'}"
+    if conta.beneficiario_id:
+        beneficiario = db.get(database.Beneficiario, conta.beneficiario_id)
+        descricao += f" (para {beneficiario.nome if beneficiario else 'Beneficiário'})"
+
+    return _movimentar(
+        db, conta.conta_id, "SAIDA", conta.valor, descricao, conta.categoria,
+        ORIGEM_CONTA_PAGAR, _id_da_origem(db, conta), usuario_id, conta.observacao,
+    )
+
+def receber(db: Session, conta: database.ContaReceber, usuario_id: Optional[int]) -> database.MovimentacaoFinanceira:
+    """Recebimento de uma conta a receber: entrada na conta bancária"""
+    if not conta.data_recebimento:
+        conta.data_recebimento = datetime.utcnow().date()
+    return _movimentar(
+        db, conta.conta_id, "ENTRADA", conta.valor, f"Recebimento - {conta.categoria}", conta.categoria,
+        ORIGEM_CONTA_RECEBER, _id_da_origem(db, conta), usuario_id, conta.observacao,
+    )
+
+def doar(db: Session, doacao: database.DoacaoAvulsa, usuario_id: Optional[int]) -> database.MovimentacaoFinanceira:
+    """Doação avulsa recebida: entrada na conta bancária"""
+    return _movimentar(
+        db, doacao.conta_id, "ENTRADA", doacao.valor, f"Doação - {doacao.nome_doador}", "Doação",
+        ORIGEM_DOACAO, _id_da_origem(db, doacao), usuario_id, doacao.observacao,
+    )
+
+def estornar(db: Session, origem_tipo: str, origem_id: int) -> int:
+    """
+    Desfaz as movimentações de um lançamento: remove cada uma e devolve o valor ao saldo.
+
+    Usa a conta e o valor da própria movimentação, não os do lançamento (que podem ter sido
+    editados depois). Retorna quantas movimentações foram estornadas.
+    """
+    movimentacoes = db.query(database.MovimentacaoFinanceira).filter(
+        database.MovimentacaoFinanceira.origem_tipo == origem_tipo,
+        database.MovimentacaoFinanceira.origem_id == origem_id,
+    ).all()
+    for movimentacao in movimentacoes:
+        valor = movimentacao.valor or 0.0
+        saldos.ajustar_saldo(db, movimentacao.conta_id, -valor if movimentacao.tipo_movimentacao == "ENTRADA" else valor)
+        db.delete(movimentacao)
+    return len(movimentacoes)
+
+def atualizar_liquidacao(db: Session, origem_tipo: str, origem, lancar, usuario_id: Optional[int],
+                         liquidado_antes: bool, liquidado: bool, alterado: bool):
+    """
+    Mantém a movimentação de um lançamento editado coerente com os dados novos.
+
+    Estorna a movimentação se o lançamento deixou de estar liquidado ou teve a conta/valor
+    (`alterado`) editados, e lança de novo com `lancar` se ele está liquidado.
+    """
+    if liquidado_antes and (not liquidado or alterado):
+        estornar(db, origem_tipo, origem.id)
+    if liquidado and (not liquidado_antes or alterado):
+        lancar(db, origem, usuario_id)
+
+def movimentar_saldo(db: Session, conta_id: int, tipo: str, valor: float, observacao: Optional[str] = None) -> bool:
+    """
+    Entrada ou saída manual de saldo (MovimentacaoConta).
+
+    A saída só é feita se houver saldo suficiente, verificado no mesmo UPDATE; retorna False
+    quando é recusada.
+    """
+    if tipo == "Saída":
+        if not saldos.debitar_saldo(db, conta_id, valor):
+            return False
+    else:
+        saldos.ajustar_saldo(db, conta_id, valor)
+    db.add(database.MovimentacaoConta(
+        conta_id=conta_id,
+        tipo=tipo,
+        valor=valor,
+        data=date.today(),
+        observacao=observacao,
+    ))
+    return True
@@ -1,128 +1,87 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Form, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Form, Request, BackgroundTasks, Query
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-from datetime import datetime, timedelta, date
-from typing import List, Optional
-import calendar
-import json
+from sqlalchemy import exists, func, select
+from datetime import timedelta, date
+from typing import List, Optional, Union
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
-from . import database, schemas, auth
+from . import database, schemas, auth, workers, dashboard, rollup, previsao, saldos, recorrencia, lancamentos, categorias
+from .pagination import paginate
 from .version import get_version_info, get_version_string
+from .tasks import lifespan
 
 # Configuração do limitador de taxa
 limiter = Limiter(key_func=get_remote_address)
 
 # Funções auxiliares para validação de integridade referencial
+def check_dependencies(db: Session, verificacoes: list) -> list:
+    """
+    Descrições das dependências encontradas, entre pares (descrição, condição).
+
+    Todas as verificações vão em um único SELECT com um EXISTS por tabela: cada EXISTS para
+    na primeira linha encontrada pelo índice da coluna filtrada, em vez de contar todas.
+    """
+    resultado = db.execute(select(*[exists().where(condicao) for _, condicao in verificacoes])).one()
+    return [descricao for (descricao, _), existe in zip(verificacoes, resultado) if existe]
+
 def check_fornecedor_dependencies(db: Session, fornecedor_id: int):
     """Verifica se um fornecedor/doador tem dependências que impedem sua exclusão"""
-    dependencies = []
-    
-    # Verificar contas a pagar
-    contas_pagar = db.query(database.ContaPagar).filter(database.ContaPagar.fornecedor_id == fornecedor_id).count()
-    if contas_pagar > 0:
-        dependencies.append(f"{contas_pagar} conta(s) a pagar")
-    
-    # Verificar contas a receber
-    contas_receber = db.query(database.ContaReceber).filter(database.ContaReceber.fornecedor_doador_id == fornecedor_id).count()
-    if contas_receber > 0:
-        dependencies.append(f"{contas_receber} conta(s) a receber")
-    
-    return dependencies
+    return check_dependencies(db, [
+        ("conta(s) a pagar", database.ContaPagar.fornecedor_id == fornecedor_id),
+        ("conta(s) a receber", database.ContaReceber.fornecedor_doador_id == fornecedor_id),
+    ])
 
 def check_beneficiario_dependencies(db: Session, beneficiario_id: int):
     """Verifica se um beneficiário tem dependências que impedem sua exclusão"""
-    dependencies = []
-    
-    # Verificar contas a pagar
-    contas_pagar = db.query(database.ContaPagar).filter(database.ContaPagar.beneficiario_id == beneficiario_id).count()
-    if contas_pagar > 0:
-        dependencies.append(f"{contas_pagar} conta(s) a pagar")
-    
-    return dependencies
+    return check_dependencies(db, [
+        ("conta(s) a pagar", database.ContaPagar.beneficiario_id == beneficiario_id),
+    ])
 
 def check_conta_dependencies(db: Session, conta_id: int):
     """Verifica se uma conta bancária tem dependências que impedem sua exclusão"""
-    dependencies = []
-    
-    # Verificar contas a pagar
-    contas_pagar = db.query(database.ContaPagar).filter(database.ContaPagar.conta_id == conta_id).count()
-    if contas_pagar > 0:
-        dependencies.append(f"{contas_pagar} conta(s) a pagar")
-    
-    # Verificar contas a receber
-    contas_receber = db.query(database.ContaReceber).filter(database.ContaReceber.conta_id == conta_id).count()
-    if contas_receber > 0:
-        dependencies.append(f"{contas_receber} conta(s) a receber")
-    
-    # Verificar doações avulsas
-    doacoes = db.query(database.DoacaoAvulsa).filter(database.DoacaoAvulsa.conta_id == conta_id).count()
-    if doacoes > 0:
-        dependencies.append(f"{doacoes} doação(ões) avulsa(s)")
-    
-    # Verificar movimentações financeiras
-    movimentacoes = db.query(database.MovimentacaoFinanceira).filter(database.MovimentacaoFinanceira.conta_id == conta_id).count()
-    if movimentacoes > 0:
-        dependencies.append(f"{movimentacoes} movimentação(ões) financeira(s)")
-    
-    return dependencies
+    return check_dependencies(db, [
+        ("conta(s) a pagar", database.ContaPagar.conta_id == conta_id),
+        ("conta(s) a receber", database.ContaReceber.conta_id == conta_id),
+        ("doação(ões) avulsa(s)", database.DoacaoAvulsa.conta_id == conta_id),
+        ("movimentação(ões) financeira(s)", database.MovimentacaoFinanceira.conta_id == conta_id),
+        ("movimentação(ões) de saldo", database.MovimentacaoConta.conta_id == conta_id),
+    ])
 
 def check_usuario_dependencies(db: Session, usuario_id: int):
     """Verifica se um usuário tem dependências que impedem sua exclusão"""
-    dependencies = []
-    
-    # Verificar movimentações financeiras criadas
-    movimentacoes = db.query(database.MovimentacaoFinanceira).filter(database.MovimentacaoFinanceira.usuario_id == usuario_id).count()
-    if movimentacoes > 0:
-        dependencies.append(f"{movimentacoes} movimentação(ões) financeira(s) criada(s)")
-    
-    return dependencies
+    return check_dependencies(db, [
+        ("movimentação(ões) financeira(s) criada(s)", database.MovimentacaoFinanceira.usuario_id == usuario_id),
+    ])
 
-def check_categoria_pagar_dependencies(db: Session, categoria_nome: str):
+def check_categoria_pagar_dependencies(db: Session, categoria: database.CategoriaPagar):
     """Verifica se uma categoria de pagar está sendo usada"""
-    dependencies = []
-    
-    # Verificar contas a pagar que usam esta categoria
-    contas_pagar = db.query(database.ContaPagar).filter(database.ContaPagar.categoria == categoria_nome).count()
-    if contas_pagar > 0:
-        dependencies.append(f"{contas_pagar} conta(s) a pagar")
-    
-    return dependencies
+    return check_dependencies(db, [
+        ("conta(s) a pagar", categorias.condicao(database.ContaPagar, "categoria", {categoria.id}, {categoria.nome})),
+    ])
 
-def check_categoria_receber_dependencies(db: Session, categoria_nome: str):
+def check_categoria_receber_dependencies(db: Session, categoria: database.CategoriaReceber):
     """Verifica se uma categoria de receber está sendo usada"""
-    dependencies = []
-    
-    # Verificar contas a receber que usam esta categoria
-    contas_receber = db.query(database.ContaReceber).filter(database.ContaReceber.categoria == categoria_nome).count()
-    if contas_receber > 0:
-        dependencies.append(f"{contas_receber} conta(s) a receber")
-    
-    return dependencies
+    return check_dependencies(db, [
+        ("conta(s) a receber", categorias.condicao(database.ContaReceber, "categoria", {categoria.id}, {categoria.nome})),
+    ])
 
-def check_origem_receber_dependencies(db: Session, origem_nome: str):
+def check_origem_receber_dependencies(db: Session, origem: database.OrigemReceber):
     """Verifica se uma origem de receber está sendo usada"""
-    dependencies = []
-    
-    # Verificar contas a receber que usam esta origem
-    contas_receber = db.query(database.ContaReceber).filter(database.ContaReceber.origem == origem_nome).count()
-    if contas_receber > 0:
-        dependencies.append(f"{contas_receber} conta(s) a receber")
-    
-    return dependencies
-app = FastAPI(title="Sistema Financeiro Associação")
+    return check_dependencies(db, [
+        ("conta(s) a receber", categorias.condicao(database.ContaReceber, "origem", {origem.id}, {origem.nome})),
+    ])
+
+app = FastAPI(title="Sistema Financeiro Associação", lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-
-
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -142,20 +101,21 @@ database.create_tables()
 # Rotas de autenticação
 @app.post("/api/token", response_model=schemas.Token)
 @limiter.limit("5/minute")
-async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
-    if not user:
+async def login_for_access_token(request: Request, background_tasks: BackgroundTasks, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+    # Banco e bcrypt rodam em pools dedicados para não bloquear o event loop
+    user = await workers.run_db_work(auth.get_user, db, form_data.username)
+    if not user or not await workers.run_password_work(auth.verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Invalidar todas as sessões ativas do usuário antes de criar uma nova
-    auth.invalidate_all_user_sessions(db, user.id)
+    # Criar nova sessão do usuário (invalida as sessões ativas anteriores)
+    session_token = await workers.run_db_work(auth.create_user_session, db, user.id, request)
     
-    # Criar nova sessão do usuário
-    session_token = auth.create_user_session(db, user.id, request)
+    # Localização é resolvida depois da resposta, fora do caminho do login
+    background_tasks.add_task(auth.update_session_location, session_token.id, session_token.ip_address)
     
     # Criar token JWT que inclui o session_token
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -178,18 +138,13 @@ def register_user(user: schemas.UsuarioCreate, db: Session = Depends(database.ge
 def read_fornecedores_doadores(
     page: int = 1, 
     size: int = 20, 
+    cursor: Optional[str] = None,
+    with_total: bool = True,
     db: Session = Depends(database.get_db), 
     current_user: database.Usuario = Depends(auth.get_current_user)
 ):
-    pagination = schemas.PaginationParams(page=page, size=size)
-    
-    total = db.query(func.count(database.FornecedorDoador.id)).scalar()
-    db_items = db.query(database.FornecedorDoador).offset(pagination.skip).limit(pagination.limit).all()
-    
-    # Converter objetos SQLAlchemy para schemas Pydantic
-    items = [schemas.FornecedorDoador.from_orm(item) for item in db_items]
-    
-    return schemas.PaginatedResponse.create(items, total, pagination)
+    pagination = schemas.PaginationParams(page=page, size=size, cursor=cursor, with_total=with_total)
+    return paginate(db.query(database.FornecedorDoador), pagination, [database.FornecedorDoador.id], schemas.FornecedorDoador)
 
 @app.post("/api/fornecedores-doadores", response_model=schemas.FornecedorDoador)
 def create_fornecedor_doador(
@@ -244,9 +199,22 @@ def delete_fornecedor_doador(fornecedor_id: int, db: Session = Depends(database.
     return {"message": "Fornecedor/Doador excluído com sucesso"}
 
 # Rotas para Beneficiários
-@app.get("/api/beneficiarios", response_model=List[schemas.Beneficiario])
-def read_beneficiarios(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    return db.query(database.Beneficiario).offset(skip).limit(limit).all()
+@app.get("/api/beneficiarios", response_model=Union[schemas.PaginatedResponse, List[schemas.Beneficiario]])
+def read_beneficiarios(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    size: int = 20,
+    with_total: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    query = db.query(database.Beneficiario)
+    # Com `cursor` (vazio na primeira página) responde paginado por keyset
+    if cursor is not None:
+        pagination = schemas.PaginationParams(size=size, cursor=cursor, with_total=with_total)
+        return paginate(query, pagination, [database.Beneficiario.id], schemas.Beneficiario)
+    return query.offset(skip).limit(limit).all()
 
 @app.post("/api/beneficiarios", response_model=schemas.Beneficiario)
 def create_beneficiario(beneficiario: schemas.BeneficiarioCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
@@ -294,13 +262,28 @@ def delete_beneficiario(beneficiario_id: int, db: Session = Depends(database.get
     return {"message": "Beneficiário excluído com sucesso"}
 
 # Rotas para Contas
-@app.get("/api/contas", response_model=List[schemas.Conta])
-def read_contas(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    return db.query(database.Conta).offset(skip).limit(limit).all()
+@app.get("/api/contas", response_model=Union[schemas.PaginatedResponse, List[schemas.Conta]])
+def read_contas(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    size: int = 20,
+    with_total: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    query = db.query(database.Conta)
+    # Com `cursor` (vazio na primeira página) responde paginado por keyset
+    if cursor is not None:
+        pagination = schemas.PaginationParams(size=size, cursor=cursor, with_total=with_total)
+        return paginate(query, pagination, [database.Conta.id], schemas.Conta)
+    return query.offset(skip).limit(limit).all()
 
 @app.post("/api/contas", response_model=schemas.Conta)
 def create_conta(conta: schemas.ContaCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
     db_conta = database.Conta(**conta.dict())
+    # Conta nova: saldo atual = saldo inicial (sem movimentações)
+    db_conta.saldo_atual = conta.saldo_inicial or 0.0
     db.add(db_conta)
     db.commit()
     db.refresh(db_conta)
@@ -315,13 +298,28 @@ def read_conta(conta_id: int, db: Session = Depends(database.get_db), current_us
 
 @app.put("/api/contas/{conta_id}", response_model=schemas.Conta)
 def update_conta(conta_id: int, conta: schemas.ContaCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
+    """
+    Altera só os campos enviados no corpo.
+
+    Um novo `saldo_inicial` desloca o `saldo_atual` pela diferença (as movimentações continuam
+    valendo sobre o saldo inicial novo) e descarta os checkpoints de saldo da conta.
+    """
     db_conta = db.query(database.Conta).filter(database.Conta.id == conta_id).first()
     if db_conta is None:
         raise HTTPException(status_code=404, detail="Conta not found")
     
-    for key, value in conta.dict().items():
+    # Só os campos enviados; o saldo inicial não é zerado quando o formulário não o envia
+    dados = conta.dict(exclude_unset=True)
+    saldo_inicial_anterior = db_conta.saldo_inicial or 0.0
+    for key, value in dados.items():
         setattr(db_conta, key, value)
     
+    # Mudança no saldo inicial desloca o saldo atual pela diferença (incremento atômico)
+    if "saldo_inicial" in dados:
+        diferenca = (dados["saldo_inicial"] or 0.0) - saldo_inicial_anterior
+        if diferenca:
+            saldos.ajustar_saldo(db, conta_id, diferenca)
+    
     db.commit()
     db.refresh(db_conta)
     return db_conta
@@ -339,19 +337,177 @@ def delete_conta(conta_id: int, db: Session = Depends(database.get_db), current_
         detail_msg += "Para excluir, primeiro remova ou transfira estes vínculos para outra conta."
         raise HTTPException(status_code=400, detail=detail_msg)
     
+    saldos.descartar_checkpoints(db, conta_id=conta_id)
     db.delete(db_conta)
     db.commit()
     return {"message": "Conta excluída com sucesso"}
 
+@app.get("/api/contas/{conta_id}/saldo", response_model=schemas.SaldoEmData)
+def read_saldo_conta_em_data(
+    conta_id: int,
+    data: date = Query(...),
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    """Saldo da conta ao fim do dia informado"""
+    db_conta = db.query(database.Conta).filter(database.Conta.id == conta_id).first()
+    if db_conta is None:
+        raise HTTPException(status_code=404, detail="Conta não encontrada")
+    if db_conta.data_saldo_inicial and data < db_conta.data_saldo_inicial:
+        raise HTTPException(status_code=400, detail="Data anterior ao saldo inicial da conta")
+    return saldos.saldo_em(db, db_conta, data)
+
 # Rotas para Contas a Pagar
-@app.get("/api/contas-pagar", response_model=List[schemas.ContaPagar])
-def read_contas_pagar(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    return db.query(database.ContaPagar).offset(skip).limit(limit).all()
+# Colunas aceitas em ordenar_por
+ORDENACAO_CONTAS_PAGAR = {
+    "status": database.ContaPagar.status,
+    "fornecedor": database.FornecedorDoador.nome_razao,
+    "beneficiario": database.Beneficiario.nome,
+    "conta": database.Conta.nome_conta,
+    "categoria": func.coalesce(database.CategoriaPagar.nome, database.ContaPagar.categoria),  # Nome atual do cadastro
+    "valor": database.ContaPagar.valor,
+    "data_emissao": database.ContaPagar.data_emissao,
+    "data_vencimento": database.ContaPagar.data_vencimento,
+    "data_pagamento": database.ContaPagar.data_pagamento,
+}
+
+# Nome exibido usado em filtros/ordenação por relacionamento: ordenar_por -> (coluna do id, coluna do nome)
+NOMES_CONTAS_PAGAR = {
+    "fornecedor": (database.FornecedorDoador.id, database.FornecedorDoador.nome_razao, "fornecedor_id"),
+    "beneficiario": (database.Beneficiario.id, database.Beneficiario.nome, "beneficiario_id"),
+    "conta": (database.Conta.id, database.Conta.nome_conta, "conta_id"),
+}
+
+def _parcelas_virtuais_contas_pagar(db: Session, status_conta, filtro_categoria, conta_id, fornecedor, beneficiario,
+                                    vencimento_inicio, vencimento_fim, ordenar_por):
+    """
+    Parcelas virtuais (regras de recorrência) que atendem aos filtros da listagem.
+
+    Retorna pares (valor de ordenação, parcela); as parcelas virtuais estão sempre pendentes.
+    """
+    if status_conta and status_conta != "Pendente":
+        return []
+    parcelas = recorrencia.parcelas_virtuais(db, "pagar", vencimento_inicio, vencimento_fim)
+    if filtro_categoria:
+        ids, nomes = filtro_categoria
+        parcelas = [p for p in parcelas if categorias.atende(database.ContaPagar, "categoria", p, ids, nomes)]
+    if conta_id:
+        parcelas = [p for p in parcelas if p["conta_id"] in conta_id]
+    if not parcelas:
+        return []
+
+    # Nomes dos relacionamentos, só quando algum filtro ou a ordenação precisa deles
+    nomes = {}
+    for chave in {k for k, filtro in (("fornecedor", fornecedor), ("beneficiario", beneficiario)) if filtro} | (
+        {ordenar_por} if ordenar_por in NOMES_CONTAS_PAGAR else set()
+    ):
+        coluna_id, coluna_nome, campo = NOMES_CONTAS_PAGAR[chave]
+        ids = {p[campo] for p in parcelas if p[campo] is not None}
+        nomes[chave] = dict(db.query(coluna_id, coluna_nome).filter(coluna_id.in_(ids)).all()) if ids else {}
+
+    def nome(parcela, chave):
+        _, _, campo = NOMES_CONTAS_PAGAR[chave]
+        return nomes[chave].get(parcela[campo])
+
+    if fornecedor:
+        parcelas = [p for p in parcelas if fornecedor.casefold() in (nome(p, "fornecedor") or "").casefold()]
+    if beneficiario:
+        parcelas = [p for p in parcelas if beneficiario.casefold() in (nome(p, "beneficiario") or "").casefold()]
+
+    if ordenar_por in NOMES_CONTAS_PAGAR:
+        return [(nome(p, ordenar_por), p) for p in parcelas]
+    return [(p[ordenar_por], p) for p in parcelas]
+
+@app.get("/api/contas-pagar", response_model=schemas.ContaPagarPaginatedResponse)
+def read_contas_pagar(
+    page: int = 1,
+    size: int = 20,
+    status_conta: Optional[str] = Query(None, alias="status"),
+    categoria: Optional[List[str]] = Query(None),
+    categoria_id: Optional[List[int]] = Query(None),
+    conta_id: Optional[List[int]] = Query(None),
+    fornecedor: Optional[str] = None,
+    beneficiario: Optional[str] = None,
+    vencimento_inicio: Optional[date] = None,
+    vencimento_fim: Optional[date] = None,
+    ordenar_por: str = "data_vencimento",
+    direcao: str = "asc",
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Lista contas a pagar com filtros, ordenação e paginação no banco.
+
+    Das séries recorrentes só as parcelas vencidas estão gravadas; as futuras do período (sem
+    `vencimento_fim`, até a janela das séries) entram como virtuais (`virtual=true`), intercaladas
+    na ordenação pedida.
+    """
+    if ordenar_por not in ORDENACAO_CONTAS_PAGAR:
+        raise HTTPException(status_code=400, detail=f"Ordenação inválida: {ordenar_por}")
+    if direcao not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail=f"Direção inválida: {direcao}")
+    
+    pagination = schemas.PaginationParams(page=page, size=size)
+    query = db.query(database.ContaPagar)
+    
+    # Joins apenas quando o filtro ou a ordenação precisam deles
+    if fornecedor or ordenar_por == "fornecedor":
+        query = query.join(database.FornecedorDoador, database.ContaPagar.fornecedor_id == database.FornecedorDoador.id)
+    if beneficiario or ordenar_por == "beneficiario":
+        query = query.outerjoin(database.Beneficiario, database.ContaPagar.beneficiario_id == database.Beneficiario.id)
+    if ordenar_por == "conta":
+        query = query.outerjoin(database.Conta, database.ContaPagar.conta_id == database.Conta.id)
+    if ordenar_por == "categoria":
+        query = query.outerjoin(database.CategoriaPagar, database.ContaPagar.categoria_id == database.CategoriaPagar.id)
+    
+    # Categoria por nome e/ou id; a consulta usa o id (e o nome só nas linhas ainda sem id)
+    filtro_categoria = None
+    if categoria or categoria_id:
+        filtro_categoria = categorias.resolver(db, database.ContaPagar, "categoria", categoria, categoria_id)
+        query = query.filter(categorias.condicao(database.ContaPagar, "categoria", *filtro_categoria))
+    
+    if status_conta:
+        query = query.filter(database.ContaPagar.status == status_conta)
+    if conta_id:
+        query = query.filter(database.ContaPagar.conta_id.in_(conta_id))
+    if fornecedor:
+        query = query.filter(database.FornecedorDoador.nome_razao.ilike(f"%{fornecedor}%"))
+    if beneficiario:
+        query = query.filter(database.Beneficiario.nome.ilike(f"%{beneficiario}%"))
+    if vencimento_inicio:
+        query = query.filter(database.ContaPagar.data_vencimento >= vencimento_inicio)
+    if vencimento_fim:
+        query = query.filter(database.ContaPagar.data_vencimento <= vencimento_fim)
+    
+    # Total de registros e soma dos valores filtrados em uma única agregação
+    total, valor_total = query.with_entities(
+        func.count(database.ContaPagar.id),
+        func.coalesce(func.sum(database.ContaPagar.valor), 0.0)
+    ).one()
+    
+    coluna = ORDENACAO_CONTAS_PAGAR[ordenar_por]
+    if direcao == "desc":
+        query = query.order_by(coluna.desc(), database.ContaPagar.id.desc())
+    else:
+        query = query.order_by(coluna.asc(), database.ContaPagar.id.asc())
+    
+    virtuais = _parcelas_virtuais_contas_pagar(
+        db, status_conta, filtro_categoria, conta_id, fornecedor, beneficiario,
+        vencimento_inicio, vencimento_fim or recorrencia.janela(), ordenar_por
+    )
+    total += len(virtuais)
+    valor_total += sum(parcela["valor"] or 0 for _, parcela in virtuais)
+    db_items = recorrencia.paginar_com_virtuais(
+        query, virtuais, pagination.skip, pagination.limit, coluna=coluna, decrescente=direcao == "desc"
+    )
+    items = [
+        schemas.ContaPagar(**item) if isinstance(item, dict) else schemas.ContaPagar.from_orm(item)
+        for item in db_items
+    ]
+    return schemas.ContaPagarPaginatedResponse.create(items, total, pagination, valor_total=valor_total)
 
 @app.post("/api/contas-pagar", response_model=schemas.ContaPagar)
 def create_conta_pagar(conta: schemas.ContaPagarCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    from datetime import datetime, timedelta
-    from dateutil.relativedelta import relativedelta
     import uuid
     
     # Gerar ID único para o grupo de recorrência se for recorrente
@@ -367,70 +523,18 @@ def create_conta_pagar(conta: schemas.ContaPagarCreate, db: Session = Depends(da
     
     db_conta = database.ContaPagar(**conta_data)
     db.add(db_conta)
-    db.commit()
-    db.refresh(db_conta)
     
-    # Se foi criada como "Pago", criar movimentação imediatamente
+    # Se foi criada como "Pago", lança o pagamento (movimentação e saldo) na mesma transação
     if conta.status == "Pago":
-        # Definir data_pagamento como hoje se não foi definida
-        if not db_conta.data_pagamento:
-            db_conta.data_pagamento = datetime.utcnow().date()
-            
-        # Buscar nome do fornecedor (sempre obrigatório)
-        fornecedor = db.query(database.FornecedorDoador).filter(database.FornecedorDoador.id == conta.fornecedor_id).first()
-        nome_fornecedor = fornecedor.nome_razao if fornecedor else "Fornecedor"
-        
-        # Se tem beneficiário, incluir no descritivo
-        if conta.beneficiario_id:
-            beneficiario = db.query(database.Beneficiario).filter(database.Beneficiario.id == conta.beneficiario_id).first()
-            nome_beneficiario = beneficiario.nome if beneficiario else "Beneficiário"
-            descricao = f"Pagamento - {nome_fornecedor} (para {nome_beneficiario})"
-        else:
-            descricao = f"Pagamento - {nome_fornecedor}"
-        
-        # Criar movimentação de saída
-        movimentacao = database.MovimentacaoFinanceira(
-            conta_id=conta.conta_id,
-            tipo_movimentacao="SAIDA",
-            valor=conta.valor,
-            data_movimentacao=datetime.utcnow(),
-            descricao=descricao,
-            categoria=conta.categoria,
-            origem_tipo="CONTA_PAGAR",
-            origem_id=db_conta.id,
-            usuario_id=current_user.id,
-            observacao=conta.observacao
-        )
-        db.add(movimentacao)
-        
-        # Atualizar saldo da conta
-        conta_obj = db.query(database.Conta).filter(database.Conta.id == conta.conta_id).first()
-        if conta_obj:
-            conta_obj.saldo_atual = conta_obj.saldo_atual - conta.valor
-        
-        db.commit()
+        lancamentos.pagar(db, db_conta, current_user.id)
     
-    # Se for recorrente, criar as parcelas futuras (meses_repetir - 1 parcelas adicionais)
-    if conta.recorrente and conta.meses_repetir and conta.meses_repetir > 1:
-        for i in range(2, conta.meses_repetir + 1):  # Começar do 2 porque a primeira já foi criada
-            nova_data_vencimento = conta.data_vencimento + relativedelta(months=i-1)
-            nova_data_emissao = conta.data_emissao + relativedelta(months=i-1)
-            
-            # Criar nova conta recorrente
-            nova_conta_data = conta.model_dump()
-            nova_conta_data['data_vencimento'] = nova_data_vencimento
-            nova_conta_data['data_emissao'] = nova_data_emissao
-            nova_conta_data['data_pagamento'] = None  # Resetar data de pagamento
-            nova_conta_data['status'] = 'Pendente'  # Sempre pendente para parcelas futuras
-            nova_conta_data['parcela_numero'] = i
-            nova_conta_data['parcela_total'] = conta.meses_repetir
-            nova_conta_data['grupo_recorrencia'] = grupo_recorrencia
-            
-            nova_conta = database.ContaPagar(**nova_conta_data)
-            db.add(nova_conta)
-        
-        db.commit()
+    # Se for recorrente, grava a regra (e as parcelas já vencidas); as futuras ficam virtuais
+    if grupo_recorrencia:
+        recorrencia.criar_regra(db, "pagar", conta_data, grupo_recorrencia, conta.meses_repetir)
     
+    # Conta, movimentação, saldo e regra confirmados em um único commit
+    db.commit()
+    db.refresh(db_conta)
     return db_conta
 
 @app.get("/api/contas-pagar/{conta_id}", response_model=schemas.ContaPagar)
@@ -446,49 +550,18 @@ def update_conta_pagar(conta_id: int, conta: schemas.ContaPagarCreate, db: Sessi
     if db_conta is None:
         raise HTTPException(status_code=404, detail="Conta a Pagar not found")
     
-    # Verificar se o status está mudando para "Pago"
-    status_anterior = db_conta.status
+    # Estado lançado antes da edição
+    pago_anterior = db_conta.status == "Pago"
+    lancado = (db_conta.conta_id, db_conta.valor)
     
     for key, value in conta.dict().items():
         setattr(db_conta, key, value)
     
-       # Se mudou para pago e não era pago antes, criar movimentação
-    if conta.status == "Pago" and status_anterior != "Pago":
-        # Definir data_pagamento como hoje se não foi definida
-        if not db_conta.data_pagamento:
-            db_conta.data_pagamento = datetime.utcnow().date()
-            
-        # Buscar nome do fornecedor (sempre obrigatório)
-        fornecedor = db.query(database.FornecedorDoador).filter(database.FornecedorDoador.id == conta.fornecedor_id).first()
-        nome_fornecedor = fornecedor.nome_razao if fornecedor else "Fornecedor"
-        
-        # Se tem beneficiário, incluir no descritivo
-        if conta.beneficiario_id:
-            beneficiario = db.query(database.Beneficiario).filter(database.Beneficiario.id == conta.beneficiario_id).first()
-            nome_beneficiario = beneficiario.nome if beneficiario else "Beneficiário"
-            descricao = f"Pagamento - {nome_fornecedor} (para {nome_beneficiario})"
-        else:
-            descricao = f"Pagamento - {nome_fornecedor}"
-        
-        # Criar movimentação de saída
-        movimentacao = database.MovimentacaoFinanceira(
-            conta_id=conta.conta_id,
-            tipo_movimentacao="SAIDA",
-            valor=conta.valor,
-            data_movimentacao=datetime.utcnow(),
-            descricao=descricao,
-            categoria=conta.categoria,
-            origem_tipo="CONTA_PAGAR",
-            origem_id=conta_id,
-            usuario_id=current_user.id,
-            observacao=conta.observacao
-        )
-        db.add(movimentacao)
-        
-        # Atualizar saldo da conta
-        conta_obj = db.query(database.Conta).filter(database.Conta.id == conta.conta_id).first()
-        if conta_obj:
-            conta_obj.saldo_atual = conta_obj.saldo_atual - conta.valor
+    # Pagamento novo, desfeito ou com conta/valor editados: estorna e/ou lança na mesma transação
+    lancamentos.atualizar_liquidacao(
+        db, lancamentos.ORIGEM_CONTA_PAGAR, db_conta, lancamentos.pagar, current_user.id,
+        pago_anterior, db_conta.status == "Pago", (db_conta.conta_id, db_conta.valor) != lancado,
+    )
     
     db.commit()
     db.refresh(db_conta)
@@ -500,22 +573,12 @@ def delete_conta_pagar(conta_id: int, db: Session = Depends(database.get_db), cu
     if db_conta is None:
         raise HTTPException(status_code=404, detail="Conta a Pagar not found")
     
-    # Se a conta estava paga, remover movimentação e ajustar saldo
+    # Se a conta estava paga, estorna a movimentação e o saldo
     if db_conta.status == "Pago":
-        # Buscar movimentação relacionada
-        movimentacao = db.query(database.MovimentacaoFinanceira).filter(
-            database.MovimentacaoFinanceira.origem_tipo == "CONTA_PAGAR",
-            database.MovimentacaoFinanceira.origem_id == conta_id
-        ).first()
-        
-        if movimentacao:
-            # Reverter saldo da conta (adicionar de volta o valor que foi subtraído)
-            conta_obj = db.query(database.Conta).filter(database.Conta.id == db_conta.conta_id).first()
-            if conta_obj:
-                conta_obj.saldo_atual = conta_obj.saldo_atual + db_conta.valor
-            
-            # Remover movimentação
-            db.delete(movimentacao)
+        lancamentos.estornar(db, lancamentos.ORIGEM_CONTA_PAGAR, conta_id)
+    
+    # Parcela de série com regra não deve voltar a ser gerada
+    recorrencia.cancelar_parcela(db, db_conta.grupo_recorrencia, db_conta.parcela_numero)
     
     # Remover conta a pagar
     db.delete(db_conta)
@@ -523,17 +586,44 @@ def delete_conta_pagar(conta_id: int, db: Session = Depends(database.get_db), cu
     return {"message": "Conta a Pagar deleted successfully"}
 
 # Rotas para Contas a Receber
-@app.get("/api/contas-receber", response_model=List[schemas.ContaReceber])
-def read_contas_receber(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    return db.query(database.ContaReceber).options(
+@app.get("/api/contas-receber", response_model=Union[schemas.PaginatedResponse, List[schemas.ContaReceber]])
+def read_contas_receber(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    size: int = 20,
+    with_total: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    query = db.query(database.ContaReceber).options(
         joinedload(database.ContaReceber.fornecedor_doador),
         joinedload(database.ContaReceber.conta)
-    ).offset(skip).limit(limit).all()
+    )
+    # Com `cursor` (vazio na primeira página) responde paginado por keyset, só com parcelas gravadas
+    if cursor is not None:
+        pagination = schemas.PaginationParams(size=size, cursor=cursor, with_total=with_total)
+        return paginate(query, pagination, [database.ContaReceber.id], schemas.ContaReceber)
+    # Depois das gravadas (por id) vêm as parcelas virtuais das séries, por vencimento, até a janela
+    virtuais = [
+        (parcela["data_vencimento"], parcela)
+        for parcela in recorrencia.parcelas_virtuais(db, "receber", fim=recorrencia.janela())
+    ]
+    items = recorrencia.paginar_com_virtuais(query.order_by(database.ContaReceber.id), virtuais, skip, limit)
+    # Fornecedor/doador das virtuais, como o joinedload faz para as gravadas
+    ids = {item["fornecedor_doador_id"] for item in items if isinstance(item, dict)} - {None}
+    fornecedores = {
+        fornecedor.id: schemas.FornecedorDoador.from_orm(fornecedor)
+        for fornecedor in db.query(database.FornecedorDoador).filter(database.FornecedorDoador.id.in_(ids))
+    } if ids else {}
+    return [
+        schemas.ContaReceber(**item, fornecedor_doador=fornecedores.get(item["fornecedor_doador_id"]))
+        if isinstance(item, dict) else schemas.ContaReceber.from_orm(item)
+        for item in items
+    ]
 
 @app.post("/api/contas-receber", response_model=schemas.ContaReceber)
 def create_conta_receber(conta: schemas.ContaReceberCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    from datetime import datetime, timedelta
-    from dateutil.relativedelta import relativedelta
     import uuid
     
     # Gerar ID único para o grupo de recorrência se for recorrente
@@ -549,30 +639,18 @@ def create_conta_receber(conta: schemas.ContaReceberCreate, db: Session = Depend
     
     db_conta = database.ContaReceber(**conta_data)
     db.add(db_conta)
-    db.commit()
-    db.refresh(db_conta)
     
-    # Se for recorrente, criar as parcelas futuras (meses_repetir - 1 parcelas adicionais)
-    if conta.recorrente and conta.meses_repetir and conta.meses_repetir > 1:
-        for i in range(2, conta.meses_repetir + 1):  # Começar do 2 porque a primeira já foi criada
-            nova_data_vencimento = conta.data_vencimento + relativedelta(months=i-1)
-            nova_data_emissao = conta.data_emissao + relativedelta(months=i-1)
-            
-            # Criar nova conta recorrente
-            nova_conta_data = conta.model_dump()
-            nova_conta_data['data_vencimento'] = nova_data_vencimento
-            nova_conta_data['data_emissao'] = nova_data_emissao
-            nova_conta_data['data_recebimento'] = None  # Resetar data de recebimento
-            nova_conta_data['status'] = 'Pendente'  # Sempre pendente para parcelas futuras
-            nova_conta_data['parcela_numero'] = i
-            nova_conta_data['parcela_total'] = conta.meses_repetir
-            nova_conta_data['grupo_recorrencia'] = grupo_recorrencia
-            
-            nova_conta = database.ContaReceber(**nova_conta_data)
-            db.add(nova_conta)
-        
-        db.commit()
+    # Se foi criada como "Recebido", lança o recebimento na mesma transação
+    if conta.status == "Recebido":
+        lancamentos.receber(db, db_conta, current_user.id)
+    
+    # Se for recorrente, grava a regra (e as parcelas já vencidas); as futuras ficam virtuais
+    if grupo_recorrencia:
+        recorrencia.criar_regra(db, "receber", conta_data, grupo_recorrencia, conta.meses_repetir)
     
+    # Conta, movimentação, saldo e regra confirmados em um único commit
+    db.commit()
+    db.refresh(db_conta)
     return db_conta
 
 @app.get("/api/contas-receber/{conta_id}", response_model=schemas.ContaReceber)
@@ -591,33 +669,18 @@ def update_conta_receber(conta_id: int, conta: schemas.ContaReceberCreate, db: S
     if db_conta is None:
         raise HTTPException(status_code=404, detail="Conta a Receber not found")
     
-    # Verificar se o status está mudando para "Recebido"
-    status_anterior = db_conta.status
+    # Estado lançado antes da edição
+    recebido_anterior = db_conta.status == "Recebido"
+    lancado = (db_conta.conta_id, db_conta.valor)
     
     for key, value in conta.dict().items():
         setattr(db_conta, key, value)
     
-    # Se mudou para "Recebido" e não era "Recebido" antes, criar movimentação
-    if conta.status == "Recebido" and status_anterior != "Recebido":
-        # Criar movimentação de entrada
-        movimentacao = database.MovimentacaoFinanceira(
-            conta_id=conta.conta_id,
-            tipo_movimentacao="ENTRADA",
-            valor=conta.valor,
-            data_movimentacao=datetime.utcnow(),
-            descricao=f"Recebimento - {conta.categoria}",
-            categoria=conta.categoria,
-            origem_tipo="CONTA_RECEBER",
-            origem_id=conta_id,
-            usuario_id=current_user.id,
-            observacao=conta.observacao
-        )
-        db.add(movimentacao)
-        
-        # Atualizar saldo da conta
-        conta_obj = db.query(database.Conta).filter(database.Conta.id == conta.conta_id).first()
-        if conta_obj:
-            conta_obj.saldo_atual = conta_obj.saldo_atual + conta.valor
+    # Recebimento novo, desfeito ou com conta/valor editados: estorna e/ou lança na mesma transação
+    lancamentos.atualizar_liquidacao(
+        db, lancamentos.ORIGEM_CONTA_RECEBER, db_conta, lancamentos.receber, current_user.id,
+        recebido_anterior, db_conta.status == "Recebido", (db_conta.conta_id, db_conta.valor) != lancado,
+    )
     
     db.commit()
     db.refresh(db_conta)
@@ -629,64 +692,229 @@ def delete_conta_receber(conta_id: int, db: Session = Depends(database.get_db),
     if db_conta is None:
         raise HTTPException(status_code=404, detail="Conta a Receber not found")
     
-    # Se a conta estava recebida, remover movimentação e ajustar saldo
+    # Se a conta estava recebida, estorna a movimentação e o saldo
     if db_conta.status == "Recebido":
-        # Buscar movimentação relacionada
-        movimentacao = db.query(database.MovimentacaoFinanceira).filter(
-            database.MovimentacaoFinanceira.origem_tipo == "CONTA_RECEBER",
-            database.MovimentacaoFinanceira.origem_id == conta_id
-        ).first()
-        
-        if movimentacao:
-            # Reverter saldo da conta (subtrair de volta o valor que foi adicionado)
-            conta_obj = db.query(database.Conta).filter(database.Conta.id == db_conta.conta_id).first()
-            if conta_obj:
-                conta_obj.saldo_atual = conta_obj.saldo_atual - db_conta.valor
-            
-            # Remover movimentação
-            db.delete(movimentacao)
+        lancamentos.estornar(db, lancamentos.ORIGEM_CONTA_RECEBER, conta_id)
+    
+    # Parcela de série com regra não deve voltar a ser gerada
+    recorrencia.cancelar_parcela(db, db_conta.grupo_recorrencia, db_conta.parcela_numero)
     
     # Remover conta a receber
     db.delete(db_conta)
     db.commit()
     return {"message": "Conta a Receber deleted successfully"}
 
+# Movimentações financeiras de um lançamento (origem)
+@app.get("/api/movimentacoes", response_model=List[schemas.MovimentacaoFinanceira])
+def read_movimentacoes(
+    origem_tipo: Optional[str] = None,
+    origem_id: Optional[int] = None,
+    conta_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    """Lista as movimentações, filtrando pelo lançamento de origem (índice origem_tipo, origem_id) ou pela conta"""
+    if origem_id is not None and not origem_tipo:
+        raise HTTPException(status_code=400, detail="Informe origem_tipo junto com origem_id")
+    movimentacao = database.MovimentacaoFinanceira
+    query = db.query(movimentacao)
+    if origem_tipo:
+        query = query.filter(movimentacao.origem_tipo == origem_tipo)
+    if origem_id is not None:
+        query = query.filter(movimentacao.origem_id == origem_id)
+    if conta_id is not None:
+        query = query.filter(movimentacao.conta_id == conta_id)
+    return query.order_by(movimentacao.data_movimentacao.desc(), movimentacao.id.desc()).offset(skip).limit(limit).all()
+
+# Rotas para regras de recorrência
+SCHEMAS_PARCELA = {"pagar": schemas.ContaPagar, "receber": schemas.ContaReceber}
+SCHEMAS_PARCELA_CREATE = {"pagar": schemas.ContaPagarCreate, "receber": schemas.ContaReceberCreate}
+
+def get_regra_or_404(db: Session, regra_id: int) -> database.RegraRecorrencia:
+    regra = db.query(database.RegraRecorrencia).filter(database.RegraRecorrencia.id == regra_id).first()
+    if regra is None:
+        raise HTTPException(status_code=404, detail="Regra de recorrência não encontrada")
+    return regra
+
+@app.get("/api/recorrencias", response_model=List[schemas.RegraRecorrencia])
+def read_recorrencias(
+    tipo: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    query = db.query(database.RegraRecorrencia).filter(database.RegraRecorrencia.ativa == True)
+    if tipo:
+        query = query.filter(database.RegraRecorrencia.tipo == tipo)
+    return query.order_by(database.RegraRecorrencia.id).all()
+
+@app.post("/api/recorrencias", response_model=schemas.RegraRecorrencia)
+def create_recorrencia(
+    regra: schemas.RegraRecorrenciaCreate,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    """Cria uma série (com total ou sem fim); só as parcelas já vencidas são gravadas"""
+    import uuid
+    
+    if regra.tipo not in SCHEMAS_PARCELA_CREATE:
+        raise HTTPException(status_code=400, detail=f"Tipo inválido: {regra.tipo}")
+    if regra.intervalo_meses < 1 or (regra.total_parcelas is not None and regra.total_parcelas < 1):
+        raise HTTPException(status_code=400, detail="Intervalo e total de parcelas devem ser positivos")
+    # Valida os valores das parcelas com o mesmo schema da criação de contas
+    modelo = {campo: valor for campo, valor in regra.modelo.items() if campo not in recorrencia.CAMPOS_DA_PARCELA}
+    try:
+        parcela = SCHEMAS_PARCELA_CREATE[regra.tipo](
+            **modelo,
+            status="Pendente",
+            data_emissao=regra.data_emissao_inicio or regra.data_inicio,
+            data_vencimento=regra.data_inicio,
+            recorrente=True,
+            meses_repetir=regra.total_parcelas,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    db_regra = recorrencia.criar_regra(
+        db, regra.tipo, parcela.model_dump(), str(uuid.uuid4()), regra.total_parcelas, regra.intervalo_meses
+    )
+    db.commit()
+    db.refresh(db_regra)
+    return db_regra
+
+@app.post("/api/recorrencias/{regra_id}/parcelas/{numero}")
+def materializar_parcela(
+    regra_id: int,
+    numero: int,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    """Grava a parcela virtual `numero` da série (para editar ou pagar) e a retorna"""
+    regra = get_regra_or_404(db, regra_id)
+    try:
+        parcela = recorrencia.materializar(db, regra, numero)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    db.refresh(parcela)
+    return SCHEMAS_PARCELA[regra.tipo].from_orm(parcela)
+
+@app.post("/api/recorrencias/{regra_id}/materializar")
+def materializar_parcelas_ate(
+    regra_id: int,
+    ate: date = Query(...),
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    """Grava em lote as parcelas virtuais da série com vencimento até `ate`"""
+    regra = get_regra_or_404(db, regra_id)
+    gravadas = recorrencia.materializar_ate(db, regra, ate)
+    db.commit()
+    return {"message": "Parcelas gravadas com sucesso", "parcelas_gravadas": gravadas}
+
+# Rotas para séries recorrentes (todas as parcelas de um grupo_recorrencia)
+CAMPOS_SERIE = {
+    "pagar": {"valor", "categoria", "conta_id", "observacao", "fornecedor_id", "beneficiario_id"},
+    "receber": {"valor", "categoria", "conta_id", "observacao", "fornecedor_doador_id", "origem"},
+}
+
+def get_serie_or_404(db: Session, tipo: str, grupo: str):
+    modelo = recorrencia.MODELOS[tipo]
+    existe = db.query(modelo.id).filter(modelo.grupo_recorrencia == grupo).first()
+    if existe is None and recorrencia.regra_do_grupo(db, grupo) is None:
+        raise HTTPException(status_code=404, detail="Série recorrente não encontrada")
+
+def atualizar_serie(db: Session, tipo: str, grupo: str, serie: schemas.SerieUpdate) -> schemas.SerieResultado:
+    get_serie_or_404(db, tipo, grupo)
+    valores = serie.model_dump(exclude_unset=True)
+    a_partir_de = valores.pop("a_partir_de", 1)
+    invalidos = set(valores) - CAMPOS_SERIE[tipo]
+    if invalidos:
+        raise HTTPException(status_code=400, detail=f"Campos não permitidos: {', '.join(sorted(invalidos))}")
+    if not valores:
+        raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
+    if a_partir_de < 1:
+        raise HTTPException(status_code=400, detail="a_partir_de deve ser positivo")
+    afetadas = recorrencia.atualizar_serie(db, tipo, grupo, valores, a_partir_de)
+    db.commit()
+    return schemas.SerieResultado(grupo_recorrencia=grupo, parcelas_afetadas=afetadas)
+
+def cancelar_serie(db: Session, tipo: str, grupo: str, a_partir_de: int) -> schemas.SerieResultado:
+    get_serie_or_404(db, tipo, grupo)
+    afetadas = recorrencia.cancelar_serie(db, tipo, grupo, a_partir_de)
+    db.commit()
+    return schemas.SerieResultado(grupo_recorrencia=grupo, parcelas_afetadas=afetadas)
+
+def reagendar_serie(db: Session, tipo: str, grupo: str, reagendamento: schemas.SerieReagendamento) -> schemas.SerieResultado:
+    get_serie_or_404(db, tipo, grupo)
+    if reagendamento.a_partir_de < 1 or (reagendamento.intervalo_meses is not None and reagendamento.intervalo_meses < 1):
+        raise HTTPException(status_code=400, detail="a_partir_de e intervalo_meses devem ser positivos")
+    afetadas = recorrencia.reagendar_serie(
+        db, tipo, grupo, reagendamento.data_vencimento, reagendamento.a_partir_de, reagendamento.intervalo_meses
+    )
+    db.commit()
+    return schemas.SerieResultado(grupo_recorrencia=grupo, parcelas_afetadas=afetadas)
+
+@app.put("/api/contas-pagar/serie/{grupo}", response_model=schemas.SerieResultado)
+def update_serie_contas_pagar(grupo: str, serie: schemas.SerieUpdate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
+    """Altera as parcelas pendentes da série a partir de `a_partir_de`"""
+    return atualizar_serie(db, "pagar", grupo, serie)
+
+@app.delete("/api/contas-pagar/serie/{grupo}", response_model=schemas.SerieResultado)
+def cancel_serie_contas_pagar(grupo: str, a_partir_de: int = Query(1, ge=1), db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
+    """Exclui as parcelas pendentes restantes da série"""
+    return cancelar_serie(db, "pagar", grupo, a_partir_de)
+
+@app.post("/api/contas-pagar/serie/{grupo}/reagendar", response_model=schemas.SerieResultado)
+def reschedule_serie_contas_pagar(grupo: str, reagendamento: schemas.SerieReagendamento, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
+    """Move os vencimentos das parcelas pendentes da série"""
+    return reagendar_serie(db, "pagar", grupo, reagendamento)
+
+@app.put("/api/contas-receber/serie/{grupo}", response_model=schemas.SerieResultado)
+def update_serie_contas_receber(grupo: str, serie: schemas.SerieUpdate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
+    """Altera as parcelas pendentes da série a partir de `a_partir_de`"""
+    return atualizar_serie(db, "receber", grupo, serie)
+
+@app.delete("/api/contas-receber/serie/{grupo}", response_model=schemas.SerieResultado)
+def cancel_serie_contas_receber(grupo: str, a_partir_de: int = Query(1, ge=1), db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
+    """Exclui as parcelas pendentes restantes da série"""
+    return cancelar_serie(db, "receber", grupo, a_partir_de)
+
+@app.post("/api/contas-receber/serie/{grupo}/reagendar", response_model=schemas.SerieResultado)
+def reschedule_serie_contas_receber(grupo: str, reagendamento: schemas.SerieReagendamento, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
+    """Move os vencimentos das parcelas pendentes da série"""
+    return reagendar_serie(db, "receber", grupo, reagendamento)
+
 # Rotas para Doações Avulsas
-@app.get("/api/doacoes-avulsas", response_model=List[schemas.DoacaoAvulsa])
-def read_doacoes_avulsas(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    return db.query(database.DoacaoAvulsa).offset(skip).limit(limit).all()
+@app.get("/api/doacoes-avulsas", response_model=Union[schemas.PaginatedResponse, List[schemas.DoacaoAvulsa]])
+def read_doacoes_avulsas(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    size: int = 20,
+    with_total: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    query = db.query(database.DoacaoAvulsa)
+    # Com `cursor` (vazio na primeira página) responde paginado por keyset
+    if cursor is not None:
+        pagination = schemas.PaginationParams(size=size, cursor=cursor, with_total=with_total)
+        return paginate(query, pagination, [database.DoacaoAvulsa.data, database.DoacaoAvulsa.id], schemas.DoacaoAvulsa)
+    return query.offset(skip).limit(limit).all()
 
 @app.post("/api/doacoes-avulsas", response_model=schemas.DoacaoAvulsa)
 def create_doacao_avulsa(doacao: schemas.DoacaoAvulsaCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
     db_doacao = database.DoacaoAvulsa(**doacao.dict())
     db.add(db_doacao)
-    db.commit()
-    db.refresh(db_doacao)
     
-    # Se foi criada como recebida, criar movimentação
+    # Se foi criada como recebida, lança a doação na mesma transação
     if db_doacao.recebido:
-        # Criar movimentação de entrada
-        movimentacao = database.MovimentacaoFinanceira(
-            conta_id=db_doacao.conta_id,
-            tipo_movimentacao="ENTRADA",
-            valor=db_doacao.valor,
-            data_movimentacao=datetime.utcnow(),
-            descricao=f"Doação - {db_doacao.nome_doador}",
-            categoria="Doação",
-            origem_tipo="DOACAO",
-            origem_id=db_doacao.id,
-            usuario_id=current_user.id,
-            observacao=db_doacao.observacao
-        )
-        db.add(movimentacao)
-        
-        # Atualizar saldo da conta
-        conta_obj = db.query(database.Conta).filter(database.Conta.id == db_doacao.conta_id).first()
-        if conta_obj:
-            conta_obj.saldo_atual = conta_obj.saldo_atual + db_doacao.valor
-        
-        db.commit()
+        lancamentos.doar(db, db_doacao, current_user.id)
     
+    db.commit()
+    db.refresh(db_doacao)
     return db_doacao
 
 @app.get("/api/doacoes-avulsas/{doacao_id}", response_model=schemas.DoacaoAvulsa)
@@ -702,33 +930,18 @@ def update_doacao_avulsa(doacao_id: int, doacao: schemas.DoacaoAvulsaCreate, db:
     if db_doacao is None:
         raise HTTPException(status_code=404, detail="Doação Avulsa not found")
     
-    # Verificar se está mudando para recebido
-    recebido_anterior = db_doacao.recebido
+    # Estado lançado antes da edição
+    recebido_anterior = bool(db_doacao.recebido)
+    lancado = (db_doacao.conta_id, db_doacao.valor)
     
     for key, value in doacao.dict().items():
         setattr(db_doacao, key, value)
     
-    # Se mudou para recebido e não era recebido antes, criar movimentação
-    if doacao.recebido and not recebido_anterior:
-        # Criar movimentação de entrada
-        movimentacao = database.MovimentacaoFinanceira(
-            conta_id=doacao.conta_id,
-            tipo_movimentacao="ENTRADA",
-            valor=doacao.valor,
-            data_movimentacao=datetime.utcnow(),
-            descricao=f"Doação - {doacao.nome_doador}",
-            categoria="Doação",
-            origem_tipo="DOACAO",
-            origem_id=doacao_id,
-            usuario_id=current_user.id,
-            observacao=doacao.observacao
-        )
-        db.add(movimentacao)
-        
-        # Atualizar saldo da conta
-        conta_obj = db.query(database.Conta).filter(database.Conta.id == doacao.conta_id).first()
-        if conta_obj:
-            conta_obj.saldo_atual = conta_obj.saldo_atual + doacao.valor
+    # Doação recebida, desfeita ou com conta/valor editados: estorna e/ou lança na mesma transação
+    lancamentos.atualizar_liquidacao(
+        db, lancamentos.ORIGEM_DOACAO, db_doacao, lancamentos.doar, current_user.id,
+        recebido_anterior, bool(db_doacao.recebido), (db_doacao.conta_id, db_doacao.valor) != lancado,
+    )
     
     db.commit()
     db.refresh(db_doacao)
@@ -740,22 +953,9 @@ def delete_doacao_avulsa(doacao_id: int, db: Session = Depends(database.get_db),
     if db_doacao is None:
         raise HTTPException(status_code=404, detail="Doação Avulsa not found")
     
-    # Se a doação estava recebida, remover movimentação e ajustar saldo
+    # Se a doação estava recebida, estorna a movimentação e o saldo
     if db_doacao.recebido:
-        # Buscar movimentação relacionada
-        movimentacao = db.query(database.MovimentacaoFinanceira).filter(
-            database.MovimentacaoFinanceira.origem_tipo == "DOACAO",
-            database.MovimentacaoFinanceira.origem_id == doacao_id
-        ).first()
-        
-        if movimentacao:
-            # Reverter saldo da conta (subtrair de volta o valor que foi adicionado)
-            conta_obj = db.query(database.Conta).filter(database.Conta.id == db_doacao.conta_id).first()
-            if conta_obj:
-                conta_obj.saldo_atual = conta_obj.saldo_atual - db_doacao.valor
-            
-            # Remover movimentação
-            db.delete(movimentacao)
+        lancamentos.estornar(db, lancamentos.ORIGEM_DOACAO, doacao_id)
     
     # Remover doação
     db.delete(db_doacao)
@@ -763,9 +963,22 @@ def delete_doacao_avulsa(doacao_id: int, db: Session = Depends(database.get_db),
     return {"message": "Doação Avulsa deleted successfully"}
 
 # Rotas para Usuários
-@app.get("/api/users", response_model=List[schemas.Usuario])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    return db.query(database.Usuario).offset(skip).limit(limit).all()
+@app.get("/api/users", response_model=Union[schemas.PaginatedResponse, List[schemas.Usuario]])
+def read_users(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    size: int = 20,
+    with_total: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    query = db.query(database.Usuario)
+    # Com `cursor` (vazio na primeira página) responde paginado por keyset
+    if cursor is not None:
+        pagination = schemas.PaginationParams(size=size, cursor=cursor, with_total=with_total)
+        return paginate(query, pagination, [database.Usuario.id], schemas.Usuario)
+    return query.offset(skip).limit(limit).all()
 
 @app.delete("/api/users/{user_id}")
 def delete_user(user_id: int, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
@@ -784,14 +997,30 @@ def delete_user(user_id: int, db: Session = Depends(database.get_db), current_us
         detail_msg += "Este histórico é importante para auditoria e não pode ser removido."
         raise HTTPException(status_code=400, detail=detail_msg)
     
+    # Sessões do usuário referenciam a tabela de usuários (foreign_keys=ON)
+    auth.invalidate_all_user_sessions(db, user_id)
+    db.query(database.UserSession).filter(database.UserSession.usuario_id == user_id).delete(synchronize_session=False)
     db.delete(db_user)
     db.commit()
     return {"message": "Usuário excluído com sucesso"}
 
 # Rotas para Categorias de Ajuda
-@app.get("/api/categorias-ajuda", response_model=List[schemas.CategoriaAjuda])
-def read_categorias_ajuda(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    return db.query(database.CategoriaAjuda).filter(database.CategoriaAjuda.ativo == True).offset(skip).limit(limit).all()
+@app.get("/api/categorias-ajuda", response_model=Union[schemas.PaginatedResponse, List[schemas.CategoriaAjuda]])
+def read_categorias_ajuda(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    size: int = 20,
+    with_total: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    query = db.query(database.CategoriaAjuda).filter(database.CategoriaAjuda.ativo == True)
+    # Com `cursor` (vazio na primeira página) responde paginado por keyset
+    if cursor is not None:
+        pagination = schemas.PaginationParams(size=size, cursor=cursor, with_total=with_total)
+        return paginate(query, pagination, [database.CategoriaAjuda.id], schemas.CategoriaAjuda)
+    return query.offset(skip).limit(limit).all()
 
 @app.post("/api/categorias-ajuda", response_model=schemas.CategoriaAjuda)
 def create_categoria_ajuda(categoria: schemas.CategoriaAjudaCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
@@ -812,9 +1041,22 @@ def delete_categoria_ajuda(categoria_id: int, db: Session = Depends(database.get
     return {"message": "Categoria desativada com sucesso"}
 
 # Rotas para Categorias de Pagar
-@app.get("/api/categorias-pagar", response_model=List[schemas.CategoriaPagar])
-def read_categorias_pagar(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    return db.query(database.CategoriaPagar).filter(database.CategoriaPagar.ativo == True).offset(skip).limit(limit).all()
+@app.get("/api/categorias-pagar", response_model=Union[schemas.PaginatedResponse, List[schemas.CategoriaPagar]])
+def read_categorias_pagar(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    size: int = 20,
+    with_total: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    query = db.query(database.CategoriaPagar).filter(database.CategoriaPagar.ativo == True)
+    # Com `cursor` (vazio na primeira página) responde paginado por keyset
+    if cursor is not None:
+        pagination = schemas.PaginationParams(size=size, cursor=cursor, with_total=with_total)
+        return paginate(query, pagination, [database.CategoriaPagar.id], schemas.CategoriaPagar)
+    return query.offset(skip).limit(limit).all()
 
 @app.post("/api/categorias-pagar", response_model=schemas.CategoriaPagar)
 def create_categoria_pagar(categoria: schemas.CategoriaPagarCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
@@ -824,6 +1066,23 @@ def create_categoria_pagar(categoria: schemas.CategoriaPagarCreate, db: Session
     db.refresh(db_categoria)
     return db_categoria
 
+@app.put("/api/categorias-pagar/{categoria_id}", response_model=schemas.CategoriaPagar)
+def update_categoria_pagar(categoria_id: int, categoria: schemas.CategoriaPagarCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
+    """Altera o cadastro; os lançamentos apontam para o id, então renomear não reescreve nenhum deles"""
+    db_categoria = db.query(database.CategoriaPagar).filter(database.CategoriaPagar.id == categoria_id).first()
+    if db_categoria is None:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+    duplicada = db.query(database.CategoriaPagar.id).filter(
+        database.CategoriaPagar.nome == categoria.nome, database.CategoriaPagar.id != categoria_id
+    ).first()
+    if duplicada:
+        raise HTTPException(status_code=400, detail="Já existe uma categoria com este nome")
+    for key, value in categoria.model_dump().items():
+        setattr(db_categoria, key, value)
+    db.commit()
+    db.refresh(db_categoria)
+    return db_categoria
+
 @app.delete("/api/categorias-pagar/{categoria_id}")
 def delete_categoria_pagar(categoria_id: int, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
     db_categoria = db.query(database.CategoriaPagar).filter(database.CategoriaPagar.id == categoria_id).first()
@@ -831,7 +1090,7 @@ def delete_categoria_pagar(categoria_id: int, db: Session = Depends(database.get
         raise HTTPException(status_code=404, detail="Categoria não encontrada")
     
     # Verificar dependências antes de desativar
-    dependencies = check_categoria_pagar_dependencies(db, db_categoria.nome)
+    dependencies = check_categoria_pagar_dependencies(db, db_categoria)
     if dependencies:
         detail_msg = f"Não é possível desativar esta categoria pois ela está sendo usada em: {', '.join(dependencies)}. "
         detail_msg += "Para desativar, primeiro altere a categoria dessas contas."
@@ -844,9 +1103,22 @@ def delete_categoria_pagar(categoria_id: int, db: Session = Depends(database.get
 # Rotas para Tipos de Pagamento removidas - não serão mais utilizadas
 
 # Rotas para Categorias de Receber
-@app.get("/api/categorias-receber", response_model=List[schemas.CategoriaReceber])
-def read_categorias_receber(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    return db.query(database.CategoriaReceber).filter(database.CategoriaReceber.ativo == True).offset(skip).limit(limit).all()
+@app.get("/api/categorias-receber", response_model=Union[schemas.PaginatedResponse, List[schemas.CategoriaReceber]])
+def read_categorias_receber(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    size: int = 20,
+    with_total: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    query = db.query(database.CategoriaReceber).filter(database.CategoriaReceber.ativo == True)
+    # Com `cursor` (vazio na primeira página) responde paginado por keyset
+    if cursor is not None:
+        pagination = schemas.PaginationParams(size=size, cursor=cursor, with_total=with_total)
+        return paginate(query, pagination, [database.CategoriaReceber.id], schemas.CategoriaReceber)
+    return query.offset(skip).limit(limit).all()
 
 @app.post("/api/categorias-receber", response_model=schemas.CategoriaReceber)
 def create_categoria_receber(categoria: schemas.CategoriaReceberCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
@@ -856,6 +1128,23 @@ def create_categoria_receber(categoria: schemas.CategoriaReceberCreate, db: Sess
     db.refresh(db_categoria)
     return db_categoria
 
+@app.put("/api/categorias-receber/{categoria_id}", response_model=schemas.CategoriaReceber)
+def update_categoria_receber(categoria_id: int, categoria: schemas.CategoriaReceberCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
+    """Altera o cadastro; os lançamentos apontam para o id, então renomear não reescreve nenhum deles"""
+    db_categoria = db.query(database.CategoriaReceber).filter(database.CategoriaReceber.id == categoria_id).first()
+    if db_categoria is None:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+    duplicada = db.query(database.CategoriaReceber.id).filter(
+        database.CategoriaReceber.nome == categoria.nome, database.CategoriaReceber.id != categoria_id
+    ).first()
+    if duplicada:
+        raise HTTPException(status_code=400, detail="Já existe uma categoria com este nome")
+    for key, value in categoria.model_dump().items():
+        setattr(db_categoria, key, value)
+    db.commit()
+    db.refresh(db_categoria)
+    return db_categoria
+
 @app.delete("/api/categorias-receber/{categoria_id}")
 def delete_categoria_receber(categoria_id: int, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
     db_categoria = db.query(database.CategoriaReceber).filter(database.CategoriaReceber.id == categoria_id).first()
@@ -863,7 +1152,7 @@ def delete_categoria_receber(categoria_id: int, db: Session = Depends(database.g
         raise HTTPException(status_code=404, detail="Categoria não encontrada")
     
     # Verificar dependências antes de desativar
-    dependencies = check_categoria_receber_dependencies(db, db_categoria.nome)
+    dependencies = check_categoria_receber_dependencies(db, db_categoria)
     if dependencies:
         detail_msg = f"Não é possível desativar esta categoria pois ela está sendo usada em: {', '.join(dependencies)}. "
         detail_msg += "Para desativar, primeiro altere a categoria dessas contas."
@@ -874,9 +1163,22 @@ def delete_categoria_receber(categoria_id: int, db: Session = Depends(database.g
     return {"message": "Categoria desativada com sucesso"}
 
 # Rotas para Origens de Receber
-@app.get("/api/origens-receber", response_model=List[schemas.OrigemReceber])
-def read_origens_receber(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    return db.query(database.OrigemReceber).filter(database.OrigemReceber.ativo == True).offset(skip).limit(limit).all()
+@app.get("/api/origens-receber", response_model=Union[schemas.PaginatedResponse, List[schemas.OrigemReceber]])
+def read_origens_receber(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    size: int = 20,
+    with_total: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    query = db.query(database.OrigemReceber).filter(database.OrigemReceber.ativo == True)
+    # Com `cursor` (vazio na primeira página) responde paginado por keyset
+    if cursor is not None:
+        pagination = schemas.PaginationParams(size=size, cursor=cursor, with_total=with_total)
+        return paginate(query, pagination, [database.OrigemReceber.id], schemas.OrigemReceber)
+    return query.offset(skip).limit(limit).all()
 
 @app.post("/api/origens-receber", response_model=schemas.OrigemReceber)
 def create_origem_receber(origem: schemas.OrigemReceberCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
@@ -886,6 +1188,23 @@ def create_origem_receber(origem: schemas.OrigemReceberCreate, db: Session = Dep
     db.refresh(db_origem)
     return db_origem
 
+@app.put("/api/origens-receber/{origem_id}", response_model=schemas.OrigemReceber)
+def update_origem_receber(origem_id: int, origem: schemas.OrigemReceberCreate, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
+    """Altera o cadastro; os lançamentos apontam para o id, então renomear não reescreve nenhum deles"""
+    db_origem = db.query(database.OrigemReceber).filter(database.OrigemReceber.id == origem_id).first()
+    if db_origem is None:
+        raise HTTPException(status_code=404, detail="Origem não encontrada")
+    duplicada = db.query(database.OrigemReceber.id).filter(
+        database.OrigemReceber.nome == origem.nome, database.OrigemReceber.id != origem_id
+    ).first()
+    if duplicada:
+        raise HTTPException(status_code=400, detail="Já existe uma origem com este nome")
+    for key, value in origem.model_dump().items():
+        setattr(db_origem, key, value)
+    db.commit()
+    db.refresh(db_origem)
+    return db_origem
+
 @app.delete("/api/origens-receber/{origem_id}")
 def delete_origem_receber(origem_id: int, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
     db_origem = db.query(database.OrigemReceber).filter(database.OrigemReceber.id == origem_id).first()
@@ -893,7 +1212,7 @@ def delete_origem_receber(origem_id: int, db: Session = Depends(database.get_db)
         raise HTTPException(status_code=404, detail="Origem não encontrada")
     
     # Verificar dependências antes de desativar
-    dependencies = check_origem_receber_dependencies(db, db_origem.nome)
+    dependencies = check_origem_receber_dependencies(db, db_origem)
     if dependencies:
         detail_msg = f"Não é possível desativar esta origem pois ela está sendo usada em: {', '.join(dependencies)}. "
         detail_msg += "Para desativar, primeiro altere a origem dessas contas."
@@ -906,66 +1225,46 @@ def delete_origem_receber(origem_id: int, db: Session = Depends(database.get_db)
 # Rota para Dashboard
 @app.get("/api/dashboard", response_model=schemas.DashboardData)
 def get_dashboard_data(db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
-    hoje = date.today()
-    inicio_mes = hoje.replace(day=1)
-    fim_mes = hoje.replace(day=calendar.monthrange(hoje.year, hoje.month)[1])
-    
-    # Total a pagar hoje
-    total_pagar_hoje = db.query(database.ContaPagar).filter(
-        database.ContaPagar.data_vencimento == hoje,
-        database.ContaPagar.status == "Pendente"
-    ).with_entities(database.ContaPagar.valor).all()
-    total_pagar_hoje = sum([x[0] for x in total_pagar_hoje]) if total_pagar_hoje else 0
-    
-    # Total a pagar no mês
-    total_pagar_mes = db.query(database.ContaPagar).filter(
-        database.ContaPagar.data_vencimento >= inicio_mes,
-        database.ContaPagar.data_vencimento <= fim_mes,
-        database.ContaPagar.status == "Pendente"
-    ).with_entities(database.ContaPagar.valor).all()
-    total_pagar_mes = sum([x[0] for x in total_pagar_mes]) if total_pagar_mes else 0
-    
-    # Total a receber hoje
-    total_receber_hoje = db.query(database.ContaReceber).filter(
-        database.ContaReceber.data_vencimento == hoje,
-        database.ContaReceber.status == "Pendente"
-    ).with_entities(database.ContaReceber.valor).all()
-    total_receber_hoje = sum([x[0] for x in total_receber_hoje]) if total_receber_hoje else 0
-    
-    # Total a receber no mês
-    total_receber_mes = db.query(database.ContaReceber).filter(
-        database.ContaReceber.data_vencimento >= inicio_mes,
-        database.ContaReceber.data_vencimento <= fim_mes,
-        database.ContaReceber.status == "Pendente"
-    ).with_entities(database.ContaReceber.valor).all()
-    total_receber_mes = sum([x[0] for x in total_receber_mes]) if total_receber_mes else 0
-    
-    # Total de doações no mês
-    total_doacoes_mes = db.query(database.DoacaoAvulsa).filter(
-        database.DoacaoAvulsa.data >= inicio_mes,
-        database.DoacaoAvulsa.data <= fim_mes,
-        database.DoacaoAvulsa.recebido == True
-    ).with_entities(database.DoacaoAvulsa.valor).all()
-    total_doacoes_mes = sum([x[0] for x in total_doacoes_mes]) if total_doacoes_mes else 0
-    
-    # Saldos por conta (simplificado)
-    contas = db.query(database.Conta).all()
-    saldos_contas = []
-    for conta in contas:
-        saldos_contas.append({
-            "nome_conta": conta.nome_conta,
-            "saldo": conta.saldo_atual
-        })
-    
-    return {
-        "total_pagar_hoje": total_pagar_hoje,
-        "total_pagar_mes": total_pagar_mes,
-        "total_receber_hoje": total_receber_hoje,
-        "total_receber_mes": total_receber_mes,
-        "total_doacoes_mes": total_doacoes_mes,
-        "saldos_contas": saldos_contas,
-        "previsao_futura": {}
-    }
+    return dashboard.em_cache("dashboard", (), lambda: dashboard.get_dashboard(db))
+
+@app.get("/api/dashboard/mensal", response_model=schemas.DashboardMensal)
+def get_dashboard_mensal(
+    ano: int = Query(..., ge=1900, le=9999),
+    mes: int = Query(..., ge=1, le=12),
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    """Totais do mês e quebras por categoria e beneficiário, calculados no banco"""
+    return dashboard.em_cache("mensal", (ano, mes), lambda: dashboard.resumo_mensal(db, ano, mes))
+
+@app.get("/api/dashboard/previsao")
+def get_dashboard_previsao(
+    dias: int = Query(previsao.PREVISAO_DIAS, ge=1, le=previsao.PREVISAO_DIAS_MAX),
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    """Saldo diário projetado de cada conta a partir das parcelas pendentes"""
+    return dashboard.em_cache("previsao", (dias,), lambda: previsao.projetar_saldos(db, dias))
+
+@app.get("/api/dashboard/anual", response_model=List[schemas.ResumoAnualItem])
+def get_dashboard_anual(
+    ano: int = Query(..., ge=1900, le=9999),
+    db: Session = Depends(database.get_db),
+    current_user: database.Usuario = Depends(auth.get_current_user)
+):
+    """Totais por mês, tipo e status do ano, lidos do resumo mensal (com as parcelas virtuais do ano)"""
+    def calcular():
+        virtuais = {
+            tipo: recorrencia.parcelas_virtuais(db, tipo, date(ano, 1, 1), date(ano, 12, 31))
+            for tipo in recorrencia.MODELOS
+        }
+        return rollup.resumo_anual(db, ano, virtuais)
+    return dashboard.em_cache("anual", (ano,), calcular)
+
+@app.get("/api/dashboard/cache-stats")
+def get_dashboard_cache_stats(current_user: database.Usuario = Depends(auth.get_current_user)):
+    """Acertos/erros do cache do painel e versão atual dos dados"""
+    return dashboard.cache_stats()
 
 # Rotas para servir o frontend
 @app.get("/", response_class=HTMLResponse)
@@ -1074,12 +1373,15 @@ if __name__ == "__main__":
 @app.post("/api/contas/reset-saldos")
 def reset_saldos_contas(db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
     """
-    Remove todas as movimentações financeiras e zera completamente os saldos das contas
+    Remove todas as movimentações (financeiras e manuais) e zera completamente os saldos das contas
     """
     try:
-        # Remover todas as movimentações
+        # Remover todas as movimentações (financeiras e manuais de saldo)
         movimentacoes_removidas = db.query(database.MovimentacaoFinanceira).count()
+        movimentacoes_removidas += db.query(database.MovimentacaoConta).count()
         db.query(database.MovimentacaoFinanceira).delete()
+        db.query(database.MovimentacaoConta).delete()
+        saldos.descartar_checkpoints(db)
         
         # Zerar completamente os saldos de todas as contas (inicial e atual)
         contas = db.query(database.Conta).all()
@@ -1106,25 +1408,13 @@ def adicionar_saldo(conta_id: int, request: schemas.SaldoRequest, db: Session =
     if db_conta is None:
         raise HTTPException(status_code=404, detail="Conta not found")
     
-    # Atualizar saldo atual
-    if db_conta.saldo_atual is None:
-        db_conta.saldo_atual = 0
-    db_conta.saldo_atual += request.valor
-    
-    # Criar movimentação
-    movimentacao = database.MovimentacaoConta(
-        conta_id=conta_id,
-        tipo="Entrada",
-        valor=request.valor,
-        data=date.today(),
-        observacao=request.observacao or f"Adição de saldo - {request.valor}"
-    )
-    db.add(movimentacao)
+    # Movimentação e saldo (incremento atômico) na mesma transação
+    lancamentos.movimentar_saldo(db, conta_id, "Entrada", request.valor, request.observacao or f"Adição de saldo - {request.valor}")
     
+    novo_saldo = saldos.saldo_atual(db, conta_id)
     db.commit()
-    db.refresh(db_conta)
     
-    return {"message": "Saldo adicionado com sucesso", "novo_saldo": db_conta.saldo_atual}
+    return {"message": "Saldo adicionado com sucesso", "novo_saldo": novo_saldo}
 
 @app.post("/api/contas/{conta_id}/retirar_saldo")
 def retirar_saldo(conta_id: int, request: schemas.SaldoRequest, db: Session = Depends(database.get_db), current_user: database.Usuario = Depends(auth.get_current_user)):
@@ -1132,31 +1422,17 @@ def retirar_saldo(conta_id: int, request: schemas.SaldoRequest, db: Session = De
     if db_conta is None:
         raise HTTPException(status_code=404, detail="Conta not found")
     
-    # Verificar se há saldo suficiente
-    if db_conta.saldo_atual is None:
-        db_conta.saldo_atual = 0
-    
-    if db_conta.saldo_atual < request.valor:
+    # Verificar o saldo e retirar no mesmo UPDATE, para que retiradas simultâneas não passem ambas
+    if not lancamentos.movimentar_saldo(db, conta_id, "Saída", request.valor, request.observacao or f"Retirada de saldo - {request.valor}"):
+        db.rollback()
+        saldo = saldos.saldo_atual(db, conta_id)
         raise HTTPException(
             status_code=400, 
-            detail=f"Saldo insuficiente. Saldo atual: R$ {db_conta.saldo_atual:.2f}, Valor solicitado: R$ {request.valor:.2f}"
+            detail=f"Saldo insuficiente. Saldo atual: R$ {saldo:.2f}, Valor solicitado: R$ {request.valor:.2f}"
         )
     
-    # Atualizar saldo atual
-    db_conta.saldo_atual -= request.valor
-    
-    # Criar movimentação
-    movimentacao = database.MovimentacaoConta(
-        conta_id=conta_id,
-        tipo="Saída",
-        valor=request.valor,
-        data=date.today(),
-        observacao=request.observacao or f"Retirada de saldo - {request.valor}"
-    )
-    db.add(movimentacao)
-    
+    novo_saldo = saldos.saldo_atual(db, conta_id)
     db.commit()
-    db.refresh(db_conta)
     
-    return {"message": "Saldo retirado com sucesso", "novo_saldo": db_conta.saldo_atual}
+    return {"message": "Saldo retirado com sucesso", "novo_saldo": novo_saldo}
 
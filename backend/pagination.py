@@ -0,0 +1,60 @@
+from datetime import date, datetime
+from sqlalchemy import tuple_, func
+from fastapi import HTTPException
+import base64
+import json
+
+from . import schemas
+
+def encode_cursor(values: list) -> str:
+    """Codifica os valores da chave de ordenação em um cursor opaco"""
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    """Decodifica um cursor, convertendo cada valor para o tipo Python da coluna"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        decoded = []
+        for value, column in zip(values, columns):
+            python_type = column.type.python_type
+            if value is not None and python_type in (date, datetime):
+                value = python_type.fromisoformat(value)
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+
+def paginate(query, pagination: schemas.PaginationParams, order_by: list, schema, descending: bool = False):
+    """
+    Pagina uma consulta e devolve um PaginatedResponse.
+
+    `order_by` é a chave de ordenação, terminando sempre no id (único), ex.:
+    `[ContaReceber.data_vencimento, ContaReceber.id]`. Com `pagination.cursor` a página
+    é buscada por keyset (`WHERE (chave) > (cursor)`), com custo constante em qualquer
+    profundidade; sem cursor, usa offset pela página. O total exato (COUNT) só é
+    calculado quando `pagination.with_total` é verdadeiro.
+    """
+    total = query.order_by(None).with_entities(func.count(order_by[-1])).scalar() if pagination.with_total else None
+
+    key = tuple_(*order_by)
+    if pagination.cursor:
+        values = decode_cursor(pagination.cursor, order_by)
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in order_by])
+    if not pagination.cursor:
+        query = query.offset(pagination.skip)
+
+    # Uma linha a mais indica se existe próxima página
+    rows = query.limit(pagination.limit + 1).all()
+    next_cursor = None
+    if len(rows) > pagination.limit:
+        rows = rows[:pagination.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in order_by])
+
+    items = [schema.from_orm(row) for row in rows]
+    return schemas.PaginatedResponse.create(items, total, pagination, next_cursor=next_cursor)
@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+import numpy as np
+import os
+
+from . import database, recorrencia
+
+# Horizonte padrão da previsão no painel e limite aceito pela API (dias)
+PREVISAO_DIAS = int(os.getenv("PREVISAO_DIAS", "90"))
+PREVISAO_DIAS_MAX = int(os.getenv("PREVISAO_DIAS_MAX", "730"))
+
+def _lancamentos_pendentes(db: Session, modelo, fim: date):
+    """
+    Soma das parcelas pendentes por (conta, vencimento) até `fim`.
+
+    O agrupamento no banco limita o resultado a contas x dias, independentemente
+    de quantas parcelas existam. Das parcelas recorrentes só as vencidas estão gravadas; as
+    virtuais até `fim` são acrescentadas (np.add.at soma as do mesmo dia).
+    """
+    linhas = db.execute(
+        select(modelo.conta_id, modelo.data_vencimento, func.sum(modelo.valor)).where(
+            modelo.status == "Pendente",
+            modelo.conta_id.isnot(None),
+            modelo.data_vencimento.isnot(None),
+            modelo.data_vencimento <= fim,
+        ).group_by(modelo.conta_id, modelo.data_vencimento)
+    ).all()
+    # Parcelas virtuais (futuras, ainda não gravadas) das regras de recorrência, até `fim`
+    tipo, _ = recorrencia.SERIES[modelo]
+    linhas += [
+        (parcela["conta_id"], parcela["data_vencimento"], parcela["valor"])
+        for parcela in recorrencia.parcelas_virtuais(db, tipo, fim=fim)
+        if parcela["conta_id"] is not None
+    ]
+    if not linhas:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[D]"), np.empty(0)
+    contas, vencimentos, valores = zip(*linhas)
+    return (
+        np.array(contas, dtype=np.int64),
+        np.array(vencimentos, dtype="datetime64[D]"),
+        np.array(valores, dtype=float),
+    )
+
+def projetar_saldos(db: Session, dias: int = PREVISAO_DIAS, hoje: date = None) -> dict:
+    """
+    Projeta o saldo diário de cada conta de hoje até `hoje + dias`.
+
+    Parte de `Conta.saldo_atual` e soma as parcelas pendentes de contas a receber e
+    subtrai as de contas a pagar (incluindo as parcelas virtuais das recorrências)
+    em uma grade conta x dia; o saldo é a soma acumulada ao longo dos dias. Parcelas
+    vencidas e ainda pendentes entram no primeiro dia.
+    """
+    hoje = hoje or date.today()
+    dias = max(1, min(dias, PREVISAO_DIAS_MAX))
+    fim = hoje + timedelta(days=dias)
+
+    contas = db.query(database.Conta.id, database.Conta.nome_conta, database.Conta.saldo_atual).order_by(database.Conta.id).all()
+    ids = np.array([c.id for c in contas], dtype=np.int64)
+    grade = np.zeros((len(contas), dias + 1))
+
+    inicio = np.datetime64(hoje, "D")
+    for modelo, sinal in ((database.ContaReceber, 1.0), (database.ContaPagar, -1.0)):
+        conta_ids, vencimentos, valores = _lancamentos_pendentes(db, modelo, fim)
+        linhas = np.searchsorted(ids, conta_ids)
+        conhecidas = (linhas < len(ids)) & (ids[np.minimum(linhas, len(ids) - 1)] == conta_ids) if len(ids) else np.zeros(len(conta_ids), bool)
+        colunas = np.clip((vencimentos - inicio).astype(np.int64), 0, dias)
+        np.add.at(grade, (linhas[conhecidas], colunas[conhecidas]), sinal * np.nan_to_num(valores[conhecidas]))
+
+    saldos_iniciais = np.array([c.saldo_atual or 0.0 for c in contas])
+    saldos = saldos_iniciais[:, None] + np.cumsum(grade, axis=1)
+    total = saldos.sum(axis=0) if len(contas) else np.zeros(dias + 1)
+    datas = [(hoje + timedelta(days=i)).isoformat() for i in range(dias + 1)]
+
+    resultado_contas = []
+    for indice, conta in enumerate(contas):
+        serie = saldos[indice]
+        minimo = int(np.argmin(serie))
+        resultado_contas.append({
+            "conta_id": conta.id,
+            "nome_conta": conta.nome_conta,
+            "saldo_final": round(float(serie[-1]), 2),
+            "saldo_minimo": round(float(serie[minimo]), 2),
+            "data_saldo_minimo": datas[minimo],
+            "saldos": np.round(serie, 2).tolist(),
+        })
+
+    return {
+        "inicio": hoje.isoformat(),
+        "fim": fim.isoformat(),
+        "dias": dias,
+        "datas": datas,
+        "contas": resultado_contas,
+        "total": np.round(total, 2).tolist(),
+    }
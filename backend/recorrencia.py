@@ -0,0 +1,461 @@
+from datetime import date
+from typing import List, Optional, Tuple
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import case, delete, or_, select, update
+from sqlalchemy.orm import Session
+import logging
+import os
+
+from . import categorias, database, rollup
+
+logger = logging.getLogger(__name__)
+
+# Só as parcelas vencidas (até hoje) ficam gravadas; a tarefa periódica grava as que vão vencendo.
+# As futuras são expandidas da regra na leitura (virtuais), limitadas ao período pedido, e só são
+# gravadas quando pagas, editadas ou pedidas explicitamente. Sem fim de período, as séries sem
+# total são expandidas até RECORRENCIA_JANELA_MESES à frente.
+RECORRENCIA_JANELA_MESES = int(os.getenv("RECORRENCIA_JANELA_MESES", "12"))
+RECORRENCIA_INTERVAL_SECONDS = int(os.getenv("RECORRENCIA_INTERVAL_SECONDS", "3600"))
+
+# Modelo -> (tipo no resumo mensal, coluna da data de liquidação)
+SERIES = {
+    database.ContaPagar: ("pagar", "data_pagamento"),
+    database.ContaReceber: ("receber", "data_recebimento"),
+}
+MODELOS = {tipo: modelo for modelo, (tipo, _) in SERIES.items()}
+
+# Campos que variam por parcela e não fazem parte do modelo da regra
+CAMPOS_DA_PARCELA = {
+    "data_emissao", "data_vencimento", "data_pagamento", "data_recebimento",
+    "status", "parcela_numero", "parcela_total", "grupo_recorrencia",
+}
+
+def data_parcela(data_inicial: Optional[date], numero: int, intervalo_meses: int = 1) -> Optional[date]:
+    """Data da parcela `numero` (1 = a própria data inicial)"""
+    if data_inicial is None:
+        return None
+    return data_inicial + relativedelta(months=(numero - 1) * intervalo_meses)
+
+def datas_parcelas(data_emissao: Optional[date], data_vencimento: Optional[date], total: int, intervalo_meses: int = 1) -> List[Tuple[Optional[date], Optional[date]]]:
+    """(emissão, vencimento) de cada parcela da série, a partir da primeira"""
+    return [
+        (data_parcela(data_emissao, numero, intervalo_meses), data_parcela(data_vencimento, numero, intervalo_meses))
+        for numero in range(1, total + 1)
+    ]
+
+def linhas_parcelas_futuras(modelo, dados: dict, total: int, grupo: str) -> list:
+    """Linhas (dicionários de colunas) das parcelas 2..total, sempre pendentes"""
+    _, coluna_liquidacao = SERIES[modelo]
+    linhas = []
+    for numero, (emissao, vencimento) in enumerate(datas_parcelas(dados.get("data_emissao"), dados.get("data_vencimento"), total), start=1):
+        if numero == 1:
+            continue
+        linha = dict(dados)
+        linha.update({
+            "data_emissao": emissao,
+            "data_vencimento": vencimento,
+            coluna_liquidacao: None,
+            "status": "Pendente",
+            "parcela_numero": numero,
+            "parcela_total": total,
+            "grupo_recorrencia": grupo,
+        })
+        linhas.append(linha)
+    return linhas
+
+def inserir_parcelas(db: Session, modelo, linhas: list) -> int:
+    """
+    Insere as parcelas com um único INSERT em lote, na transação da sessão.
+
+    O INSERT em lote não passa pelo flush do ORM, então os ids de categoria/origem e o
+    resumo mensal são preenchidos aqui, na mesma conexão.
+    """
+    if not linhas:
+        return 0
+    tipo, _ = SERIES[modelo]
+    categorias.preencher_ids(db, modelo, linhas)
+    db.execute(modelo.__table__.insert(), linhas)
+    rollup.registrar_lancamentos(db.connection(), tipo, linhas)
+    return len(linhas)
+
+def janela(hoje: Optional[date] = None) -> date:
+    """Vencimento até o qual as séries sem fim são expandidas quando o período não tem fim"""
+    return (hoje or date.today()) + relativedelta(months=RECORRENCIA_JANELA_MESES)
+
+def criar_regra(db: Session, tipo: str, dados: dict, grupo: str, total_parcelas: Optional[int], intervalo_meses: int = 1) -> database.RegraRecorrencia:
+    """Cria a regra da série a partir dos dados da primeira parcela e grava as parcelas já vencidas"""
+    # Com os ids, as parcelas geradas seguem a categoria mesmo se ela for renomeada
+    modelo = {campo: valor for campo, valor in dados.items() if campo not in CAMPOS_DA_PARCELA}
+    categorias.preencher_ids(db, MODELOS[tipo], [modelo])
+    regra = database.RegraRecorrencia(
+        tipo=tipo,
+        grupo_recorrencia=grupo,
+        data_inicio=dados["data_vencimento"],
+        data_emissao_inicio=dados.get("data_emissao"),
+        intervalo_meses=intervalo_meses,
+        total_parcelas=total_parcelas,
+        modelo=modelo,
+        parcelas_canceladas=[],
+        ativa=True,
+    )
+    db.add(regra)
+    materializar_ate(db, regra, date.today())
+    return regra
+
+def _data_da_regra(regra: database.RegraRecorrencia, data_base: Optional[date], numero: int) -> Optional[date]:
+    """Data da parcela `numero`, contada a partir da parcela em que a regra começa a valer"""
+    return data_parcela(data_base, numero - (regra.parcela_inicio or 1) + 1, regra.intervalo_meses)
+
+def _linha_da_regra(regra: database.RegraRecorrencia, numero: int) -> dict:
+    """Colunas da parcela `numero` da regra"""
+    modelo = MODELOS[regra.tipo]
+    _, coluna_liquidacao = SERIES[modelo]
+    linha = dict(regra.modelo)
+    linha.update({
+        "data_emissao": _data_da_regra(regra, regra.data_emissao_inicio, numero),
+        "data_vencimento": _data_da_regra(regra, regra.data_inicio, numero),
+        coluna_liquidacao: None,
+        "status": "Pendente",
+        "recorrente": True,
+        "parcela_numero": numero,
+        "parcela_total": regra.total_parcelas or 0,
+        "grupo_recorrencia": regra.grupo_recorrencia,
+    })
+    return linha
+
+def _primeira_parcela_a_partir(regra: database.RegraRecorrencia, inicio: date) -> int:
+    """Número de parcela próximo (e não posterior) à primeira com vencimento >= inicio"""
+    meses = (inicio.year - regra.data_inicio.year) * 12 + inicio.month - regra.data_inicio.month
+    return (regra.parcela_inicio or 1) + max(0, meses // regra.intervalo_meses - 1)
+
+def _ultima_gravada(regra: database.RegraRecorrencia) -> int:
+    """Número até o qual as parcelas da regra estão gravadas (ou foram canceladas)"""
+    if regra.parcela_gerada is not None:
+        return regra.parcela_gerada
+    # Regra ainda não processada: as anteriores a `parcela_inicio` já estão gravadas
+    return (regra.parcela_inicio or 1) - 1
+
+def _atualizar_proximo(regra: database.RegraRecorrencia):
+    """Recalcula `proximo_vencimento` (primeira parcela não gravada) depois de mudar a regra"""
+    regra.parcela_gerada = _ultima_gravada(regra)
+    canceladas = set(regra.parcelas_canceladas or [])
+    numero = regra.parcela_gerada + 1
+    while numero in canceladas:
+        numero += 1
+    if not regra.ativa or (regra.total_parcelas is not None and numero > regra.total_parcelas):
+        regra.proximo_vencimento = None
+    else:
+        regra.proximo_vencimento = _data_da_regra(regra, regra.data_inicio, numero)
+
+def _com_parcelas_ate(fim: Optional[date]):
+    """Condição das regras que ainda têm parcelas não gravadas com vencimento até `fim`"""
+    regra = database.RegraRecorrencia
+    if fim is None:
+        return or_(regra.parcela_gerada.is_(None), regra.proximo_vencimento.isnot(None))
+    return or_(regra.parcela_gerada.is_(None), regra.proximo_vencimento <= fim)
+
+def parcelas_virtuais(db: Session, tipo: str, inicio: Optional[date] = None, fim: Optional[date] = None) -> list:
+    """
+    Parcelas ainda não gravadas das regras ativas, com vencimento em [inicio, fim].
+
+    As parcelas vencidas já estão gravadas: só as regras com parcelas não gravadas até `fim`
+    são lidas, e cada uma é expandida a partir da primeira não gravada, só dentro do período.
+    Sem `fim`, séries com total são expandidas até a última parcela e séries sem fim até a
+    janela. Parcelas canceladas são omitidas. Cada item traz `virtual=True` e `regra_id`.
+    """
+    regras = db.query(database.RegraRecorrencia).filter(
+        database.RegraRecorrencia.tipo == tipo,
+        database.RegraRecorrencia.ativa == True,
+        _com_parcelas_ate(fim),
+    ).all()
+    if not regras:
+        return []
+
+    modelo = MODELOS[tipo]
+    grupos = [regra.grupo_recorrencia for regra in regras]
+    # Parcelas futuras gravadas individualmente (pagas, editadas ou pedidas antes de vencer)
+    gravadas = set(
+        db.query(modelo.grupo_recorrencia, modelo.parcela_numero)
+        .filter(modelo.grupo_recorrencia.in_(grupos), modelo.parcela_numero > min(_ultima_gravada(r) for r in regras))
+        .all()
+    )
+    limite_sem_fim = janela()
+
+    parcelas = []
+    for regra in regras:
+        limite = fim or (None if regra.total_parcelas is not None else limite_sem_fim)
+        canceladas = set(regra.parcelas_canceladas or [])
+        numero = _ultima_gravada(regra) + 1
+        if inicio:
+            numero = max(numero, _primeira_parcela_a_partir(regra, inicio))
+        while regra.total_parcelas is None or numero <= regra.total_parcelas:
+            vencimento = _data_da_regra(regra, regra.data_inicio, numero)
+            if limite and vencimento > limite:
+                break
+            if (inicio is None or vencimento >= inicio) and numero not in canceladas and (regra.grupo_recorrencia, numero) not in gravadas:
+                linha = _linha_da_regra(regra, numero)
+                linha.update({"id": None, "virtual": True, "regra_id": regra.id})
+                parcelas.append(linha)
+            numero += 1
+    # Nome atual das categorias/origens renomeadas depois da criação da regra
+    return categorias.atualizar_nomes(db, modelo, parcelas)
+
+def regra_do_grupo(db: Session, grupo: Optional[str]) -> Optional[database.RegraRecorrencia]:
+    if not grupo:
+        return None
+    return db.query(database.RegraRecorrencia).filter(database.RegraRecorrencia.grupo_recorrencia == grupo).first()
+
+def materializar(db: Session, regra: database.RegraRecorrencia, numero: int):
+    """
+    Grava a parcela `numero` da regra (ou retorna a já gravada).
+
+    Levanta ValueError se a parcela não existe na série ou foi cancelada.
+    """
+    modelo = MODELOS[regra.tipo]
+    existente = db.query(modelo).filter(
+        modelo.grupo_recorrencia == regra.grupo_recorrencia,
+        modelo.parcela_numero == numero,
+    ).first()
+    if existente:
+        return existente
+
+    # Parcelas anteriores a `parcela_inicio` já estão gravadas ou foram canceladas
+    if numero < (regra.parcela_inicio or 1) or (regra.total_parcelas is not None and numero > regra.total_parcelas):
+        raise ValueError("Parcela fora da série")
+    if numero in (regra.parcelas_canceladas or []):
+        raise ValueError("Parcela cancelada")
+
+    parcela = modelo(**_linha_da_regra(regra, numero))
+    db.add(parcela)
+    db.flush()
+    return parcela
+
+def materializar_ate(db: Session, regra: database.RegraRecorrencia, ate: date) -> int:
+    """
+    Grava em lote as parcelas ainda não gravadas da regra com vencimento até `ate` e avança a
+    marca da regra (`parcela_gerada`/`proximo_vencimento`); retorna quantas foram gravadas.
+    """
+    if not regra.ativa:
+        return 0
+    modelo = MODELOS[regra.tipo]
+    db.flush()  # A parcela inicial pode ter sido adicionada na mesma transação
+    ultima = _ultima_gravada(regra)
+    gravadas = set(db.execute(
+        select(modelo.parcela_numero).where(
+            modelo.grupo_recorrencia == regra.grupo_recorrencia, modelo.parcela_numero > ultima
+        )
+    ).scalars())
+    canceladas = set(regra.parcelas_canceladas or [])
+    linhas = []
+    numero = ultima + 1
+    while regra.total_parcelas is None or numero <= regra.total_parcelas:
+        if _data_da_regra(regra, regra.data_inicio, numero) > ate:
+            break
+        if numero not in canceladas and numero not in gravadas:
+            linhas.append(_linha_da_regra(regra, numero))
+        ultima = numero
+        numero += 1
+    regra.parcela_gerada = ultima
+    _atualizar_proximo(regra)
+    return inserir_parcelas(db, modelo, categorias.atualizar_nomes(db, modelo, linhas))
+
+def materializar_vencidas(hoje: Optional[date] = None) -> int:
+    """
+    Tarefa periódica: grava as parcelas que venceram, uma regra por transação.
+
+    Só as regras com parcelas não gravadas até hoje são lidas. Retorna quantas parcelas
+    foram gravadas.
+    """
+    limite = hoje or date.today()
+    db = database.SessionLocal()
+    try:
+        ids = db.execute(select(database.RegraRecorrencia.id).where(
+            database.RegraRecorrencia.ativa == True, _com_parcelas_ate(limite)
+        )).scalars().all()
+        gravadas = 0
+        for regra_id in ids:
+            regra = db.get(database.RegraRecorrencia, regra_id)
+            gravadas += materializar_ate(db, regra, limite)
+            db.commit()
+        if gravadas:
+            logger.info("Recorrência: %s parcela(s) gravada(s) até %s", gravadas, limite)
+        return gravadas
+    finally:
+        db.close()
+
+def cancelar_parcela(db: Session, grupo: Optional[str], numero: int):
+    """Marca a parcela como cancelada na regra, para que não volte a ser gerada ao ser excluída"""
+    regra = regra_do_grupo(db, grupo)
+    if regra and numero not in (regra.parcelas_canceladas or []):
+        regra.parcelas_canceladas = sorted((regra.parcelas_canceladas or []) + [numero])
+        _atualizar_proximo(regra)
+
+# Operações sobre a série inteira (grupo_recorrencia); só parcelas pendentes são alteradas
+
+def _filtros_serie(modelo, grupo: str, a_partir_de: int) -> list:
+    return [
+        modelo.grupo_recorrencia == grupo,
+        modelo.parcela_numero >= a_partir_de,
+        modelo.status == "Pendente",
+    ]
+
+def _linhas_resumo(db: Session, modelo, filtros: list) -> list:
+    """Colunas que o resumo mensal usa, das parcelas que atendem aos filtros"""
+    linhas = db.execute(select(
+        modelo.parcela_numero, modelo.data_vencimento, modelo.conta_id,
+        modelo.categoria_id, modelo.categoria, modelo.status, modelo.valor,
+    ).where(*filtros)).all()
+    return [dict(linha._mapping) for linha in linhas]
+
+def _gravar_anteriores(db: Session, regra: database.RegraRecorrencia, a_partir_de: int) -> int:
+    """Grava as parcelas ainda não gravadas anteriores a `a_partir_de`, para que mudar a regra não as altere"""
+    if a_partir_de <= _ultima_gravada(regra) + 1:
+        return 0
+    return materializar_ate(db, regra, _data_da_regra(regra, regra.data_inicio, a_partir_de - 1))
+
+def atualizar_serie(db: Session, tipo: str, grupo: str, valores: dict, a_partir_de: int = 1) -> int:
+    """
+    Aplica `valores` às parcelas pendentes da série a partir de `a_partir_de` com um único UPDATE.
+
+    A regra passa a gerar as parcelas virtuais com os novos valores. O UPDATE em massa não
+    passa pelo flush do ORM, então o resumo mensal é ajustado aqui (sai o antes, entra o depois).
+    """
+    modelo = MODELOS[tipo]
+    categorias.preencher_ids(db, modelo, [valores])
+    regra = regra_do_grupo(db, grupo)
+    if regra:
+        _gravar_anteriores(db, regra, a_partir_de)
+        regra.modelo = {**regra.modelo, **valores}
+
+    filtros = _filtros_serie(modelo, grupo, a_partir_de)
+    anteriores = _linhas_resumo(db, modelo, filtros)
+    if not anteriores:
+        return 0
+    resultado = db.execute(
+        update(modelo).where(*filtros).values(**valores).execution_options(synchronize_session=False)
+    )
+    rollup.registrar_lancamentos(db.connection(), tipo, anteriores, sinal=-1)
+    rollup.registrar_lancamentos(db.connection(), tipo, _linhas_resumo(db, modelo, filtros))
+    return resultado.rowcount
+
+def cancelar_serie(db: Session, tipo: str, grupo: str, a_partir_de: int = 1) -> int:
+    """
+    Exclui com um único DELETE as parcelas pendentes da série a partir de `a_partir_de`.
+
+    A regra passa a terminar na parcela anterior (ou é desativada), então as parcelas
+    virtuais seguintes deixam de existir. Parcelas pagas/recebidas são mantidas.
+    """
+    modelo = MODELOS[tipo]
+    regra = regra_do_grupo(db, grupo)
+    if regra:
+        if regra.total_parcelas is None or a_partir_de - 1 < regra.total_parcelas:
+            regra.total_parcelas = a_partir_de - 1
+        if regra.total_parcelas < (regra.parcela_inicio or 1):
+            regra.ativa = False
+        _atualizar_proximo(regra)
+
+    filtros = _filtros_serie(modelo, grupo, a_partir_de)
+    anteriores = _linhas_resumo(db, modelo, filtros)
+    if not anteriores:
+        return 0
+    resultado = db.execute(delete(modelo).where(*filtros).execution_options(synchronize_session=False))
+    rollup.registrar_lancamentos(db.connection(), tipo, anteriores, sinal=-1)
+    return resultado.rowcount
+
+def reagendar_serie(db: Session, tipo: str, grupo: str, data_vencimento: date, a_partir_de: int = 1, intervalo_meses: Optional[int] = None) -> int:
+    """
+    Move a parcela `a_partir_de` para `data_vencimento` e as seguintes a cada `intervalo_meses`.
+
+    A regra passa a valer a partir de `a_partir_de` com as novas datas (a emissão acompanha o
+    deslocamento do vencimento). As parcelas pendentes gravadas recebem as novas datas em um único
+    UPDATE com CASE por número de parcela; as que passam a estar vencidas são gravadas.
+    """
+    modelo = MODELOS[tipo]
+    regra = regra_do_grupo(db, grupo)
+    if regra:
+        _gravar_anteriores(db, regra, a_partir_de)
+        vencimento_anterior = _data_da_regra(regra, regra.data_inicio, a_partir_de)
+        if regra.data_emissao_inicio:
+            regra.data_emissao_inicio = (
+                _data_da_regra(regra, regra.data_emissao_inicio, a_partir_de) + (data_vencimento - vencimento_anterior)
+            )
+        regra.data_inicio = data_vencimento
+        regra.parcela_inicio = a_partir_de
+        regra.intervalo_meses = intervalo_meses or regra.intervalo_meses
+
+    filtros = _filtros_serie(modelo, grupo, a_partir_de)
+    anteriores = _linhas_resumo(db, modelo, filtros)
+    afetadas = _reagendar_gravadas(db, modelo, tipo, regra, filtros, anteriores, data_vencimento, a_partir_de, intervalo_meses)
+    if regra:
+        materializar_ate(db, regra, date.today())
+    return afetadas
+
+def _reagendar_gravadas(db: Session, modelo, tipo: str, regra, filtros: list, anteriores: list,
+                        data_vencimento: date, a_partir_de: int, intervalo_meses: Optional[int]) -> int:
+    """UPDATE com as novas datas das parcelas pendentes gravadas (`anteriores`) da série"""
+    if not anteriores:
+        return 0
+    numeros = [linha["parcela_numero"] for linha in anteriores]
+    if regra:
+        vencimentos = {n: _data_da_regra(regra, regra.data_inicio, n) for n in numeros}
+        emissoes = {n: _data_da_regra(regra, regra.data_emissao_inicio, n) for n in numeros} if regra.data_emissao_inicio else {}
+    else:
+        # Série sem regra (gravada por inteiro): as datas saem só dos parâmetros
+        vencimentos = {n: data_parcela(data_vencimento, n - a_partir_de + 1, intervalo_meses or 1) for n in numeros}
+        emissoes = {}
+
+    valores = {"data_vencimento": case(vencimentos, value=modelo.parcela_numero, else_=modelo.data_vencimento)}
+    if emissoes:
+        valores["data_emissao"] = case(emissoes, value=modelo.parcela_numero, else_=modelo.data_emissao)
+    resultado = db.execute(
+        update(modelo).where(*filtros).values(**valores).execution_options(synchronize_session=False)
+    )
+    rollup.registrar_lancamentos(db.connection(), tipo, anteriores, sinal=-1)
+    rollup.registrar_lancamentos(db.connection(), tipo, _linhas_resumo(db, modelo, filtros))
+    return resultado.rowcount
+
+# Listagens: parcelas gravadas (consulta paginada no banco) intercaladas com as virtuais
+
+def _chave_virtual(valor, indice: int) -> tuple:
+    """Chave de ordenação com nulos primeiro e, em empate, gravadas (0) antes das virtuais (1)"""
+    return ((valor is not None, valor), 1, indice)
+
+def paginar_com_virtuais(query, virtuais: list, skip: int, limit: int, coluna=None, decrescente: bool = False) -> list:
+    """
+    Itens [skip, skip + limit) das parcelas gravadas da `query` com as `virtuais` intercaladas.
+
+    `virtuais` são pares (valor de ordenação, parcela). Com `coluna`, a `query` já vem ordenada
+    por ela e pelo id e as virtuais entram na mesma ordem do banco; sem `coluna`, vêm depois de
+    todas as gravadas, na ordem do valor. Só a fatia de gravadas que pode cair na página é lida.
+    Retorna os objetos do ORM das gravadas e os dicionários das virtuais.
+    """
+    if not virtuais:
+        return query.offset(skip).limit(limit).all()
+    ordenadas = sorted((_chave_virtual(valor, indice), parcela) for indice, (valor, parcela) in enumerate(virtuais))
+    if decrescente:
+        ordenadas.reverse()
+
+    if coluna is None:
+        gravadas = query.offset(skip).limit(limit).all()
+        if len(gravadas) == limit:
+            return gravadas
+        # Página no fim das gravadas: as virtuais começam depois delas
+        total_gravadas = skip + len(gravadas) if gravadas else query.order_by(None).count()
+        posicao = max(0, skip - total_gravadas)
+        return gravadas + [parcela for _, parcela in ordenadas[posicao:posicao + limit - len(gravadas)]]
+
+    # Antes da página há no máximo len(virtuais) virtuais, então as gravadas são lidas a partir
+    # de skip - len(virtuais)
+    inicio = max(0, skip - len(ordenadas))
+    gravadas = [
+        (((valor is not None, valor), 0, item.id), item)
+        for item, valor in query.add_columns(coluna).offset(inicio).limit(skip + limit - inicio)
+    ]
+    # Virtuais que ficam antes da primeira gravada lida (posição `inicio` entre as gravadas)
+    antes = 0
+    if inicio and gravadas:
+        primeira = gravadas[0][0]
+        antes = sum(1 for chave, _ in ordenadas if (chave > primeira if decrescente else chave < primeira))
+    linhas = sorted(gravadas + ordenadas[antes:], key=lambda linha: linha[0], reverse=decrescente)
+    posicao = skip - inicio - antes
+    return [item for _, item in linhas[posicao:posicao + limit]]
@@ -0,0 +1,248 @@
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import logging
+
+from . import database
+
+logger = logging.getLogger(__name__)
+
+# Tolerância na comparação de valores pelo verificador (centavos)
+TOLERANCIA_VALOR = 0.005
+
+# tipo do resumo -> (modelo, coluna de data, função que devolve o status)
+ORIGENS = {
+    "pagar": (database.ContaPagar, "data_vencimento", lambda status: status or ""),
+    "receber": (database.ContaReceber, "data_vencimento", lambda status: status or ""),
+    "doacao": (database.DoacaoAvulsa, "data", lambda recebido: "Recebido" if recebido else "Pendente"),
+}
+TIPO_POR_MODELO = {modelo: tipo for tipo, (modelo, _, _) in ORIGENS.items()}
+
+# Colunas que identificam uma linha do resumo
+CHAVE = ("mes", "conta_id", "categoria_id", "categoria", "tipo", "status")
+
+def primeiro_dia(data: date) -> date:
+    return data.replace(day=1)
+
+def _status_coluna(tipo: str) -> str:
+    return "recebido" if tipo == "doacao" else "status"
+
+def _chave(tipo: str, data, conta_id, categoria_id, categoria, status):
+    """
+    Chave do resumo (mes, conta_id, categoria_id, categoria, tipo, status); None se não há data.
+
+    A categoria entra pelo id, para que renomear o cadastro não divida o total em dois; o
+    nome gravado só separa os lançamentos ainda sem id.
+    """
+    if data is None:
+        return None
+    status_resumo = ORIGENS[tipo][2](status)
+    return (primeiro_dia(data), conta_id or 0, categoria_id or 0, "" if categoria_id else categoria or "", tipo, status_resumo)
+
+def _valor_anterior(obj, atributo):
+    """Valor do atributo como está no banco (antes das alterações pendentes)"""
+    historico = inspect(obj).attrs[atributo].history
+    if historico.deleted:
+        return historico.deleted[0]
+    if historico.added and not historico.unchanged:
+        return None
+    return getattr(obj, atributo)
+
+def _contribuicao(obj, anterior: bool = False):
+    """(chave, valor) com que o lançamento entra no resumo"""
+    tipo = TIPO_POR_MODELO[type(obj)]
+    _, coluna_data, _ = ORIGENS[tipo]
+    ler = (lambda atributo: _valor_anterior(obj, atributo)) if anterior else (lambda atributo: getattr(obj, atributo))
+    categoria_id, categoria = (ler("categoria_id"), ler("categoria")) if tipo != "doacao" else (None, None)
+    chave = _chave(tipo, ler(coluna_data), ler("conta_id"), categoria_id, categoria, ler(_status_coluna(tipo)))
+    return chave, float(ler("valor") or 0)
+
+def _somar(deltas, chave, quantidade, valor):
+    if chave is None:
+        return
+    atual = deltas[chave]
+    deltas[chave] = (atual[0] + quantidade, atual[1] + valor)
+
+def aplicar_deltas(connection, deltas: dict):
+    """Soma (quantidade, valor) a cada chave do resumo, criando a linha se preciso"""
+    tabela = database.ResumoMensal.__table__
+    linhas = [
+        {**dict(zip(CHAVE, chave)), "quantidade": quantidade, "valor": valor}
+        for chave, (quantidade, valor) in deltas.items()
+        if quantidade != 0 or abs(valor) >= TOLERANCIA_VALOR
+    ]
+    if not linhas:
+        return
+    dialeto = {"sqlite": sqlite, "postgresql": postgresql}.get(connection.dialect.name)
+    if dialeto is not None:
+        # Um único upsert em lote (executemany) para todas as chaves
+        stmt = dialeto.insert(tabela)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(CHAVE),
+            set_={
+                "quantidade": tabela.c.quantidade + stmt.excluded.quantidade,
+                "valor": tabela.c.valor + stmt.excluded.valor,
+            },
+        )
+        connection.execute(stmt, linhas)
+        return
+    for linha in linhas:
+        chave = [tabela.c[coluna] == linha[coluna] for coluna in CHAVE]
+        resultado = connection.execute(
+            update(tabela).where(*chave).values(
+                quantidade=tabela.c.quantidade + linha["quantidade"],
+                valor=tabela.c.valor + linha["valor"],
+            )
+        )
+        if resultado.rowcount == 0:
+            connection.execute(tabela.insert().values(**linha))
+
+def registrar_lancamentos(connection, tipo: str, linhas: list, sinal: int = 1):
+    """
+    Atualiza o resumo para lançamentos gravados fora do ORM (INSERT/UPDATE/DELETE em massa).
+
+    `linhas` são dicionários com as colunas do modelo; `sinal=-1` remove a contribuição.
+    """
+    _, coluna_data, _ = ORIGENS[tipo]
+    deltas = defaultdict(lambda: (0, 0.0))
+    for linha in linhas:
+        chave = _chave(
+            tipo, linha.get(coluna_data), linha.get("conta_id"), linha.get("categoria_id"), linha.get("categoria"),
+            linha.get(_status_coluna(tipo)),
+        )
+        _somar(deltas, chave, sinal, sinal * float(linha.get("valor") or 0))
+    aplicar_deltas(connection, deltas)
+
+def _antes_do_flush(session, flush_context, instances):
+    """Calcula as variações do resumo a partir das alterações pendentes da sessão"""
+    deltas = defaultdict(lambda: (0, 0.0))
+    for obj in session.new:
+        if type(obj) in TIPO_POR_MODELO:
+            chave, valor = _contribuicao(obj)
+            _somar(deltas, chave, 1, valor)
+    for obj in session.deleted:
+        if type(obj) in TIPO_POR_MODELO:
+            chave, valor = _contribuicao(obj, anterior=True)
+            _somar(deltas, chave, -1, -valor)
+    for obj in session.dirty:
+        if type(obj) in TIPO_POR_MODELO and session.is_modified(obj, include_collections=False):
+            chave_anterior, valor_anterior = _contribuicao(obj, anterior=True)
+            chave, valor = _contribuicao(obj)
+            _somar(deltas, chave_anterior, -1, -valor_anterior)
+            _somar(deltas, chave, 1, valor)
+    if deltas:
+        # Mesma conexão (e transação) do flush que grava os lançamentos
+        aplicar_deltas(session.connection(), deltas)
+
+def _registrar_valor_anterior(target, value, oldvalue, initiator):
+    """Ouvinte vazio: existe só para ligar active_history no atributo"""
+
+def historico_ativo():
+    """
+    Liga active_history nos atributos lidos por _valor_anterior.
+
+    Sem isso, alterar um lançamento expirado (ex.: depois de um commit) não carrega o valor
+    antigo, e a contribuição anterior nunca sairia do resumo.
+    """
+    for tipo, (modelo, coluna_data, _) in ORIGENS.items():
+        for atributo in {coluna_data, "conta_id", "categoria_id", "categoria", "valor", _status_coluna(tipo)}:
+            if hasattr(modelo, atributo):
+                event.listen(getattr(modelo, atributo), "set", _registrar_valor_anterior, active_history=True)
+
+def acompanhar(fabrica_sessoes):
+    """
+    Mantém o resumo nas sessões criadas por `fabrica_sessoes` (sessionmaker).
+
+    O ouvinte de backend/categorias.py roda antes deste (insert=True lá) e preenche o
+    categoria_id dos lançamentos novos e renomeados que entram na chave.
+    """
+    event.listen(fabrica_sessoes, "before_flush", _antes_do_flush)
+
+historico_ativo()
+acompanhar(database.SessionLocal)
+
+def agregar_origens(db: Session) -> dict:
+    """Recalcula o resumo a partir dos lançamentos (agrupado por dia no banco, por mês aqui)"""
+    totais = defaultdict(lambda: (0, 0.0))
+    for tipo, (modelo, coluna_data, _) in ORIGENS.items():
+        data = getattr(modelo, coluna_data)
+        status = getattr(modelo, _status_coluna(tipo))
+        colunas = [data, modelo.conta_id, status]
+        if tipo != "doacao":
+            colunas += [modelo.categoria_id, modelo.categoria]
+        linhas = db.execute(
+            select(*colunas, func.count(modelo.id), func.coalesce(func.sum(modelo.valor), 0))
+            .where(data.isnot(None))
+            .group_by(*colunas)
+        ).all()
+        for linha in linhas:
+            dia, conta_id, valor_status = linha[0], linha[1], linha[2]
+            categoria_id, categoria = (linha[3], linha[4]) if tipo != "doacao" else (None, None)
+            quantidade, valor = linha[-2], linha[-1]
+            _somar(totais, _chave(tipo, dia, conta_id, categoria_id, categoria, valor_status), quantidade, float(valor))
+    return totais
+
+def reconstruir(db: Session) -> int:
+    """Apaga e recria o resumo inteiro em uma transação; retorna o número de linhas"""
+    totais = agregar_origens(db)
+    tabela = database.ResumoMensal.__table__
+    db.execute(tabela.delete())
+    linhas = [
+        {**dict(zip(CHAVE, chave)), "quantidade": quantidade, "valor": valor}
+        for chave, (quantidade, valor) in totais.items()
+    ]
+    if linhas:
+        db.execute(tabela.insert(), linhas)
+    db.commit()
+    logger.info("Resumo mensal reconstruído: %s linhas", len(linhas))
+    return len(linhas)
+
+def verificar(db: Session) -> list:
+    """Compara o resumo com os lançamentos; retorna as chaves divergentes"""
+    esperado = agregar_origens(db)
+    tabela = database.ResumoMensal.__table__
+    gravado = {
+        tuple(r._mapping[coluna] for coluna in CHAVE): (r.quantidade, r.valor)
+        for r in db.execute(select(tabela)).all()
+    }
+    divergencias = []
+    for chave in sorted(set(esperado) | set(gravado), key=str):
+        qtd_esperada, valor_esperado = esperado.get(chave, (0, 0.0))
+        qtd_gravada, valor_gravado = gravado.get(chave, (0, 0.0))
+        if qtd_esperada != qtd_gravada or abs(valor_esperado - valor_gravado) > TOLERANCIA_VALOR:
+            mes, conta_id, categoria_id, categoria, tipo, status = chave
+            divergencias.append({
+                "mes": mes.isoformat(), "conta_id": conta_id, "categoria_id": categoria_id, "categoria": categoria,
+                "tipo": tipo, "status": status,
+                "quantidade_esperada": qtd_esperada, "quantidade_gravada": qtd_gravada,
+                "valor_esperado": valor_esperado, "valor_gravado": valor_gravado,
+            })
+    return divergencias
+
+def resumo_anual(db: Session, ano: int, virtuais: dict = None) -> list:
+    """
+    Totais por mês, tipo e status do ano, lidos do resumo.
+
+    `virtuais` ({tipo: parcelas}) são as parcelas ainda não gravadas das séries recorrentes,
+    somadas como pendentes no mês do vencimento.
+    """
+    resumo = database.ResumoMensal
+    linhas = db.query(
+        resumo.mes, resumo.tipo, resumo.status,
+        func.sum(resumo.quantidade), func.sum(resumo.valor),
+    ).filter(
+        resumo.mes >= date(ano, 1, 1), resumo.mes <= date(ano, 12, 1)
+    ).group_by(resumo.mes, resumo.tipo, resumo.status).all()
+    totais = {(mes, tipo, status): [int(quantidade), float(valor)] for mes, tipo, status, quantidade, valor in linhas}
+    for tipo, parcelas in (virtuais or {}).items():
+        for parcela in parcelas:
+            total = totais.setdefault((parcela["data_vencimento"].replace(day=1), tipo, "Pendente"), [0, 0.0])
+            total[0] += 1
+            total[1] += parcela["valor"] or 0.0
+    return [
+        {"mes": mes.month, "tipo": tipo, "status": status, "quantidade": quantidade, "valor": valor}
+        for (mes, tipo, status), (quantidade, valor) in sorted(totais.items())
+        if quantidade
+    ]
@@ -0,0 +1,233 @@
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import case, delete, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+from dateutil.relativedelta import relativedelta
+import logging
+import os
+
+from . import database
+
+logger = logging.getLogger(__name__)
+
+# Período dos checkpoints de saldo ("mensal" ou "diario") e intervalo da tarefa que os grava
+SALDO_CHECKPOINT_PERIODO = os.getenv("SALDO_CHECKPOINT_PERIODO", "mensal")
+SALDO_CHECKPOINT_INTERVAL_SECONDS = int(os.getenv("SALDO_CHECKPOINT_INTERVAL_SECONDS", "3600"))
+
+def ajustar_saldo(db: Session, conta_id: int, delta: float) -> bool:
+    """
+    Soma `delta` ao saldo atual da conta com um UPDATE atômico (saldo_atual = saldo_atual + delta).
+
+    O incremento é feito pelo banco, sem ler e regravar o valor no Python, então escritas
+    concorrentes (vários workers) não se sobrescrevem. Retorna False se a conta não existe.
+    """
+    conta = database.Conta
+    resultado = db.execute(
+        update(conta)
+        .where(conta.id == conta_id)
+        .values(saldo_atual=func.coalesce(conta.saldo_atual, 0) + delta)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount == 1
+
+def debitar_saldo(db: Session, conta_id: int, valor: float) -> bool:
+    """
+    Subtrai `valor` do saldo só se houver saldo suficiente, no mesmo UPDATE.
+
+    A condição fica no WHERE, então duas retiradas simultâneas não passam ambas pela
+    verificação. Retorna False se a conta não existe ou se o saldo é insuficiente.
+    """
+    conta = database.Conta
+    resultado = db.execute(
+        update(conta)
+        .where(conta.id == conta_id, func.coalesce(conta.saldo_atual, 0) >= valor)
+        .values(saldo_atual=func.coalesce(conta.saldo_atual, 0) - valor)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount == 1
+
+def saldo_atual(db: Session, conta_id: int) -> float:
+    """Saldo atual lido do banco (na transação da sessão, inclui os ajustes ainda não confirmados)"""
+    saldo = db.execute(select(database.Conta.saldo_atual).where(database.Conta.id == conta_id)).scalar()
+    return float(saldo or 0.0)
+
+def fim_do_periodo(dia: date, periodo: str = SALDO_CHECKPOINT_PERIODO) -> date:
+    """Último dia do período que contém `dia`"""
+    if periodo == "diario":
+        return dia
+    return dia.replace(day=1) + relativedelta(months=1) - timedelta(days=1)
+
+# Movimentações financeiras guardam o instante em UTC (datetime.utcnow, sem fuso); as manuais,
+# checkpoints e datas pedidas na API são dias no fuso local do servidor (date.today).
+
+def inicio_do_dia_utc(dia: date) -> datetime:
+    """Início do dia local `dia` em UTC sem fuso, para comparar com data_movimentacao"""
+    return datetime.combine(dia, time.min).astimezone(timezone.utc).replace(tzinfo=None)
+
+def dia_local(momento_utc: datetime) -> date:
+    """Dia local de um instante gravado em UTC sem fuso"""
+    return momento_utc.replace(tzinfo=timezone.utc).astimezone().date()
+
+def movimentos_no_intervalo(db: Session, conta_id: int, apos: date = None, ate: date = None) -> float:
+    """
+    Soma com sinal das movimentações da conta com data em (apos, ate].
+
+    Considera as movimentações financeiras (pagamentos, recebimentos e doações) e as
+    movimentações manuais de saldo; cada soma usa o índice (conta_id, data). Os limites
+    são dias locais, convertidos para UTC na comparação com data_movimentacao.
+    """
+    financeira = database.MovimentacaoFinanceira
+    filtros = [financeira.conta_id == conta_id]
+    if apos is not None:
+        filtros.append(financeira.data_movimentacao >= inicio_do_dia_utc(apos + timedelta(days=1)))
+    if ate is not None:
+        filtros.append(financeira.data_movimentacao < inicio_do_dia_utc(ate + timedelta(days=1)))
+    total_financeiro = db.execute(
+        select(func.coalesce(func.sum(case(
+            (financeira.tipo_movimentacao == "ENTRADA", financeira.valor),
+            else_=-financeira.valor,
+        )), 0)).where(*filtros)
+    ).scalar()
+
+    manual = database.MovimentacaoConta
+    filtros = [manual.conta_id == conta_id]
+    if apos is not None:
+        filtros.append(manual.data > apos)
+    if ate is not None:
+        filtros.append(manual.data <= ate)
+    total_manual = db.execute(
+        select(func.coalesce(func.sum(case(
+            (manual.tipo == "Entrada", manual.valor),
+            else_=-manual.valor,
+        )), 0)).where(*filtros)
+    ).scalar()
+
+    return float(total_financeiro) + float(total_manual)
+
+def saldo_em(db: Session, conta: database.Conta, dia: date) -> dict:
+    """Saldo da conta ao fim de `dia`: checkpoint mais próximo anterior + movimentações depois dele"""
+    checkpoint = db.query(database.SaldoCheckpoint).filter(
+        database.SaldoCheckpoint.conta_id == conta.id,
+        database.SaldoCheckpoint.data <= dia,
+    ).order_by(database.SaldoCheckpoint.data.desc()).first()
+
+    if checkpoint:
+        saldo = checkpoint.saldo + movimentos_no_intervalo(db, conta.id, apos=checkpoint.data, ate=dia)
+    else:
+        saldo = (conta.saldo_inicial or 0.0) + movimentos_no_intervalo(db, conta.id, ate=dia)
+
+    return {
+        "conta_id": conta.id,
+        "data": dia,
+        "saldo": round(saldo, 2),
+        "checkpoint": checkpoint.data if checkpoint else None,
+    }
+
+def gravar_checkpoints(db: Session, hoje: date = None) -> int:
+    """
+    Grava os checkpoints dos períodos já fechados que ainda não existem.
+
+    Cada conta avança a partir do último checkpoint (ou do saldo inicial), período a
+    período, somando só as movimentações de cada período. Retorna quantos foram gravados.
+    """
+    hoje = hoje or date.today()
+    gravados = 0
+    for conta in db.query(database.Conta).all():
+        ultimo = db.query(database.SaldoCheckpoint).filter(
+            database.SaldoCheckpoint.conta_id == conta.id
+        ).order_by(database.SaldoCheckpoint.data.desc()).first()
+
+        if ultimo:
+            data_base, saldo = ultimo.data, ultimo.saldo
+            fim = fim_do_periodo(data_base + timedelta(days=1))
+        else:
+            inicio = conta.data_saldo_inicial or hoje
+            data_base, saldo = None, (conta.saldo_inicial or 0.0)
+            # Movimentações anteriores ao saldo inicial entram no primeiro período
+            fim = fim_do_periodo(inicio)
+
+        while fim < hoje:
+            saldo += movimentos_no_intervalo(db, conta.id, apos=data_base, ate=fim)
+            db.add(database.SaldoCheckpoint(conta_id=conta.id, data=fim, saldo=round(saldo, 2)))
+            gravados += 1
+            data_base = fim
+            fim = fim_do_periodo(fim + timedelta(days=1))
+        db.commit()
+    return gravados
+
+def descartar_checkpoints(db: Session, conta_id: int = None, a_partir_de: date = None) -> int:
+    """Remove checkpoints (todos, de uma conta ou a partir de uma data) para serem recalculados"""
+    stmt = delete(database.SaldoCheckpoint)
+    if conta_id is not None:
+        stmt = stmt.where(database.SaldoCheckpoint.conta_id == conta_id)
+    if a_partir_de is not None:
+        stmt = stmt.where(database.SaldoCheckpoint.data >= a_partir_de)
+    return db.execute(stmt).rowcount
+
+def atualizar_checkpoints() -> int:
+    """Tarefa periódica: grava os checkpoints dos períodos fechados"""
+    db = database.SessionLocal()
+    try:
+        gravados = gravar_checkpoints(db)
+        if gravados:
+            logger.info("Checkpoints de saldo gravados: %s", gravados)
+        return gravados
+    finally:
+        db.close()
+
+def _anterior(obj, atributo):
+    """Valor do atributo como está no banco (antes das alterações pendentes)"""
+    historico = inspect(obj).attrs[atributo].history
+    return historico.deleted[0] if historico.deleted else getattr(obj, atributo)
+
+def _dia_movimentacao(obj, anterior: bool = False):
+    """Dia local de uma movimentação, atual ou como está no banco"""
+    atributo = "data_movimentacao" if isinstance(obj, database.MovimentacaoFinanceira) else "data"
+    valor = _anterior(obj, atributo) if anterior else getattr(obj, atributo)
+    return dia_local(valor) if isinstance(valor, datetime) else valor
+
+def _antes_do_flush(session, flush_context, instances):
+    """
+    Invalida checkpoints afetados por alterações retroativas.
+
+    Uma movimentação criada, alterada ou removida em uma data já coberta por checkpoint
+    descarta os checkpoints da conta a partir daquela data; alterar o saldo inicial
+    descarta todos os da conta. A tarefa periódica os grava de novo.
+    """
+    afetados = {}
+
+    def marcar(conta_id, dia):
+        if conta_id is None:
+            return
+        atual = afetados.get(conta_id, date.max)
+        afetados[conta_id] = min(atual, dia or date.min)
+
+    movimentos = (database.MovimentacaoFinanceira, database.MovimentacaoConta)
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        if isinstance(obj, movimentos):
+            marcar(obj.conta_id, _dia_movimentacao(obj))
+            if obj in session.dirty:
+                marcar(_anterior(obj, "conta_id"), _dia_movimentacao(obj, anterior=True))
+        elif isinstance(obj, database.Conta) and obj in session.dirty:
+            estado = inspect(obj).attrs
+            if estado.saldo_inicial.history.has_changes() or estado.data_saldo_inicial.history.has_changes():
+                marcar(obj.id, date.min)
+
+    connection = session.connection() if afetados else None
+    for conta_id, dia in afetados.items():
+        stmt = delete(database.SaldoCheckpoint).where(database.SaldoCheckpoint.conta_id == conta_id)
+        if dia != date.min:
+            stmt = stmt.where(database.SaldoCheckpoint.data >= dia)
+        connection.execute(stmt)
+
+def _registrar_valor_anterior(target, value, oldvalue, initiator):
+    """Ouvinte vazio: existe só para ligar active_history no atributo"""
+
+# Com active_history, alterar uma movimentação expirada (ex.: depois de um commit) carrega
+# antes a data e a conta gravadas, então _anterior encontra os checkpoints a descartar
+for _atributo in (
+    database.MovimentacaoFinanceira.data_movimentacao, database.MovimentacaoFinanceira.conta_id,
+    database.MovimentacaoConta.data, database.MovimentacaoConta.conta_id,
+):
+    event.listen(_atributo, "set", _registrar_valor_anterior, active_history=True)
+
+event.listen(database.SessionLocal, "before_flush", _antes_do_flush)
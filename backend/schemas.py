@@ -1,6 +1,12 @@
-from pydantic import BaseModel
+from pydantic import AliasChoices, AfterValidator, BaseModel, Field, PlainSerializer
 from datetime import date, datetime
-from typing import Optional
+from typing import Annotated, List, Optional
+
+from .dinheiro import arredondar
+
+# Valor monetário na API: sempre em reais, com no máximo duas casas. A entrada é arredondada
+# ao centavo (o que o banco guarda em centavos) e a saída não leva resíduos de ponto flutuante.
+Reais = Annotated[float, AfterValidator(arredondar), PlainSerializer(arredondar, return_type=float)]
 
 # Schemas para Usuario
 class UsuarioBase(BaseModel):
@@ -70,19 +76,25 @@ class ContaBase(BaseModel):
     nome_conta: str
     tipo: str
     observacao: Optional[str] = None
-    saldo_inicial: Optional[float] = 0.0
+    saldo_inicial: Optional[Reais] = 0.0
 
 class ContaCreate(ContaBase):
     pass
 
 class Conta(ContaBase):
     id: int
-    saldo_atual: float
+    saldo_atual: Reais
     data_saldo_inicial: Optional[date] = None
     
     class Config:
         from_attributes = True
 
+class SaldoEmData(BaseModel):
+    conta_id: int
+    data: date
+    saldo: Reais
+    checkpoint: Optional[date] = None  # Checkpoint usado como ponto de partida
+
 # Schemas para ContaPagar
 class ContaPagarBase(BaseModel):
     fornecedor_id: int  # Sempre obrigatório
@@ -93,7 +105,7 @@ class ContaPagarBase(BaseModel):
     data_emissao: date
     data_vencimento: date
     data_pagamento: Optional[date] = None
-    valor: float
+    valor: Reais
     observacao: Optional[str] = None
     recorrente: bool = False
     meses_repetir: Optional[int] = None
@@ -105,7 +117,12 @@ class ContaPagarCreate(ContaPagarBase):
     pass
 
 class ContaPagar(ContaPagarBase):
-    id: int
+    id: Optional[int] = None  # None em parcelas virtuais
+    # Nome atual do cadastro (segue renomeações); o gravado quando não há categoria_id
+    categoria: str = Field(validation_alias=AliasChoices("categoria_nome", "categoria"))
+    categoria_id: Optional[int] = None
+    virtual: bool = False  # Parcela de regra de recorrência ainda não gravada
+    regra_id: Optional[int] = None
     
     class Config:
         from_attributes = True
@@ -120,7 +137,7 @@ class ContaReceberBase(BaseModel):
     data_emissao: date
     data_vencimento: date
     data_recebimento: Optional[date] = None
-    valor: float
+    valor: Reais
     observacao: Optional[str] = None
     recorrente: bool = False
     meses_repetir: Optional[int] = None
@@ -132,17 +149,66 @@ class ContaReceberCreate(ContaReceberBase):
     pass
 
 class ContaReceber(ContaReceberBase):
-    id: int
+    id: Optional[int] = None  # None em parcelas virtuais
+    categoria: str = Field(validation_alias=AliasChoices("categoria_nome", "categoria"))
+    categoria_id: Optional[int] = None
+    origem: str = Field(validation_alias=AliasChoices("origem_nome", "origem"))
+    origem_receber_id: Optional[int] = None
+    virtual: bool = False  # Parcela de regra de recorrência ainda não gravada
+    regra_id: Optional[int] = None
     fornecedor_doador: Optional[FornecedorDoador] = None
     
     class Config:
         from_attributes = True
 
+# Schemas para regras de recorrência
+class RegraRecorrenciaBase(BaseModel):
+    tipo: str  # pagar ou receber
+    data_inicio: date  # Vencimento da parcela 1
+    data_emissao_inicio: Optional[date] = None
+    intervalo_meses: int = 1
+    total_parcelas: Optional[int] = None  # None = sem fim
+    modelo: dict  # Campos da conta a pagar/receber (fornecedor, categoria, conta_id, valor...)
+
+class RegraRecorrenciaCreate(RegraRecorrenciaBase):
+    pass
+
+class RegraRecorrencia(RegraRecorrenciaBase):
+    id: int
+    grupo_recorrencia: str
+    parcela_inicio: int = 1
+    parcelas_canceladas: List[int] = []
+    ativa: bool = True
+    
+    class Config:
+        from_attributes = True
+
+class SerieUpdate(BaseModel):
+    """Campos alterados nas parcelas pendentes da série (só os enviados são aplicados)"""
+    a_partir_de: int = 1  # Número da primeira parcela afetada
+    valor: Optional[Reais] = None
+    categoria: Optional[str] = None
+    conta_id: Optional[int] = None
+    observacao: Optional[str] = None
+    fornecedor_id: Optional[int] = None  # Contas a pagar
+    beneficiario_id: Optional[int] = None  # Contas a pagar
+    fornecedor_doador_id: Optional[int] = None  # Contas a receber
+    origem: Optional[str] = None  # Contas a receber
+
+class SerieReagendamento(BaseModel):
+    a_partir_de: int = 1
+    data_vencimento: date  # Novo vencimento da parcela `a_partir_de`
+    intervalo_meses: Optional[int] = None  # Mantém o da série se não informado
+
+class SerieResultado(BaseModel):
+    grupo_recorrencia: str
+    parcelas_afetadas: int
+
 # Schemas para DoacaoAvulsa
 class DoacaoAvulsaBase(BaseModel):
     nome_doador: str
     whatsapp: Optional[str] = None
-    valor: float
+    valor: Reais
     conta_id: int
     data: date
     observacao: Optional[str] = None
@@ -167,14 +233,44 @@ class TokenData(BaseModel):
 
 # Schema para Dashboard
 class DashboardData(BaseModel):
-    total_pagar_hoje: float
-    total_pagar_mes: float
-    total_receber_hoje: float
-    total_receber_mes: float
-    total_doacoes_mes: float
+    total_pagar_hoje: Reais
+    total_pagar_mes: Reais
+    total_receber_hoje: Reais
+    total_receber_mes: Reais
+    total_doacoes_mes: Reais
     saldos_contas: list
     previsao_futura: dict
 
+class ValorPorCategoria(BaseModel):
+    categoria: str
+    valor: Reais
+
+class GastoPorBeneficiario(BaseModel):
+    beneficiario_id: int
+    nome: str
+    valor: Reais
+
+class DashboardMensal(BaseModel):
+    ano: int
+    mes: int
+    total_recebido: Reais
+    total_a_receber: Reais
+    total_pago: Reais
+    total_a_pagar: Reais
+    total_doacoes: Reais
+    total_entradas: Reais
+    total_saidas: Reais
+    receitas_por_categoria: List[ValorPorCategoria]
+    despesas_por_categoria: List[ValorPorCategoria]
+    gastos_por_beneficiario: List[GastoPorBeneficiario]
+
+class ResumoAnualItem(BaseModel):
+    mes: int
+    tipo: str
+    status: str
+    quantidade: int
+    valor: Reais
+
 # Schemas para categorias dinâmicas
 class CategoriaAjudaBase(BaseModel):
     nome: str
@@ -243,7 +339,7 @@ class OrigemReceber(OrigemReceberBase):
 class MovimentacaoFinanceiraBase(BaseModel):
     conta_id: int
     tipo_movimentacao: str  # ENTRADA ou SAIDA
-    valor: float
+    valor: Reais
     data_movimentacao: datetime
     descricao: str
     categoria: Optional[str] = None
@@ -265,7 +361,7 @@ class MovimentacaoFinanceira(MovimentacaoFinanceiraBase):
 
 # Schema para operações de saldo
 class SaldoRequest(BaseModel):
-    valor: float
+    valor: Reais
     observacao: Optional[str] = None
 
 
@@ -274,9 +370,11 @@ class SaldoRequest(BaseModel):
 class PaginationParams(BaseModel):
     page: int = 1
     size: int = 20
+    cursor: Optional[str] = None  # Paginação por keyset: cursor opaco devolvido em next_cursor
+    with_total: bool = True       # Calcula o total exato (COUNT) da consulta
     
-    def __init__(self, page: int = 1, size: int = 20):
-        super().__init__(page=max(1, page), size=min(max(1, size), 100))
+    def __init__(self, page: int = 1, size: int = 20, cursor: Optional[str] = None, with_total: bool = True):
+        super().__init__(page=max(1, page), size=min(max(1, size), 100), cursor=cursor or None, with_total=with_total)
     
     @property
     def skip(self) -> int:
@@ -288,21 +386,28 @@ class PaginationParams(BaseModel):
 
 class PaginatedResponse(BaseModel):
     items: list
-    total: int
+    total: Optional[int] = None  # Ausente quando with_total=false
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # None na última página
     
     @classmethod
-    def create(cls, items: list, total: int, pagination: PaginationParams):
+    def create(cls, items: list, total: Optional[int], pagination: PaginationParams, next_cursor: Optional[str] = None, **extra):
         return cls(
             items=items,
             total=total,
             page=pagination.page,
             size=pagination.size,
-            pages=(total + pagination.size - 1) // pagination.size
+            pages=(total + pagination.size - 1) // pagination.size if total is not None else None,
+            next_cursor=next_cursor,
+            **extra
         )
 
+class ContaPagarPaginatedResponse(PaginatedResponse):
+    items: List[ContaPagar]
+    valor_total: Reais = 0.0  # Soma de todas as contas filtradas, não só da página
+
 
 # Schemas para sessões de usuário
 class UserSessionBase(BaseModel):
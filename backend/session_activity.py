@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import update, bindparam
+import logging
+import threading
+import time
+
+from . import database
+
+logger = logging.getLogger(__name__)
+
+# Janela de inatividade após a qual a sessão expira
+SESSION_IDLE_TIMEOUT = timedelta(hours=2)
+
+class SessionActivityBuffer:
+    """
+    Acumula renovações de atividade das sessões em memória e grava todas de uma vez.
+
+    Cada toque substitui o anterior do mesmo token, então N requisições de uma sessão
+    entre dois flushes viram uma única linha no UPDATE em lote. O flush acontece a cada
+    `flush_interval` segundos (tarefa periódica), quando `max_pending` tokens se acumulam
+    e no desligamento da aplicação.
+    """
+
+    def __init__(self, flush_interval: float = 30.0, max_pending: int = 500):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def touch(self, session_token: str, now: Optional[datetime] = None) -> datetime:
+        """Registra atividade da sessão e retorna a nova expiração"""
+        now = now or datetime.utcnow()
+        expires_at = now + SESSION_IDLE_TIMEOUT
+        with self._lock:
+            self._pending[session_token] = (now, expires_at)
+        return expires_at
+
+    def pending_activity(self, session_token: str) -> Optional[Tuple[datetime, datetime]]:
+        """(última atividade, expiração) ainda não gravadas no banco para o token, se houver"""
+        with self._lock:
+            return self._pending.get(session_token)
+
+    def pending_expiry(self, session_token: str) -> Optional[datetime]:
+        """Expiração ainda não gravada no banco para o token, se houver"""
+        item = self.pending_activity(session_token)
+        return item[1] if item else None
+
+    def discard(self, session_token: str):
+        with self._lock:
+            self._pending.pop(session_token, None)
+
+    def should_flush(self) -> bool:
+        with self._lock:
+            if not self._pending:
+                return False
+            return (
+                len(self._pending) >= self.max_pending
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+
+    def flush(self) -> int:
+        """Grava as renovações pendentes em um único UPDATE em lote e retorna quantas foram gravadas"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        table = database.UserSession.__table__
+        stmt = (
+            update(table)
+            .where(table.c.session_token == bindparam("b_token"))
+            .where(table.c.is_active == True)
+            .values(last_activity=bindparam("b_last_activity"), expires_at=bindparam("b_expires_at"))
+        )
+        params = [
+            {"b_token": token, "b_last_activity": last_activity, "b_expires_at": expires_at}
+            for token, (last_activity, expires_at) in pending.items()
+        ]
+
+        db = database.SessionLocal()
+        try:
+            db.execute(stmt, params)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Devolve ao buffer o que não foi gravado, sem sobrescrever toques mais novos
+            with self._lock:
+                for token, item in pending.items():
+                    self._pending.setdefault(token, item)
+            logger.exception("Falha ao gravar atividade de %d sessão(ões)", len(pending))
+            raise
+        finally:
+            db.close()
+        return len(params)
@@ -0,0 +1,54 @@
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+
+from . import auth, conciliacao, dashboard, recorrencia, saldos, workers
+
+logger = logging.getLogger(__name__)
+
+async def run_periodically(interval: float, func, name: str, imediato: bool = False):
+    """Executa `func` a cada `interval` segundos (com `imediato`, também ao iniciar) fora do caminho das requisições"""
+    espera = 0 if imediato else interval
+    while True:
+        await asyncio.sleep(espera)
+        espera = interval
+        try:
+            await workers.run_db_work(func)
+        except Exception:
+            logger.exception("Falha na tarefa periódica %s", name)
+
+@asynccontextmanager
+async def lifespan(app):
+    """Inicia as tarefas de fundo da aplicação e as encerra no desligamento"""
+    tasks = [
+        asyncio.create_task(run_periodically(
+            auth.SESSION_ACTIVITY_FLUSH_SECONDS, auth.activity_buffer.flush, "session_activity_flush"
+        )),
+        asyncio.create_task(run_periodically(
+            auth.SESSION_SWEEP_INTERVAL_SECONDS, auth.sweep_sessions, "session_sweep"
+        )),
+        asyncio.create_task(run_periodically(
+            saldos.SALDO_CHECKPOINT_INTERVAL_SECONDS, saldos.atualizar_checkpoints, "saldo_checkpoints"
+        )),
+        asyncio.create_task(run_periodically(
+            conciliacao.CONCILIACAO_INTERVAL_SECONDS, conciliacao.conciliar, "conciliacao_saldos"
+        )),
+        # Ao iniciar, grava as parcelas que venceram com o servidor parado
+        asyncio.create_task(run_periodically(
+            recorrencia.RECORRENCIA_INTERVAL_SECONDS, recorrencia.materializar_vencidas, "recorrencia_vencidas",
+            imediato=True,
+        )),
+    ]
+    if dashboard.DASHBOARD_CACHE_SYNC_SECONDS > 0:
+        # Escritas feitas pelos outros workers (contador compartilhado do painel)
+        tasks.append(asyncio.create_task(run_periodically(
+            dashboard.DASHBOARD_CACHE_SYNC_SECONDS, dashboard.sincronizar_versao, "dashboard_sync", imediato=True,
+        )))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Grava as renovações de sessão que ainda estão em memória
+        auth.activity_buffer.flush()
@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import os
+
+from . import database
+
+# Pools dedicados para trabalho bloqueante chamado a partir de rotas async.
+# O pool de banco não passa do tamanho do pool de conexões, para que nenhuma
+# thread fique parada esperando conexão; o de senha limita o uso de CPU do bcrypt.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+DB_WORKERS = int(os.getenv("DB_WORKERS", str(database.DB_POOL_SIZE)))
+
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="senha")
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="banco")
+
+async def run_password_work(func, *args, **kwargs):
+    """Executa hash/verificação de senha no pool dedicado, sem bloquear o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, functools.partial(func, *args, **kwargs))
+
+async def run_db_work(func, *args, **kwargs):
+    """Executa acesso síncrono ao banco no pool dedicado, sem bloquear o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
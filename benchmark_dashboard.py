@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark do painel: memória e tempo de /api/dashboard conforme contas_pagar cresce
+Compara a soma em Python (linhas trazidas do banco) com a agregação em SQL de backend/dashboard.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend import database, dashboard
+
+# Tamanhos de contas_pagar medidos, ex.: BENCH_TAMANHOS=100000,1000000
+TAMANHOS = [int(n) for n in os.getenv("BENCH_TAMANHOS", "10000,100000,500000").split(",")]
+LOTE = 50000
+
+def popular(engine, inicio, fim):
+    """Insere contas a pagar no mês corrente até completar `fim` linhas"""
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        conta = db.query(database.Conta).first()
+        fornecedor = db.query(database.FornecedorDoador).first()
+        hoje = date.today()
+        inicio_mes = hoje.replace(day=1)
+        for lote_inicio in range(inicio, fim, LOTE):
+            db.execute(
+                database.ContaPagar.__table__.insert(),
+                [
+                    {
+                        "fornecedor_id": fornecedor.id,
+                        "conta_id": conta.id,
+                        "status": "Pendente" if i % 3 else "Pago",
+                        "categoria": "Bench",
+                        "data_emissao": hoje,
+                        "data_vencimento": inicio_mes + timedelta(days=i % 28),
+                        "valor": 1.0,
+                    }
+                    for i in range(lote_inicio, min(lote_inicio + LOTE, fim))
+                ],
+            )
+        db.commit()
+    finally:
+        db.close()
+
+def painel_em_python(db):
+    """Cálculo antigo: traz cada valor pendente do mês e soma em Python"""
+    hoje = date.today()
+    inicio_mes, fim_mes = dashboard.limites_mes(hoje)
+    valores = db.query(database.ContaPagar.valor).filter(
+        database.ContaPagar.data_vencimento >= inicio_mes,
+        database.ContaPagar.data_vencimento <= fim_mes,
+        database.ContaPagar.status == "Pendente"
+    ).all()
+    total_mes = sum([x[0] for x in valores])
+    contas = db.query(database.Conta).all()
+    return total_mes, [{"nome_conta": c.nome_conta, "saldo": c.saldo_atual} for c in contas]
+
+def medir(Session, funcao):
+    """Executa `funcao` e retorna (segundos, pico de memória em MB)"""
+    db = Session()
+    try:
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        funcao(db)
+        duracao = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return duracao, pico / (1024 * 1024)
+    finally:
+        db.close()
+
+def main():
+    """Função principal"""
+    print("📊 BENCHMARK DO PAINEL")
+    print("=" * 50)
+    print(f"{'Linhas':>10} {'Python (s)':>11} {'Python (MB)':>12} {'SQL (s)':>9} {'SQL (MB)':>9}")
+    print("─" * 56)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(diretorio, 'bench.db')}",
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(engine, "connect", database.aplicar_pragmas_sqlite)
+        database.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        db = Session()
+        db.add_all([
+            database.Conta(nome_conta="Bench", tipo="Banco", saldo_atual=0.0),
+            database.FornecedorDoador(tipo="Fornecedor", nome_razao="Bench"),
+        ])
+        db.commit()
+        db.close()
+
+        atual = 0
+        for tamanho in TAMANHOS:
+            popular(engine, atual, tamanho)
+            atual = tamanho
+            py_tempo, py_memoria = medir(Session, painel_em_python)
+            sql_tempo, sql_memoria = medir(Session, dashboard.get_dashboard)
+            print(f"{tamanho:>10} {py_tempo:>11.3f} {py_memoria:>12.2f} {sql_tempo:>9.3f} {sql_memoria:>9.2f}")
+        engine.dispose()
+    return True
+
+if __name__ == "__main__":
+    try:
+        success = main()
+        sys.exit(0 if success else 1)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Benchmark cancelado pelo usuário.")
+        sys.exit(1)
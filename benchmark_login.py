@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Teste de carga: latência de GETs autenticados durante uma rajada de logins
+Executa contra um servidor em funcionamento (uvicorn) e mostra p50/p99 dos GETs
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+BASE_URL = os.getenv("BENCH_URL", "http://127.0.0.1:8000")
+USUARIO = os.getenv("BENCH_USUARIO", "admin")
+SENHA = os.getenv("BENCH_SENHA", "admin123")
+CLIENTES_GET = int(os.getenv("BENCH_CLIENTES_GET", "20"))
+DURACAO_SEGUNDOS = float(os.getenv("BENCH_DURACAO", "5"))
+# O login é limitado a 5 tentativas por minuto por IP (uma é usada na verificação inicial)
+LOGINS_RAJADA = int(os.getenv("BENCH_LOGINS", "4"))
+
+def percentil(valores, p):
+    """Percentil simples (nearest-rank) em milissegundos"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice] * 1000
+
+async def login(client):
+    response = await client.post("/api/token", data={"username": USUARIO, "password": SENHA})
+    return response
+
+async def cliente_get(client, fim, latencias):
+    # /health não depende da sessão, que é substituída a cada login (sessão única)
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        await client.get("/health")
+        latencias.append(time.perf_counter() - inicio)
+
+async def medir(client, com_logins):
+    """Mede a latência dos GETs com ou sem rajada de logins simultânea"""
+    latencias = []
+    fim = time.perf_counter() + DURACAO_SEGUNDOS
+    tarefas = [cliente_get(client, fim, latencias) for _ in range(CLIENTES_GET)]
+    if com_logins:
+        tarefas += [login(client) for _ in range(LOGINS_RAJADA)]
+    resultados = await asyncio.gather(*tarefas)
+    logins = [r for r in resultados if isinstance(r, httpx.Response)]
+    return latencias, logins
+
+async def main():
+    """Função principal"""
+    print("📊 TESTE DE CARGA: GETs DURANTE RAJADA DE LOGINS")
+    print("=" * 50)
+    print(f"Servidor: {BASE_URL} | Clientes GET: {CLIENTES_GET} | Logins: {LOGINS_RAJADA} | Duração: {DURACAO_SEGUNDOS}s")
+    print()
+
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30) as client:
+        response = await login(client)
+        if response.status_code != 200:
+            print(f"❌ Falha no login inicial: {response.status_code} {response.text}")
+            return False
+
+        print(f"{'Cenário':<16} {'GETs':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'Logins OK':>10}")
+        print("─" * 58)
+        for nome, com_logins in (("sem logins", False), ("com logins", True)):
+            latencias, logins = await medir(client, com_logins)
+            ok = sum(1 for r in logins if r.status_code == 200)
+            print(
+                f"{nome:<16} {len(latencias):>8} {percentil(latencias, 50):>10.1f} "
+                f"{percentil(latencias, 99):>10.1f} {ok if com_logins else '-':>10}"
+            )
+    return True
+
+if __name__ == "__main__":
+    try:
+        success = asyncio.run(main())
+        sys.exit(0 if success else 1)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Teste cancelado pelo usuário.")
+        sys.exit(1)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark da criação de contas recorrentes
+Compara um objeto ORM por parcela (forma antiga) com o INSERT em lote de backend/recorrencia.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend import database, recorrencia, rollup
+
+MESES = int(os.getenv("BENCH_MESES", "120"))
+SERIES = int(os.getenv("BENCH_SERIES", "50"))
+
+def dados_conta(conta_id, fornecedor_id):
+    return {
+        "fornecedor_id": fornecedor_id,
+        "beneficiario_id": None,
+        "status": "Pendente",
+        "categoria": "Bench",
+        "conta_id": conta_id,
+        "data_emissao": date(2026, 1, 31),
+        "data_vencimento": date(2026, 1, 31),
+        "data_pagamento": None,
+        "valor": 100.0,
+        "observacao": None,
+        "recorrente": True,
+        "meses_repetir": MESES,
+    }
+
+def serie_orm(db, dados):
+    """Forma antiga: primeira parcela com commit próprio, depois um objeto por mês"""
+    grupo = str(uuid.uuid4())
+    primeira = database.ContaPagar(**dados, parcela_numero=1, parcela_total=MESES, grupo_recorrencia=grupo)
+    db.add(primeira)
+    db.commit()
+    for i in range(2, MESES + 1):
+        nova = dict(dados)
+        nova["data_vencimento"] = dados["data_vencimento"] + relativedelta(months=i - 1)
+        nova["data_emissao"] = dados["data_emissao"] + relativedelta(months=i - 1)
+        db.add(database.ContaPagar(**nova, parcela_numero=i, parcela_total=MESES, grupo_recorrencia=grupo))
+    db.commit()
+
+def serie_lote(db, dados):
+    """Forma atual: primeira parcela e INSERT em lote na mesma transação"""
+    grupo = str(uuid.uuid4())
+    db.add(database.ContaPagar(**dados, parcela_numero=1, parcela_total=MESES, grupo_recorrencia=grupo))
+    db.flush()
+    linhas = recorrencia.linhas_parcelas_futuras(database.ContaPagar, dados, MESES, grupo)
+    recorrencia.inserir_parcelas(db, database.ContaPagar, linhas)
+    db.commit()
+
+def executar(funcao):
+    """Cria SERIES séries em um banco novo e retorna o tempo médio por série (ms)"""
+    with tempfile.TemporaryDirectory() as diretorio:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(diretorio, 'bench.db')}",
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(engine, "connect", database.aplicar_pragmas_sqlite)
+        database.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        # Os dois modos mantêm o resumo mensal, como na aplicação
+        rollup.acompanhar(Session)
+        db = Session()
+        try:
+            conta = database.Conta(nome_conta="Bench", tipo="Banco", saldo_atual=0.0)
+            fornecedor = database.FornecedorDoador(tipo="Fornecedor", nome_razao="Bench")
+            db.add_all([conta, fornecedor])
+            db.commit()
+            dados = dados_conta(conta.id, fornecedor.id)
+
+            inicio = time.perf_counter()
+            for _ in range(SERIES):
+                funcao(db, dados)
+            duracao = time.perf_counter() - inicio
+
+            total = db.query(database.ContaPagar).count()
+            assert total == SERIES * MESES, total
+            return duracao / SERIES * 1000
+        finally:
+            db.close()
+            engine.dispose()
+
+def main():
+    """Função principal"""
+    print("📊 BENCHMARK DE CONTAS RECORRENTES")
+    print("=" * 50)
+    print(f"Série de {MESES} meses, média de {SERIES} séries")
+    print()
+    print(f"{'Modo':<20} {'ms por série':>14}")
+    print("─" * 36)
+    orm = executar(serie_orm)
+    lote = executar(serie_lote)
+    print(f"{'ORM por parcela':<20} {orm:>14.1f}")
+    print(f"{'INSERT em lote':<20} {lote:>14.1f}")
+    print(f"\nGanho: {orm / lote:.1f}x")
+    return True
+
+if __name__ == "__main__":
+    try:
+        success = main()
+        sys.exit(0 if success else 1)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Benchmark cancelado pelo usuário.")
+        sys.exit(1)
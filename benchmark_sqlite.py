@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark de concorrência leitura/escrita do SQLite
+Compara o modo padrão (rollback journal) com o perfil configurado em backend/database.py
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, event, func, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from backend import database
+
+DURACAO_SEGUNDOS = float(os.getenv("BENCH_DURACAO", "5"))
+LEITORES = int(os.getenv("BENCH_LEITORES", "4"))
+ESCRITORES = int(os.getenv("BENCH_ESCRITORES", "2"))
+LINHAS_INICIAIS = int(os.getenv("BENCH_LINHAS", "20000"))
+
+def criar_engine(caminho, perfil):
+    """Cria uma engine isolada, com ou sem o perfil de pragmas"""
+    engine = create_engine(
+        f"sqlite:///{caminho}",
+        connect_args={"check_same_thread": False, "timeout": 0.1},
+        poolclass=QueuePool,
+        pool_size=LEITORES + ESCRITORES,
+        max_overflow=0,
+    )
+    if perfil:
+        event.listen(engine, "connect", database.aplicar_pragmas_sqlite)
+    return engine
+
+def popular(engine):
+    """Cria as tabelas e insere contas a pagar para a leitura"""
+    database.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        conta = database.Conta(nome_conta="Bench", tipo="Banco", saldo_atual=0.0)
+        fornecedor = database.FornecedorDoador(tipo="Fornecedor", nome_razao="Bench")
+        db.add_all([conta, fornecedor])
+        db.flush()
+        db.execute(
+            database.ContaPagar.__table__.insert(),
+            [
+                {
+                    "fornecedor_id": fornecedor.id,
+                    "conta_id": conta.id,
+                    "status": "Pendente",
+                    "categoria": "Bench",
+                    "data_emissao": date.today(),
+                    "data_vencimento": date.today(),
+                    "valor": 1.0,
+                }
+                for _ in range(LINHAS_INICIAIS)
+            ],
+        )
+        db.commit()
+        return conta.id
+    finally:
+        db.close()
+
+def executar(perfil):
+    """Roda leitores e escritores simultâneos e retorna as métricas"""
+    with tempfile.TemporaryDirectory() as diretorio:
+        engine = criar_engine(os.path.join(diretorio, "bench.db"), perfil)
+        conta_id = popular(engine)
+        Session = sessionmaker(bind=engine)
+        fim = time.perf_counter() + DURACAO_SEGUNDOS
+        metricas = {"leituras": 0, "escritas": 0, "bloqueios": 0}
+        lock = threading.Lock()
+
+        def somar(chave):
+            with lock:
+                metricas[chave] += 1
+
+        def leitor():
+            while time.perf_counter() < fim:
+                db = Session()
+                try:
+                    db.query(func.sum(database.ContaPagar.valor)).filter(
+                        database.ContaPagar.status == "Pendente"
+                    ).scalar()
+                    somar("leituras")
+                except OperationalError:
+                    somar("bloqueios")
+                finally:
+                    db.close()
+
+        def escritor():
+            while time.perf_counter() < fim:
+                db = Session()
+                try:
+                    db.execute(
+                        text("UPDATE contas SET saldo_atual = saldo_atual + 1 WHERE id = :id"),
+                        {"id": conta_id},
+                    )
+                    db.commit()
+                    somar("escritas")
+                except OperationalError:
+                    db.rollback()
+                    somar("bloqueios")
+                finally:
+                    db.close()
+
+        threads = [threading.Thread(target=leitor) for _ in range(LEITORES)]
+        threads += [threading.Thread(target=escritor) for _ in range(ESCRITORES)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+        return metricas
+
+def main():
+    """Função principal"""
+    print("📊 BENCHMARK DE CONCORRÊNCIA DO SQLITE")
+    print("=" * 50)
+    print(f"Duração: {DURACAO_SEGUNDOS}s | Leitores: {LEITORES} | Escritores: {ESCRITORES} | Linhas: {LINHAS_INICIAIS}")
+    print()
+    print(f"{'Perfil':<12} {'Leituras/s':>12} {'Escritas/s':>12} {'Bloqueios':>10}")
+    print("─" * 50)
+    for nome, perfil in (("padrão", False), ("ajustado", True)):
+        metricas = executar(perfil)
+        print(
+            f"{nome:<12} {metricas['leituras'] / DURACAO_SEGUNDOS:>12.1f} "
+            f"{metricas['escritas'] / DURACAO_SEGUNDOS:>12.1f} {metricas['bloqueios']:>10}"
+        )
+    return True
+
+if __name__ == "__main__":
+    try:
+        success = main()
+        sys.exit(0 if success else 1)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Benchmark cancelado pelo usuário.")
+        sys.exit(1)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Conciliação dos saldos das contas com as movimentações
+Uso: python conciliar_saldos.py verificar | corrigir
+"""
+
+import sys
+import time
+
+from backend.database import SessionLocal, create_tables
+from backend import conciliacao
+
+def listar(divergencias):
+    for d in divergencias:
+        print(
+            f"   conta {d['conta_id']} ({d['nome_conta']}): gravado {d['saldo_gravado']:.2f}, "
+            f"calculado {d['saldo_calculado']:.2f}, diferença {d['diferenca']:+.2f}"
+        )
+
+def verificar():
+    """Compara o saldo de cada conta com saldo inicial + movimentações"""
+    db = SessionLocal()
+    try:
+        inicio = time.perf_counter()
+        divergencias = conciliacao.verificar(db)
+        duracao = time.perf_counter() - inicio
+        if not divergencias:
+            print(f"✅ Saldos consistentes com as movimentações ({duracao:.2f}s)")
+            return True
+        print(f"❌ {len(divergencias)} conta(s) com saldo divergente ({duracao:.2f}s):")
+        listar(divergencias)
+        print("\nExecute 'python conciliar_saldos.py corrigir' para corrigir.")
+        return False
+    finally:
+        db.close()
+
+def corrigir():
+    """Ajusta o saldo das contas divergentes para o valor recalculado"""
+    db = SessionLocal()
+    try:
+        divergencias = conciliacao.corrigir(db)
+        if not divergencias:
+            print("✅ Nenhuma divergência para corrigir")
+            return True
+        print(f"✅ {len(divergencias)} conta(s) corrigida(s):")
+        listar(divergencias)
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro ao corrigir saldos: {e}")
+        return False
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    comandos = {"verificar": verificar, "corrigir": corrigir}
+    if len(sys.argv) != 2 or sys.argv[1] not in comandos:
+        print(__doc__.strip())
+        sys.exit(2)
+    create_tables()
+    sys.exit(0 if comandos[sys.argv[1]]() else 1)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Script de migração das categorias e origens para chaves estrangeiras
+Adiciona as colunas categoria_id/origem_receber_id (e seus índices) a um banco existente e
+preenche os ids a partir dos nomes gravados, em lotes curtos, com a aplicação no ar.
+Pode ser executado mais de uma vez: só as linhas ainda sem id são atualizadas.
+Uso: python migrate_categorias.py [--lote N] [--pausa SEGUNDOS]
+"""
+
+import argparse
+import sys
+import time
+
+from sqlalchemy import text
+
+from backend import categorias, database
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Preenche os ids de categoria/origem dos lançamentos")
+    parser.add_argument("--lote", type=int, default=categorias.MIGRACAO_CATEGORIAS_LOTE, help="linhas por transação")
+    parser.add_argument("--pausa", type=float, default=0.0, help="segundos entre os lotes")
+    args = parser.parse_args()
+
+    print("🔧 MIGRAÇÃO DE CATEGORIAS E ORIGENS")
+    print("=" * 50)
+    inicio = time.perf_counter()
+    try:
+        # Colunas anuláveis e índices: mudanças só de esquema, sem reescrever as tabelas
+        colunas = database.create_columns()
+        database.Base.metadata.create_all(bind=database.engine)
+        indices = database.create_indexes()
+    except Exception as e:
+        print(f"❌ Erro ao alterar o esquema: {e}")
+        return False
+    for nome in colunas:
+        print(f"   ➕ coluna {nome}")
+    for nome in indices:
+        print(f"   ➕ índice {nome}")
+
+    db = database.SessionLocal()
+    try:
+        criados = categorias.cadastrar_ausentes(db)
+        if criados:
+            print(f"   ➕ {criados} nome(s) sem cadastro cadastrado(s) como inativo(s)")
+        for chave, total in categorias.migrar(db, args.lote, args.pausa).items():
+            print(f"   ✔️  {chave}: {total} linha(s) preenchida(s)")
+        restantes = {chave: total for chave, total in categorias.pendentes(db).items() if total}
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro ao preencher os ids: {e}")
+        return False
+    finally:
+        db.close()
+
+    # Atualiza as estatísticas para que o planejador passe a usar os índices novos
+    with database.engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+
+    if restantes:
+        print(f"⚠️  Linhas ainda sem id: {restantes}")
+        return False
+    print(f"\n✅ Migração concluída em {time.perf_counter() - inicio:.1f}s")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
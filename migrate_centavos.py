@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Script de migração dos valores monetários de reais (ponto flutuante) para centavos inteiros
+Converte, tabela por tabela e em lotes, todas as colunas de dinheiro (valor, saldo_atual,
+saldo_inicial, saldo...) e marca o banco como "centavos". Depois, inicie a aplicação com
+DINHEIRO_ARMAZENAMENTO=centavos.
+A aplicação deve estar parada: enquanto a conversão não termina o banco fica marcado como
+"convertendo" e a aplicação não inicia. Se for interrompido, execute de novo: continua do
+último lote confirmado. Com --reverter, os lotes já convertidos voltam a reais e o banco volta
+a ser marcado como "reais".
+Uso: python migrate_centavos.py [--lote N] [--reverter]
+"""
+
+import argparse
+import sys
+import time
+
+from sqlalchemy import inspect, select, text
+
+from backend import database
+from backend.dinheiro import para_centavos
+
+CHAVE = "dinheiro"
+CHAVE_PROGRESSO = "dinheiro:"  # + tabela -> último id convertido
+
+def colunas_dinheiro():
+    """[(tabela, [colunas])] das tabelas com colunas do tipo Dinheiro"""
+    resultado = []
+    for tabela in database.Base.metadata.sorted_tables:
+        colunas = [coluna.name for coluna in tabela.columns if isinstance(coluna.type, database.Dinheiro)]
+        if colunas:
+            resultado.append((tabela, colunas))
+    return resultado
+
+def gravar_configuracao(connection, chave, valor):
+    configuracoes = database.Configuracao.__table__
+    connection.execute(configuracoes.delete().where(configuracoes.c.chave == chave))
+    if valor is not None:
+        connection.execute(configuracoes.insert().values(chave=chave, valor=valor))
+
+def ler_configuracao(connection, chave):
+    configuracoes = database.Configuracao.__table__
+    return connection.execute(select(configuracoes.c.valor).where(configuracoes.c.chave == chave)).scalar()
+
+def converter_tabela(tabela, colunas, lote):
+    """
+    Converte as colunas da tabela em lotes de `lote` linhas pela chave primária.
+
+    SQL puro (sem o tipo Dinheiro) para não depender de DINHEIRO_ARMAZENAMENTO. Os centavos são
+    calculados em Python com dinheiro.para_centavos, o mesmo arredondamento da aplicação (o
+    ROUND(valor * 100) do banco leva 0.285 a 28, e não 29). Cada lote e o registro do progresso
+    são confirmados juntos, então uma linha nunca é convertida duas vezes.
+    """
+    preparador = database.engine.dialect.identifier_preparer
+    nome = preparador.quote(tabela.name)
+    selecionadas = ", ".join(preparador.quote(coluna) for coluna in colunas)
+    atribuicoes = ", ".join(f"{preparador.quote(coluna)} = :c{indice}" for indice, coluna in enumerate(colunas))
+    with database.engine.connect() as connection:
+        ultimo = int(ler_configuracao(connection, CHAVE_PROGRESSO + tabela.name) or 0)
+    convertidas = 0
+    while True:
+        with database.engine.begin() as connection:
+            linhas = connection.execute(
+                text(f"SELECT id, {selecionadas} FROM {nome} WHERE id > :ultimo ORDER BY id LIMIT :lote"),
+                {"ultimo": ultimo, "lote": lote},
+            ).all()
+            if not linhas:
+                return convertidas
+            connection.execute(text(f"UPDATE {nome} SET {atribuicoes} WHERE id = :id"), [
+                {"id": linha[0], **{f"c{indice}": para_centavos(valor) for indice, valor in enumerate(linha[1:])}}
+                for linha in linhas
+            ])
+            gravar_configuracao(connection, CHAVE_PROGRESSO + tabela.name, str(linhas[-1][0]))
+        convertidas += len(linhas)
+        ultimo = linhas[-1][0]
+
+def reverter_tabela(tabela, colunas, lote):
+    """
+    Devolve a reais as linhas já convertidas da tabela, do último id convertido para trás.
+
+    Cada lote e o recuo do progresso são confirmados juntos, como na conversão.
+    """
+    preparador = database.engine.dialect.identifier_preparer
+    nome = preparador.quote(tabela.name)
+    atribuicoes = ", ".join(f"{preparador.quote(coluna)} = {preparador.quote(coluna)} / 100.0" for coluna in colunas)
+    chave = CHAVE_PROGRESSO + tabela.name
+    with database.engine.connect() as connection:
+        ultimo = int(ler_configuracao(connection, chave) or 0)
+    revertidas = 0
+    while True:
+        with database.engine.begin() as connection:
+            ids = connection.execute(
+                text(f"SELECT id FROM {nome} WHERE id <= :ultimo ORDER BY id DESC LIMIT :lote"),
+                {"ultimo": ultimo, "lote": lote},
+            ).scalars().all()
+            if not ids:
+                gravar_configuracao(connection, chave, None)
+                return revertidas
+            connection.execute(
+                text(f"UPDATE {nome} SET {atribuicoes} WHERE id >= :inicio AND id <= :fim"),
+                {"inicio": ids[-1], "fim": ultimo},
+            )
+            gravar_configuracao(connection, chave, str(ids[-1] - 1))
+        revertidas += len(ids)
+        ultimo = ids[-1] - 1
+
+def alterar_tipos(connection, tabelas):
+    """
+    Fora do SQLite, troca o tipo das colunas para inteiro (no SQLite o valor já é inteiro).
+
+    Colunas que já são inteiras são puladas, então pode ser executado de novo.
+    """
+    if connection.dialect.name == "sqlite":
+        return
+    preparador = connection.dialect.identifier_preparer
+    for tabela, colunas in tabelas:
+        tipos = {coluna["name"]: coluna["type"] for coluna in inspect(connection).get_columns(tabela.name)}
+        for coluna in colunas:
+            if tipos[coluna].python_type is int:
+                continue
+            connection.execute(text(
+                f"ALTER TABLE {preparador.quote(tabela.name)} ALTER COLUMN {preparador.quote(coluna)} "
+                f"TYPE BIGINT USING ROUND({preparador.quote(coluna)})::BIGINT"
+            ))
+
+def concluir(tabelas, estado):
+    """
+    Troca os tipos, apaga o progresso e grava o novo estado em uma única transação.
+
+    No PostgreSQL o ALTER TABLE é transacional: uma falha aqui deixa o banco como estava,
+    ainda "convertendo", com todos os lotes convertidos e as colunas em ponto flutuante.
+    """
+    with database.engine.begin() as connection:
+        if estado == "centavos":
+            alterar_tipos(connection, tabelas)
+        for tabela, _ in tabelas:
+            gravar_configuracao(connection, CHAVE_PROGRESSO + tabela.name, None)
+        gravar_configuracao(connection, CHAVE, estado)
+
+def converter(lote: int) -> bool:
+    """Converte o banco para centavos (ou continua a conversão interrompida)"""
+    database.Base.metadata.create_all(bind=database.engine)
+    with database.engine.begin() as connection:
+        estado = database.armazenamento_dinheiro(connection)
+        if estado == "centavos":
+            print("✅ O banco já guarda os valores em centavos")
+            return True
+        gravar_configuracao(connection, CHAVE, "convertendo")
+    if estado == "convertendo":
+        print("↩️  Retomando a conversão interrompida")
+
+    inicio = time.perf_counter()
+    tabelas = colunas_dinheiro()
+    try:
+        for tabela, colunas in tabelas:
+            convertidas = converter_tabela(tabela, colunas, lote)
+            print(f"   ✔️  {tabela.name} ({', '.join(colunas)}): {convertidas} linha(s)")
+        concluir(tabelas, "centavos")
+    except Exception as e:
+        print(f"❌ Erro na conversão: {e}")
+        print('   O banco continua marcado como "convertendo" e a aplicação não inicia.')
+        print("   Execute o script de novo para continuar do último lote confirmado,")
+        print("   ou com --reverter para voltar os lotes convertidos a reais.")
+        return False
+
+    print(f"\n✅ Valores convertidos em {time.perf_counter() - inicio:.1f}s")
+    print("   Inicie a aplicação com DINHEIRO_ARMAZENAMENTO=centavos")
+    return True
+
+def reverter(lote: int) -> bool:
+    """Desfaz uma conversão interrompida: os lotes convertidos voltam a reais"""
+    with database.engine.connect() as connection:
+        estado = database.armazenamento_dinheiro(connection)
+    if estado != "convertendo":
+        print(f"ℹ️  Nenhuma conversão interrompida: o banco guarda os valores em {estado}")
+        return estado == "reais"
+
+    tabelas = colunas_dinheiro()
+    try:
+        for tabela, colunas in tabelas:
+            revertidas = reverter_tabela(tabela, colunas, lote)
+            print(f"   ✔️  {tabela.name} ({', '.join(colunas)}): {revertidas} linha(s)")
+        concluir(tabelas, "reais")
+    except Exception as e:
+        print(f"❌ Erro ao reverter: {e}")
+        print("   Execute o script com --reverter de novo para continuar.")
+        return False
+
+    print("\n✅ Conversão desfeita: o banco guarda os valores em reais")
+    return True
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Converte os valores monetários para centavos inteiros")
+    parser.add_argument("--lote", type=int, default=5000, help="linhas por transação")
+    parser.add_argument("--reverter", action="store_true", help="desfaz uma conversão interrompida")
+    args = parser.parse_args()
+
+    print("🔧 MIGRAÇÃO DOS VALORES PARA CENTAVOS")
+    print("=" * 50)
+    if args.reverter:
+        return reverter(args.lote)
+    return converter(args.lote)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Script de migração para criar os índices que faltam em um banco existente
+Cria, tabela por tabela, os índices declarados em backend/database.py que ainda não existem
+(por exemplo, idx_movimentacao_financeira_origem) e atualiza as estatísticas do planejador.
+Pode ser executado mais de uma vez: índices existentes são mantidos.
+"""
+
+import sys
+import time
+
+from sqlalchemy import text
+
+from backend import database
+
+def main():
+    """Função principal"""
+    print("🔧 MIGRAÇÃO DE ÍNDICES")
+    print("=" * 50)
+    inicio = time.perf_counter()
+    try:
+        criados = database.create_indexes()
+    except Exception as e:
+        print(f"❌ Erro ao criar índices: {e}")
+        return False
+
+    if not criados:
+        print("✅ Todos os índices já existem")
+        return True
+
+    for nome in criados:
+        print(f"   ➕ {nome}")
+
+    # Atualiza as estatísticas para que o planejador passe a usar os índices novos
+    with database.engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+
+    print(f"\n✅ {len(criados)} índice(s) criado(s) em {time.perf_counter() - inicio:.1f}s")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -4,54 +4,52 @@ Script de migração para adicionar colunas WhatsApp
 Versão 1.5.0 - Estruturas necessárias para funcionalidades implementadas
 """
 
-import sqlite3
 import os
 from datetime import datetime
 
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend import database
+
 def conectar_banco():
-    """Conecta ao banco de dados"""
-    db_path = "./financeiro.db"
-    
-    if not os.path.exists(db_path):
-        print(f"❌ Banco de dados não encontrado em: {db_path}")
+    """Conecta ao banco de dados configurado em DATABASE_URL (SQLite por padrão)"""
+    url = database.engine.url
+    if database.E_SQLITE and url.database and not os.path.exists(url.database):
+        print(f"❌ Banco de dados não encontrado em: {url.database}")
         return None
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = database.engine.connect()
         return conn
-    except sqlite3.Error as e:
+    except SQLAlchemyError as e:
         print(f"❌ Erro ao conectar ao banco: {e}")
         return None
 
 def verificar_coluna_existe(conn, tabela, coluna):
     """Verifica se uma coluna existe em uma tabela"""
     try:
-        cursor = conn.cursor()
-        cursor.execute(f"PRAGMA table_info({tabela})")
-        colunas = cursor.fetchall()
-        colunas_existentes = [col[1] for col in colunas]
+        colunas_existentes = [col["name"] for col in inspect(conn).get_columns(tabela)]
         return coluna in colunas_existentes
-    except sqlite3.Error:
+    except SQLAlchemyError:
         return False
 
 def adicionar_coluna(conn, tabela, coluna, tipo):
     """Adiciona uma coluna a uma tabela"""
     try:
-        cursor = conn.cursor()
-        cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+        conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}"))
         conn.commit()
         return True
-    except sqlite3.Error as e:
+    except SQLAlchemyError as e:
+        conn.rollback()
         print(f"❌ Erro ao adicionar coluna {coluna} em {tabela}: {e}")
         return False
 
 def verificar_tabela_existe(conn, tabela):
     """Verifica se uma tabela existe"""
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (tabela,))
-        return cursor.fetchone() is not None
-    except sqlite3.Error:
+        return inspect(conn).has_table(tabela)
+    except SQLAlchemyError:
         return False
 
 def executar_migracoes():
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Manutenção do resumo mensal (tabela resumos_mensais)
+Uso: python rollup_mensal.py verificar | reconstruir
+"""
+
+import sys
+
+from backend.database import SessionLocal, create_tables
+from backend import rollup
+
+def verificar():
+    """Compara o resumo com os lançamentos e lista as divergências"""
+    db = SessionLocal()
+    try:
+        divergencias = rollup.verificar(db)
+        if not divergencias:
+            print("✅ Resumo mensal consistente com os lançamentos")
+            return True
+        print(f"❌ {len(divergencias)} divergência(s) encontrada(s):")
+        for d in divergencias:
+            print(
+                f"   {d['mes']} conta={d['conta_id']} categoria={d['categoria_id'] or repr(d['categoria'])} {d['tipo']}/{d['status']}: "
+                f"esperado {d['quantidade_esperada']} / {d['valor_esperado']:.2f}, "
+                f"gravado {d['quantidade_gravada']} / {d['valor_gravado']:.2f}"
+            )
+        print("\nExecute 'python rollup_mensal.py reconstruir' para corrigir.")
+        return False
+    finally:
+        db.close()
+
+def reconstruir():
+    """Recria o resumo a partir dos lançamentos"""
+    db = SessionLocal()
+    try:
+        linhas = rollup.reconstruir(db)
+        print(f"✅ Resumo mensal reconstruído: {linhas} linha(s)")
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro ao reconstruir resumo mensal: {e}")
+        return False
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    comandos = {"verificar": verificar, "reconstruir": reconstruir}
+    if len(sys.argv) != 2 or sys.argv[1] not in comandos:
+        print(__doc__.strip())
+        sys.exit(2)
+    create_tables()
+    sys.exit(0 if comandos[sys.argv[1]]() else 1)
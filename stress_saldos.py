@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Teste de estresse de concorrência dos saldos
+Vários processos (como workers do uvicorn) lançam entradas e retiradas na mesma conta ao mesmo
+tempo. Ao final, o saldo da conta deve ser igual ao saldo inicial mais as movimentações gravadas.
+Compara a forma antiga (lê o saldo, soma no Python e regrava) com os UPDATEs atômicos de backend/saldos.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend import database, saldos
+
+PROCESSOS = int(os.getenv("STRESS_PROCESSOS", "4"))
+OPERACOES = int(os.getenv("STRESS_OPERACOES", "200"))
+SALDO_INICIAL = float(os.getenv("STRESS_SALDO_INICIAL", "500"))
+
+def criar_sessao(caminho):
+    engine = create_engine(f"sqlite:///{caminho}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", database.aplicar_pragmas_sqlite)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def lancar_antigo(db, conta_id, tipo, valor):
+    """Forma antiga: lê o saldo, verifica e regrava o valor calculado no Python"""
+    conta = db.query(database.Conta).filter(database.Conta.id == conta_id).first()
+    if tipo == "Saída" and conta.saldo_atual < valor:
+        return False
+    conta.saldo_atual = conta.saldo_atual + (valor if tipo == "Entrada" else -valor)
+    return True
+
+def lancar_atomico(db, conta_id, tipo, valor):
+    """Forma atual: incremento e verificação de saldo no próprio UPDATE"""
+    if tipo == "Entrada":
+        return saldos.ajustar_saldo(db, conta_id, valor)
+    return saldos.debitar_saldo(db, conta_id, valor)
+
+MODOS = {"antigo": lancar_antigo, "atomico": lancar_atomico}
+
+def trabalhador(caminho, modo, conta_id, semente):
+    """Executa OPERACOES lançamentos, cada um em sua transação; retorna (gravados, recusados, bloqueios)"""
+    engine, Session = criar_sessao(caminho)
+    aleatorio = random.Random(semente)
+    lancar = MODOS[modo]
+    gravados = recusados = bloqueios = 0
+    for _ in range(OPERACOES):
+        tipo = aleatorio.choice(["Entrada", "Saída", "Saída"])
+        valor = float(aleatorio.randint(1, 50))
+        db = Session()
+        try:
+            if lancar(db, conta_id, tipo, valor):
+                db.add(database.MovimentacaoConta(conta_id=conta_id, tipo=tipo, valor=valor, data=date.today()))
+                db.commit()
+                gravados += 1
+            else:
+                db.rollback()
+                recusados += 1
+        except OperationalError:
+            db.rollback()
+            bloqueios += 1
+        finally:
+            db.close()
+    engine.dispose()
+    return gravados, recusados, bloqueios
+
+def executar(modo):
+    """Roda os processos contra um banco novo e compara o saldo com o razão de movimentações"""
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "stress.db")
+        engine, Session = criar_sessao(caminho)
+        database.Base.metadata.create_all(bind=engine)
+        db = Session()
+        conta = database.Conta(nome_conta="Stress", tipo="Banco", saldo_inicial=SALDO_INICIAL, saldo_atual=SALDO_INICIAL)
+        db.add(conta)
+        db.commit()
+        conta_id = conta.id
+        db.close()
+
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=PROCESSOS) as executor:
+            futuros = [executor.submit(trabalhador, caminho, modo, conta_id, semente) for semente in range(PROCESSOS)]
+            resultados = [futuro.result() for futuro in futuros]
+        duracao = time.perf_counter() - inicio
+
+        db = Session()
+        try:
+            movimento = database.MovimentacaoConta
+            entradas = db.query(func.coalesce(func.sum(movimento.valor), 0)).filter(movimento.tipo == "Entrada").scalar()
+            saidas = db.query(func.coalesce(func.sum(movimento.valor), 0)).filter(movimento.tipo == "Saída").scalar()
+            esperado = SALDO_INICIAL + float(entradas) - float(saidas)
+            gravado = saldos.saldo_atual(db, conta_id)
+        finally:
+            db.close()
+            engine.dispose()
+
+    gravados, recusados, bloqueios = (sum(coluna) for coluna in zip(*resultados))
+    return {
+        "gravados": gravados,
+        "recusados": recusados,
+        "bloqueios": bloqueios,
+        "esperado": esperado,
+        "gravado": gravado,
+        "diferenca": gravado - esperado,
+        "duracao": duracao,
+    }
+
+def main():
+    """Função principal"""
+    print("📊 ESTRESSE DE CONCORRÊNCIA DOS SALDOS")
+    print("=" * 50)
+    print(f"Processos: {PROCESSOS} | Operações por processo: {OPERACOES} | Saldo inicial: {SALDO_INICIAL:.2f}")
+    print()
+    print(f"{'Modo':<10} {'Gravados':>9} {'Recusados':>10} {'Bloqueios':>10} {'Saldo':>12} {'Razão':>12} {'Diferença':>11}")
+    print("─" * 80)
+    sucesso = True
+    for modo in MODOS:
+        r = executar(modo)
+        print(
+            f"{modo:<10} {r['gravados']:>9} {r['recusados']:>10} {r['bloqueios']:>10} "
+            f"{r['gravado']:>12.2f} {r['esperado']:>12.2f} {r['diferenca']:>11.2f}"
+        )
+        if modo == "atomico" and (abs(r["diferenca"]) > 0.005 or r["gravado"] < 0):
+            sucesso = False
+    print()
+    print("✅ Saldo atômico confere com o razão" if sucesso else "❌ Saldo atômico divergente")
+    return sucesso
+
+if __name__ == "__main__":
+    try:
+        success = main()
+        sys.exit(0 if success else 1)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Teste cancelado pelo usuário.")
+        sys.exit(1)
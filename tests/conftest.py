@@ -0,0 +1,88 @@
+"""
+Fixtures dos testes
+
+Cada teste recebe um banco vazio. Os testes que usam o banco rodam no SQLite (arquivo
+temporário) e no PostgreSQL apontado por TEST_POSTGRES_URL; sem a variável (ou sem o driver
+ou o servidor), os casos PostgreSQL são pulados. As tabelas desse banco são apagadas e
+recriadas: use um banco só para os testes.
+"""
+
+import os
+import tempfile
+
+# Antes de importar o backend: a engine padrão é criada na importação
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='financeiro-testes-'), 'financeiro.db')}"
+
+import pytest
+from sqlalchemy.engine import make_url
+
+from backend import auth, dashboard, database
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def banco(request, tmp_path, monkeypatch):
+    """Engine de um banco vazio com as tabelas criadas; a aplicação passa a usá-la"""
+    if request.param == "sqlite":
+        url = f"sqlite:///{tmp_path / 'financeiro.db'}"
+    elif TEST_POSTGRES_URL:
+        url = TEST_POSTGRES_URL
+    else:
+        pytest.skip("TEST_POSTGRES_URL não definida")
+    try:
+        engine = database.criar_engine(url)
+        with engine.connect():
+            pass
+    except Exception as e:
+        pytest.skip(f"{request.param} indisponível: {e}")
+    if request.param != "sqlite":
+        database.Base.metadata.drop_all(bind=engine)
+
+    padrao = database.engine
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "E_SQLITE", make_url(url).get_backend_name() == "sqlite")
+    database.SessionLocal.configure(bind=engine)
+    database.create_tables()
+    # Caches do processo guardam dados do banco do teste anterior
+    auth.session_cache.clear()
+    dashboard.dashboard_cache.clear()
+    try:
+        yield engine
+    finally:
+        database.SessionLocal.configure(bind=padrao)
+        engine.dispose()
+
+@pytest.fixture
+def db(banco):
+    sessao = database.SessionLocal()
+    try:
+        yield sessao
+    finally:
+        sessao.close()
+
+@pytest.fixture
+def cliente(banco, monkeypatch):
+    """TestClient autenticado como admin"""
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    monkeypatch.setattr(main.limiter, "enabled", False)
+    sessao = database.SessionLocal()
+    sessao.add(database.Usuario(username="admin", hashed_password=auth.get_password_hash("admin123")))
+    sessao.commit()
+    sessao.close()
+    with TestClient(main.app) as client:
+        resposta = client.post("/api/token", data={"username": "admin", "password": "admin123"})
+        assert resposta.status_code == 200, resposta.text
+        client.headers["Authorization"] = f"Bearer {resposta.json()['access_token']}"
+        yield client
+
+@pytest.fixture
+def cadastros(db):
+    """Usuário, fornecedor e conta bancária (saldo 1000) para os lançamentos"""
+    usuario = database.Usuario(username="teste", hashed_password="-")
+    fornecedor = database.FornecedorDoador(tipo="Fornecedor", nome_razao="Fornecedor")
+    conta = database.Conta(nome_conta="Banco", tipo="Banco", saldo_inicial=1000.0, saldo_atual=1000.0)
+    db.add_all([usuario, fornecedor, conta])
+    db.commit()
+    return {"usuario_id": usuario.id, "fornecedor_id": fornecedor.id, "conta_id": conta.id}
@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend import auth, database
+
+def token_da_sessao(cliente):
+    """session_token gravado no JWT do cliente autenticado"""
+    jwt = cliente.headers["Authorization"].split()[1]
+    return auth.jwt.decode(jwt, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])["session_token"]
+
+@pytest.fixture
+def sem_flush(monkeypatch):
+    """Buffer de atividade que só grava quando chamado explicitamente"""
+    monkeypatch.setattr(auth.activity_buffer, "flush_interval", 3600)
+
+def consultas_durante(banco, operacao):
+    consultas = []
+    contar = lambda *args: consultas.append(args[2])
+    event.listen(banco, "before_cursor_execute", contar)
+    try:
+        operacao()
+    finally:
+        event.remove(banco, "before_cursor_execute", contar)
+    return consultas
+
+def test_sessao_em_cache_responde_sem_consultar_o_banco(banco, cliente, sem_flush):
+    # A primeira requisição valida no banco e coloca a sessão no cache
+    assert cliente.get("/api/auth/check").status_code == 200
+    assert auth.session_cache.get(token_da_sessao(cliente)) is not None
+
+    respostas = []
+    consultas = consultas_durante(banco, lambda: respostas.append(cliente.get("/api/auth/check")))
+    assert respostas[0].json()["username"] == "admin"
+    assert consultas == []
+
+def test_sessao_expirada_volta_ao_banco(cliente, db, sem_flush):
+    token = token_da_sessao(cliente)
+    assert cliente.get("/api/auth/check").status_code == 200
+
+    # Expiração vencida no cache: a sessão é revalidada no banco, que ainda a aceita
+    auth.session_cache.get(token)["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+    assert cliente.get("/api/auth/check").status_code == 200
+    assert auth.session_cache.get(token)["expires_at"] > datetime.utcnow()
+
+    # Desativada no banco por outro worker: vale até o TTL do cache vencer
+    db.query(database.UserSession).update({"is_active": False})
+    db.commit()
+    assert cliente.get("/api/auth/check").status_code == 200
+    auth.session_cache.set(token, auth.session_cache.get(token), ttl=0)
+    assert cliente.get("/api/auth/check").status_code == 401
+
+def test_sessao_expirada_no_banco(cliente, db, sem_flush):
+    token = token_da_sessao(cliente)
+    db.query(database.UserSession).update({"expires_at": datetime.utcnow() - timedelta(minutes=1)})
+    db.commit()
+    assert cliente.get("/api/auth/check").status_code == 401
+    assert auth.session_cache.get(token) is None
+
+@pytest.mark.parametrize("invalidar", [
+    lambda db, token, usuario_id: auth.invalidate_user_session(db, token),
+    lambda db, token, usuario_id: auth.invalidate_all_user_sessions(db, usuario_id),
+], ids=["logout", "todas"])
+def test_invalidacao_remove_do_cache(cliente, db, sem_flush, invalidar):
+    token = token_da_sessao(cliente)
+    usuario_id = cliente.get("/api/auth/check").json()["user_id"]
+    assert auth.session_cache.get(token) is not None
+
+    invalidar(db, token, usuario_id)
+    assert auth.session_cache.get(token) is None
+    assert cliente.get("/api/auth/check").status_code == 401
+
+def test_falha_no_flush_nao_derruba_a_requisicao(cliente, monkeypatch):
+    assert cliente.get("/api/auth/check").status_code == 200
+
+    def falhar():
+        raise RuntimeError("banco indisponível")
+    with monkeypatch.context() as m:
+        m.setattr(auth.activity_buffer, "flush_interval", 0)
+        m.setattr(auth.activity_buffer, "flush", falhar)
+        # Acerto no cache com flush vencido
+        assert cliente.get("/api/auth/check").status_code == 200
+        # Validação no banco com flush vencido
+        auth.session_cache.clear()
+        assert cliente.get("/api/auth/check").status_code == 200
+
+def sessao_gravada(db):
+    db.expire_all()
+    return db.query(database.UserSession).filter_by(is_active=True).one()
+
+def test_atividade_gravada_uma_vez_por_flush(banco, cliente, db, sem_flush):
+    gravada = sessao_gravada(db).last_activity
+    for _ in range(5):
+        assert cliente.get("/api/auth/check").status_code == 200
+    # Nada é gravado entre os flushes
+    assert sessao_gravada(db).last_activity == gravada
+
+    # Outra sessão ativa entra no mesmo UPDATE em lote
+    auth.activity_buffer.touch("outra-sessao")
+    gravadas = []
+    consultas = consultas_durante(banco, lambda: gravadas.append(auth.activity_buffer.flush()))
+    assert gravadas == [2]
+    assert sum(c.lstrip().upper().startswith("UPDATE") for c in consultas) == 1
+    assert sessao_gravada(db).last_activity > gravada
+    assert auth.activity_buffer.flush() == 0
+
+def test_atividade_gravada_no_desligamento(cliente, db, sem_flush):
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    gravada = sessao_gravada(db).last_activity
+    with TestClient(main.app) as outro:
+        outro.headers["Authorization"] = cliente.headers["Authorization"]
+        assert outro.get("/api/auth/check").status_code == 200
+        assert auth.activity_buffer.pending_expiry(token_da_sessao(cliente)) is not None
+    # O lifespan grava o buffer ao encerrar
+    assert auth.activity_buffer.pending_expiry(token_da_sessao(cliente)) is None
+    assert sessao_gravada(db).last_activity > gravada
+
+def test_sessoes_listadas_com_atividade_do_buffer(cliente, db, sem_flush):
+    sessao = sessao_gravada(db)
+    # Expirada no banco, mas renovada no buffer
+    db.query(database.UserSession).update({"expires_at": datetime.utcnow() - timedelta(minutes=1)})
+    db.commit()
+    expires_at = auth.activity_buffer.touch(sessao.session_token)
+
+    [listada] = auth.get_user_sessions(db, sessao.usuario_id)
+    assert listada.expires_at == expires_at
+    # A renovação continua só no buffer: a sessão não fica com alterações pendentes
+    assert not db.dirty
+
+    auth.activity_buffer.discard(sessao.session_token)
+    db.expire_all()
+    assert auth.get_user_sessions(db, sessao.usuario_id) == []
+
+def test_limpeza_periodica_de_sessoes(db, cadastros, monkeypatch):
+    monkeypatch.setattr(auth, "SESSION_RETENTION_DAYS", 30)
+    agora = datetime.utcnow()
+    sessoes = {
+        "viva": (True, agora + timedelta(hours=1)),
+        "vencida": (True, agora - timedelta(minutes=1)),
+        "renovada": (True, agora - timedelta(minutes=1)),
+        "inativa_recente": (False, agora - timedelta(days=1)),
+        "inativa_antiga": (False, agora - timedelta(days=31)),
+    }
+    db.add_all([
+        database.UserSession(
+            usuario_id=cadastros["usuario_id"], session_token=token, ip_address="127.0.0.1", is_active=ativa, expires_at=expira,
+        )
+        for token, (ativa, expira) in sessoes.items()
+    ])
+    db.commit()
+    # Renovação ainda no buffer: a sessão continua em uso
+    auth.activity_buffer.touch("renovada")
+
+    assert auth.sweep_sessions() == {"desativadas": 1, "apagadas": 1}
+    db.expire_all()
+    restantes = {s.session_token: s.is_active for s in db.query(database.UserSession)}
+    assert restantes == {"viva": True, "vencida": False, "renovada": True, "inativa_recente": False}
@@ -0,0 +1,122 @@
+"""
+Compatibilidade SQLite / PostgreSQL
+
+As mesmas operações do sistema rodam nos dois bancos (fixture `banco`) e devem dar os mesmos
+resultados: lançamentos, saldos atômicos concorrentes, resumo mensal, recorrência,
+categorias por id, conciliação, painel e a migração para centavos.
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from sqlalchemy import inspect, text
+
+import migrate_centavos
+from backend import categorias, conciliacao, dashboard, database, lancamentos, recorrencia, rollup, saldos
+
+THREADS = 4
+OPERACOES = 40  # Mais retiradas do que o saldo comporta
+
+def lancar_marco(db, cadastros):
+    """Dez contas pagas de 12,34 e dez recebidas de 0,10 em março de 2026"""
+    db.add_all([database.CategoriaPagar(nome="Luz"), database.CategoriaReceber(nome="Mensalidade")])
+    db.commit()
+    for dia in range(1, 11):
+        pagar = database.ContaPagar(
+            fornecedor_id=cadastros["fornecedor_id"], status="Pago", categoria="Luz", conta_id=cadastros["conta_id"],
+            data_emissao=date(2026, 3, dia), data_vencimento=date(2026, 3, dia), valor=12.34,
+        )
+        db.add(pagar)
+        lancamentos.pagar(db, pagar, cadastros["usuario_id"])
+        receber = database.ContaReceber(
+            origem="Outro", fornecedor_doador_id=cadastros["fornecedor_id"], status="Recebido",
+            categoria="Mensalidade", conta_id=cadastros["conta_id"],
+            data_emissao=date(2026, 3, dia), data_vencimento=date(2026, 3, dia), valor=0.1,
+        )
+        db.add(receber)
+        lancamentos.receber(db, receber, cadastros["usuario_id"])
+    db.commit()
+
+def test_lancamentos_resumo_e_painel(db, cadastros):
+    lancar_marco(db, cadastros)
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == pytest.approx(877.6)
+    assert not lancamentos.movimentar_saldo(db, cadastros["conta_id"], "Saída", 10 ** 6), "saída acima do saldo foi aceita"
+    db.rollback()
+
+    assert rollup.verificar(db) == []
+    assert conciliacao.verificar(db) == []
+    mensal = dashboard.resumo_mensal(db, 2026, 3)
+    assert mensal["total_pago"] == pytest.approx(123.4)
+    assert mensal["total_recebido"] == pytest.approx(1.0)
+    assert [(item["categoria"], pytest.approx(item["valor"])) for item in mensal["despesas_por_categoria"]] == [("Luz", 123.4)]
+    anual = {(item["mes"], item["tipo"], item["status"]): item for item in rollup.resumo_anual(db, 2026)}
+    assert anual[(3, "pagar", "Pago")]["quantidade"] == 10
+    assert anual[(3, "pagar", "Pago")]["valor"] == pytest.approx(123.4)
+    assert anual[(3, "receber", "Recebido")]["valor"] == pytest.approx(1.0)
+
+def test_retiradas_concorrentes(db, cadastros):
+    conta_id = cadastros["conta_id"]
+
+    def retirar(_):
+        sessao = database.SessionLocal()
+        try:
+            feitas = 0
+            for _ in range(OPERACOES):
+                if lancamentos.movimentar_saldo(sessao, conta_id, "Saída", 7.77):
+                    feitas += 1
+                sessao.commit()
+            return feitas
+        finally:
+            sessao.close()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        retiradas = sum(executor.map(retirar, range(THREADS)))
+    # A ordem das retiradas varia, mas o total e o saldo não: cabem 128 de 7,77 em 1000
+    assert retiradas == 128
+    assert saldos.saldo_atual(db, conta_id) == pytest.approx(5.44)
+    assert conciliacao.verificar(db) == []
+
+def test_recorrencia_em_lote(db, cadastros):
+    dados = dict(
+        fornecedor_id=cadastros["fornecedor_id"], beneficiario_id=None, status="Pendente", categoria="Luz",
+        conta_id=cadastros["conta_id"], data_emissao=date(2090, 4, 1), data_vencimento=date(2090, 4, 10), valor=50.0,
+        observacao=None, recorrente=True, meses_repetir=6,
+    )
+    regra = recorrencia.criar_regra(db, "pagar", dados, "compat-serie", 6)
+    db.commit()
+    assert len(recorrencia.parcelas_virtuais(db, "pagar")) == 6
+    # Gravação em lote (INSERT de várias linhas)
+    assert recorrencia.materializar_ate(db, regra, date(2090, 6, 30)) == 3
+    db.commit()
+    assert len(recorrencia.parcelas_virtuais(db, "pagar")) == 3
+    assert rollup.verificar(db) == []
+
+def test_categoria_renomeada(db, cadastros):
+    lancar_marco(db, cadastros)
+    luz = db.query(database.CategoriaPagar).filter_by(nome="Luz").one()
+    luz.nome = "Energia"
+    db.commit()
+    # Só o cadastro muda; o filtro por id encontra as contas
+    ids, nomes = categorias.resolver(db, database.ContaPagar, "categoria", ["Energia"])
+    assert db.query(database.ContaPagar).filter(
+        categorias.condicao(database.ContaPagar, "categoria", ids, nomes)
+    ).count() == 10
+
+def test_migracao_centavos(banco, db, cadastros, monkeypatch):
+    lancar_marco(db, cadastros)
+    db.close()
+
+    monkeypatch.setattr(sys, "argv", ["migrate_centavos.py", "--lote", "3"])
+    assert migrate_centavos.main()
+
+    with banco.connect() as connection:
+        assert database.armazenamento_dinheiro(connection) == "centavos"
+        assert connection.execute(text("SELECT DISTINCT valor FROM contas_pagar")).scalars().all() == [1234]
+        assert connection.execute(text("SELECT saldo_atual FROM contas")).scalar() == 87760
+        assert connection.execute(text("SELECT COUNT(*) FROM configuracoes WHERE chave LIKE 'dinheiro:%'")).scalar() == 0
+    if banco.dialect.name != "sqlite":
+        # Fora do SQLite as colunas passam a BIGINT
+        colunas = {coluna["name"]: coluna["type"] for coluna in inspect(banco).get_columns("contas_pagar")}
+        assert colunas["valor"].python_type is int
@@ -0,0 +1,85 @@
+from datetime import date
+
+import pytest
+
+from backend import categorias, database
+
+def inserir_sem_id(db, cadastros, nomes):
+    """Contas a pagar gravadas como antes das colunas de id: só com o nome da categoria"""
+    db.execute(database.ContaPagar.__table__.insert(), [
+        dict(fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria=nome,
+             conta_id=cadastros["conta_id"], data_vencimento=date(2026, 3, 10), valor=10.0)
+        for nome in nomes
+    ])
+    db.execute(database.ContaReceber.__table__.insert(), [
+        dict(fornecedor_doador_id=cadastros["fornecedor_id"], status="Pendente", categoria="Mensalidade",
+             origem="Doação", conta_id=cadastros["conta_id"], data_vencimento=date(2026, 3, 10), valor=10.0)
+    ])
+    db.commit()
+
+@pytest.fixture
+def cadastrados(db):
+    db.add_all([
+        database.CategoriaPagar(nome="Luz"), database.CategoriaPagar(nome="Água"),
+        database.CategoriaReceber(nome="Mensalidade"), database.OrigemReceber(nome="Doação"),
+    ])
+    db.commit()
+
+def cadastro_e_linhas(db):
+    """({nome: id} das categorias de pagar, [(categoria, categoria_id)] das contas a pagar)"""
+    pagar = database.ContaPagar
+    return {
+        nome: id_ for nome, id_ in
+        db.query(database.CategoriaPagar.nome, database.CategoriaPagar.id)
+    }, [(c.categoria, c.categoria_id) for c in db.query(pagar).order_by(pagar.id)]
+
+def test_migracao_preenche_ids_em_lotes(db, cadastros, cadastrados):
+    inserir_sem_id(db, cadastros, ["Luz", "Água", "Luz", "Gás", "Luz"])
+    assert categorias.pendentes(db) == {
+        "contas_pagar.categoria_id": 5, "contas_receber.categoria_id": 1, "contas_receber.origem_receber_id": 1,
+    }
+
+    assert categorias.migrar(db, lote=2) == {
+        "contas_pagar.categoria_id": 5, "contas_receber.categoria_id": 1, "contas_receber.origem_receber_id": 1,
+    }
+    cadastro, linhas = cadastro_e_linhas(db)
+    assert linhas == [(nome, cadastro[nome]) for nome in ["Luz", "Água", "Luz", "Gás", "Luz"]]
+    # O nome sem cadastro vira um cadastro inativo, fora das listas de seleção
+    gas = db.query(database.CategoriaPagar).filter_by(nome="Gás").one()
+    assert gas.ativo is False
+    assert set(categorias.pendentes(db).values()) == {0}
+
+    # Executar de novo não altera nada
+    assert set(categorias.migrar(db, lote=2).values()) == {0}
+
+def test_lancamento_novo_e_renomeado_recebem_id(db, cadastros, cadastrados):
+    conta = database.ContaPagar(
+        fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria="Luz",
+        conta_id=cadastros["conta_id"], valor=10.0,
+    )
+    db.add(conta)
+    db.commit()
+    cadastro, _ = cadastro_e_linhas(db)
+    assert conta.categoria_id == cadastro["Luz"]
+
+    # Trocar o nome gravado troca o id; um nome fora do cadastro fica sem id
+    conta.categoria = "Água"
+    db.commit()
+    assert conta.categoria_id == cadastro["Água"]
+    conta.categoria = "Outra"
+    db.commit()
+    assert conta.categoria_id is None
+
+def test_renomear_cadastro_mantem_os_lancamentos(db, cadastros, cadastrados):
+    inserir_sem_id(db, cadastros, ["Luz", "Água"])
+    categorias.migrar(db)
+    luz = db.query(database.CategoriaPagar).filter_by(nome="Luz").one()
+    luz.nome = "Energia"
+    db.commit()
+
+    ids, nomes = categorias.resolver(db, database.ContaPagar, "categoria", ["Energia"])
+    assert ids == {luz.id} and nomes == {"Energia"}
+    encontradas = db.query(database.ContaPagar).filter(categorias.condicao(database.ContaPagar, "categoria", ids, nomes)).all()
+    assert [conta.categoria for conta in encontradas] == ["Luz"]
+    linhas = categorias.atualizar_nomes(db, database.ContaPagar, [{"categoria": "Luz", "categoria_id": luz.id}])
+    assert linhas == [{"categoria": "Energia", "categoria_id": luz.id}]
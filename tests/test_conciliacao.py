@@ -0,0 +1,67 @@
+from backend import conciliacao, database, lancamentos, saldos
+
+def desviar_saldo(db, conta_id, saldo):
+    """Grava um saldo diferente do razão, como uma escrita perdida"""
+    db.query(database.Conta).filter(database.Conta.id == conta_id).update({"saldo_atual": saldo})
+    db.commit()
+
+def test_saldos_dos_dois_razoes(db, cadastros):
+    conta_id = cadastros["conta_id"]
+    pagar = database.ContaPagar(
+        fornecedor_id=cadastros["fornecedor_id"], status="Pago", categoria="Luz", conta_id=conta_id, valor=120.0,
+    )
+    db.add(pagar)
+    lancamentos.pagar(db, pagar, cadastros["usuario_id"])
+    lancamentos.movimentar_saldo(db, conta_id, "Entrada", 30.0, "Depósito")
+    db.commit()
+
+    [conta] = conciliacao.calcular_saldos(db)
+    assert (conta["saldo_gravado"], conta["saldo_calculado"], conta["diferenca"]) == (910.0, 910.0, 0.0)
+    assert conciliacao.verificar(db) == []
+
+def test_divergencia_detectada_e_corrigida(db, cadastros):
+    conta_id = cadastros["conta_id"]
+    desviar_saldo(db, conta_id, 950.0)
+    [divergencia] = conciliacao.verificar(db)
+    assert (divergencia["conta_id"], divergencia["diferenca"]) == (conta_id, -50.0)
+
+    assert conciliacao.corrigir(db) == [divergencia]
+    assert saldos.saldo_atual(db, conta_id) == 1000.0
+    assert conciliacao.verificar(db) == []
+
+def test_correcao_preserva_lancamento_concorrente(db, cadastros, monkeypatch):
+    conta_id = cadastros["conta_id"]
+    desviar_saldo(db, conta_id, 950.0)
+    verificar = conciliacao.verificar
+
+    def verificar_e_lancar(sessao):
+        divergencias = verificar(sessao)
+        # Outro worker lança uma saída entre a verificação e a correção
+        outra = database.SessionLocal()
+        lancamentos.movimentar_saldo(outra, conta_id, "Saída", 10.0, "Saque")
+        outra.commit()
+        outra.close()
+        return divergencias
+    monkeypatch.setattr(conciliacao, "verificar", verificar_e_lancar)
+    conciliacao.corrigir(db)
+    db.expire_all()
+    # A correção soma a diferença em vez de gravar o saldo calculado antes da saída
+    assert saldos.saldo_atual(db, conta_id) == 990.0
+    monkeypatch.undo()
+    assert conciliacao.verificar(db) == []
+
+def test_diferenca_abaixo_de_meio_centavo(db, cadastros):
+    desviar_saldo(db, cadastros["conta_id"], 1000.004)
+    assert conciliacao.verificar(db) == []
+
+def test_tarefa_so_corrige_se_configurada(db, cadastros, monkeypatch):
+    desviar_saldo(db, cadastros["conta_id"], 950.0)
+    monkeypatch.setattr(conciliacao, "CONCILIACAO_CORRIGIR", False)
+    assert conciliacao.conciliar() == 1
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == 950.0
+
+    monkeypatch.setattr(conciliacao, "CONCILIACAO_CORRIGIR", True)
+    assert conciliacao.conciliar() == 1
+    db.expire_all()
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == 1000.0
+    assert conciliacao.conciliar() == 0
@@ -0,0 +1,163 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, select, update
+
+from backend import conciliacao, dashboard, database
+
+def conta_pagar(cadastros, valor=10.0):
+    return database.ContaPagar(
+        fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria="Luz",
+        conta_id=cadastros["conta_id"], data_vencimento=date(2026, 3, 10), valor=valor,
+    )
+
+def consultas_durante(banco, operacao):
+    consultas = []
+    contar = lambda *args: consultas.append(args[2])
+    event.listen(banco, "before_cursor_execute", contar)
+    try:
+        operacao()
+    finally:
+        event.remove(banco, "before_cursor_execute", contar)
+    return consultas
+
+def test_acerto_nao_executa_sql(banco):
+    calculos = []
+    calcular = lambda: calculos.append(1) or {"total": len(calculos)}
+    assert dashboard.em_cache("teste", (), calcular) == {"total": 1}
+    respostas = []
+    assert consultas_durante(banco, lambda: respostas.append(dashboard.em_cache("teste", (), calcular))) == []
+    assert respostas == [{"total": 1}]
+
+def test_commit_com_escrita_invalida(db, cadastros):
+    versao = dashboard.versao_dados()
+    db.add(conta_pagar(cadastros))
+    db.flush()
+    # Só depois do commit
+    assert dashboard.versao_dados() == versao
+    db.commit()
+    assert dashboard.versao_dados() == versao + 1
+
+    # Escrita em massa (fora do flush) também conta
+    db.execute(update(database.ContaPagar).values(valor=20.0))
+    db.commit()
+    assert dashboard.versao_dados() == versao + 2
+
+def test_sem_invalidacao(db, cadastros):
+    versao = dashboard.versao_dados()
+    db.add(conta_pagar(cadastros))
+    db.flush()
+    db.rollback()
+    # Sessões de usuário não aparecem no painel
+    db.add(database.UserSession(
+        usuario_id=cadastros["usuario_id"], session_token="token", ip_address="127.0.0.1",
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+    ))
+    db.commit()
+    db.query(database.ContaPagar).all()
+    db.commit()
+    assert dashboard.versao_dados() == versao
+
+def test_escrita_pela_api_recalcula_painel(cliente, cadastros):
+    antes = cliente.get("/api/dashboard/cache-stats").json()["versao_dados"]
+    resposta = cliente.post(f"/api/contas/{cadastros['conta_id']}/adicionar_saldo", json={"valor": 10.0})
+    assert resposta.status_code == 200, resposta.text
+    assert cliente.get("/api/dashboard/cache-stats").json()["versao_dados"] == antes + 1
+
+    # Escritas recusadas não gravam nada e não invalidam
+    assert cliente.post("/api/contas/999/adicionar_saldo", json={"valor": 10.0}).status_code == 404
+    assert cliente.post(f"/api/contas/{cadastros['conta_id']}/adicionar_saldo", json={}).status_code == 422
+    assert cliente.get("/api/dashboard/cache-stats").json()["versao_dados"] == antes + 1
+
+def versao_compartilhada(db):
+    db.rollback()
+    valor = db.execute(
+        select(database.Configuracao.valor).where(database.Configuracao.chave == dashboard.CHAVE_VERSAO)
+    ).scalar()
+    return int(valor or 0)
+
+def test_escrita_em_outro_worker(banco, db, cadastros):
+    dashboard.sincronizar_versao()
+    versao, compartilhada = dashboard.versao_dados(), versao_compartilhada(db)
+    assert dashboard.sincronizar_versao() is False
+
+    # O commit deste processo incrementa também o contador compartilhado, na mesma transação
+    db.add(conta_pagar(cadastros))
+    db.commit()
+    assert dashboard.versao_dados() == versao + 1
+    assert versao_compartilhada(db) == compartilhada + 1
+
+    # Outro worker grava: este processo só percebe na sincronização
+    dashboard.sincronizar_versao()
+    versao = dashboard.versao_dados()
+    with banco.begin() as connection:
+        dashboard.incrementar_versao_compartilhada(connection)
+    assert dashboard.versao_dados() == versao
+    assert dashboard.sincronizar_versao() is True
+    assert dashboard.versao_dados() == versao + 1
+    assert dashboard.sincronizar_versao() is False
+
+def test_contador_desligado_com_um_worker(db, cadastros, monkeypatch):
+    monkeypatch.setattr(dashboard, "DASHBOARD_CACHE_SYNC_SECONDS", 0)
+    versao, compartilhada = dashboard.versao_dados(), versao_compartilhada(db)
+    db.add(conta_pagar(cadastros))
+    db.commit()
+    assert dashboard.versao_dados() == versao + 1
+    assert versao_compartilhada(db) == compartilhada
+
+def test_corrigir_invalida_cache(db, cadastros):
+    db.query(database.Conta).filter(database.Conta.id == cadastros["conta_id"]).update({"saldo_atual": 900.0})
+    db.commit()
+    versao = dashboard.versao_dados()
+    assert conciliacao.corrigir(db)
+    assert dashboard.versao_dados() == versao + 1
+    # Sem divergências, nada muda no painel
+    assert conciliacao.corrigir(db) == []
+    assert dashboard.versao_dados() == versao + 1
+
+def test_resumo_mensal_com_quebras(cliente, db, cadastros):
+    luz, agua = database.CategoriaPagar(nome="Luz"), database.CategoriaPagar(nome="Água")
+    ana, bruno = database.Beneficiario(nome="Ana"), database.Beneficiario(nome="Bruno")
+    db.add_all([luz, agua, database.CategoriaReceber(nome="Mensalidade"), database.OrigemReceber(nome="Doação"), ana, bruno])
+    db.commit()
+    maio, junho = date(2026, 5, 10), date(2026, 6, 1)
+
+    def receber(status, valor, categoria="Mensalidade", vencimento=maio):
+        return database.ContaReceber(
+            fornecedor_doador_id=cadastros["fornecedor_id"], status=status, categoria=categoria, origem="Doação",
+            conta_id=cadastros["conta_id"], data_vencimento=vencimento, valor=valor,
+        )
+
+    def pagar(status, valor, categoria="Luz", beneficiario=None, vencimento=maio):
+        return database.ContaPagar(
+            fornecedor_id=cadastros["fornecedor_id"], status=status, categoria=categoria, conta_id=cadastros["conta_id"],
+            beneficiario_id=beneficiario and beneficiario.id, data_vencimento=vencimento, valor=valor,
+        )
+
+    def doacao(valor, recebido=True, dia=maio):
+        return database.DoacaoAvulsa(nome_doador="Doador", valor=valor, data=dia, recebido=recebido, conta_id=cadastros["conta_id"])
+
+    db.add_all([
+        receber("Recebido", 100.0), receber("Recebido", 50.0), receber("Pendente", 30.0),
+        receber("Recebido", 20.0, categoria="Antiga"), receber("Recebido", 500.0, vencimento=junho),
+        pagar("Pago", 200.0, beneficiario=ana), pagar("Pago", 80.0, categoria="Água", beneficiario=bruno),
+        pagar("Pago", 40.0), pagar("Pendente", 70.0), pagar("Pago", 900.0, beneficiario=ana, vencimento=junho),
+        doacao(25.0), doacao(999.0, recebido=False), doacao(500.0, dia=junho),
+    ])
+    db.commit()
+    # A quebra usa o nome atual do cadastro
+    luz.nome = "Energia"
+    db.commit()
+
+    resposta = cliente.get("/api/dashboard/mensal", params={"ano": 2026, "mes": 5})
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json() == {
+        "ano": 2026, "mes": 5,
+        "total_recebido": 170.0, "total_a_receber": 30.0, "total_pago": 320.0, "total_a_pagar": 70.0,
+        "total_doacoes": 25.0, "total_entradas": 195.0, "total_saidas": 320.0,
+        "receitas_por_categoria": [{"categoria": "Mensalidade", "valor": 150.0}, {"categoria": "Antiga", "valor": 20.0}],
+        "despesas_por_categoria": [{"categoria": "Energia", "valor": 240.0}, {"categoria": "Água", "valor": 80.0}],
+        "gastos_por_beneficiario": [
+            {"beneficiario_id": ana.id, "nome": "Ana", "valor": 200.0},
+            {"beneficiario_id": bruno.id, "nome": "Bruno", "valor": 80.0},
+        ],
+    }
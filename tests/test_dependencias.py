@@ -0,0 +1,60 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from backend import database, main
+
+def conta_pagar(cadastros, **campos):
+    dados = dict(
+        fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria="Luz",
+        conta_id=cadastros["conta_id"], data_vencimento=date(2026, 3, 10), valor=10.0,
+    )
+    dados.update(campos)
+    return database.ContaPagar(**dados)
+
+def test_uma_consulta_para_todas_as_verificacoes(banco, db, cadastros):
+    db.add(conta_pagar(cadastros))
+    db.add(database.MovimentacaoConta(conta_id=cadastros["conta_id"], tipo="Entrada", valor=5.0, data=date(2026, 3, 1)))
+    db.commit()
+    consultas = []
+    contar = lambda *args: consultas.append(args[2])
+    event.listen(banco, "before_cursor_execute", contar)
+    try:
+        dependencias = main.check_conta_dependencies(db, cadastros["conta_id"])
+    finally:
+        event.remove(banco, "before_cursor_execute", contar)
+    # Só as dependências encontradas, na ordem das verificações
+    assert dependencias == ["conta(s) a pagar", "movimentação(ões) de saldo"]
+    assert len(consultas) == 1
+    assert main.check_conta_dependencies(db, cadastros["conta_id"] + 1) == []
+
+def test_exclusao_bloqueada_por_dependencia(cliente, cadastros, db):
+    db.add(conta_pagar(cadastros))
+    db.commit()
+    resposta = cliente.delete(f"/api/fornecedores-doadores/{cadastros['fornecedor_id']}")
+    assert resposta.status_code == 400
+    assert "conta(s) a pagar" in resposta.json()["detail"]
+
+    db.query(database.ContaPagar).delete()
+    db.commit()
+    assert cliente.delete(f"/api/fornecedores-doadores/{cadastros['fornecedor_id']}").status_code == 200
+
+def test_categoria_em_uso_pelo_id_e_pelo_nome(db, cadastros):
+    luz, agua = database.CategoriaPagar(nome="Luz"), database.CategoriaPagar(nome="Água")
+    db.add_all([luz, agua])
+    db.commit()
+    db.add(conta_pagar(cadastros))
+    db.commit()
+    # Renomeada, a categoria continua em uso pelo id
+    luz.nome = "Energia"
+    db.commit()
+    assert main.check_categoria_pagar_dependencies(db, luz) == ["conta(s) a pagar"]
+    assert main.check_categoria_pagar_dependencies(db, agua) == []
+
+    # Linha gravada antes dos ids (sem categoria_id) é encontrada pelo nome
+    db.execute(database.ContaPagar.__table__.insert().values(
+        fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria="Água",
+        conta_id=cadastros["conta_id"], valor=1.0, categoria_id=None,
+    ))
+    db.commit()
+    assert main.check_categoria_pagar_dependencies(db, agua) == ["conta(s) a pagar"]
@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import func, text
+
+from backend import database, dinheiro
+
+@pytest.fixture(params=["reais", "centavos"])
+def armazenamento(request, monkeypatch):
+    """Formato dos valores no banco; vem antes da fixture `banco`, que cria as tabelas nele"""
+    monkeypatch.setattr(dinheiro, "DINHEIRO_ARMAZENAMENTO", request.param)
+    monkeypatch.setattr(dinheiro, "EM_CENTAVOS", request.param == "centavos")
+    return request.param
+
+@pytest.mark.parametrize("reais,centavos", [
+    (0.1 + 0.2, 30), (12.345, 1235), (0.285, 29), (-12.345, -1235), (-0.1, -10), (0, 0), (None, None),
+])
+def test_para_centavos(reais, centavos):
+    assert dinheiro.para_centavos(reais) == centavos
+    if centavos is not None:
+        assert dinheiro.para_reais(centavos) == dinheiro.arredondar(reais)
+
+def test_dinheiro_ida_e_volta(armazenamento, db, cadastros):
+    conta = database.Conta(nome_conta="Caixa", tipo="Caixa", saldo_inicial=0.1 + 0.2, saldo_atual=-12.34)
+    db.add(conta)
+    for valor in (0.1, 0.2, -0.3):
+        db.add(database.ContaPagar(
+            fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria="Luz",
+            conta_id=cadastros["conta_id"], valor=valor,
+        ))
+    db.commit()
+    db.expire_all()
+
+    assert conta.saldo_inicial == pytest.approx(0.3)
+    assert conta.saldo_atual == -12.34
+    soma = db.query(func.sum(database.ContaPagar.valor)).scalar()
+    bruto = db.execute(text("SELECT saldo_inicial, saldo_atual FROM contas WHERE id = :id"), {"id": conta.id}).one()
+    if armazenamento == "centavos":
+        # Gravados inteiros, somados pelo banco sem erro de arredondamento
+        assert conta.saldo_inicial == 0.3
+        assert soma == 0.0
+        assert tuple(bruto) == (30, -1234)
+    else:
+        assert soma == pytest.approx(0.0)
+        assert tuple(bruto) == pytest.approx((0.3, -12.34))
+
+def test_parametro_convertido(armazenamento, db, cadastros):
+    # O filtro também passa pelo tipo: em centavos, 12.34 vira 1234 no parâmetro
+    db.add(database.ContaPagar(
+        fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria="Luz",
+        conta_id=cadastros["conta_id"], valor=12.34,
+    ))
+    db.commit()
+    assert db.query(database.ContaPagar).filter(database.ContaPagar.valor == 12.34).count() == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from backend import geoip
+
+@pytest.fixture
+def resolvedor():
+    """Restaura o resolvedor padrão (e limpa o cache) depois do teste"""
+    yield geoip.set_resolver
+    geoip.set_resolver(None)
+
+class ResolvedorFalho(geoip.LocationResolver):
+    """Falha nas primeiras `falhas` consultas e depois encontra a localização"""
+
+    def __init__(self, falhas: int):
+        self.falhas = falhas
+        self.consultas = 0
+
+    def resolve(self, ip_address):
+        self.consultas += 1
+        if self.consultas <= self.falhas:
+            raise ConnectionError("sem rede")
+        return "Coronel Macedo, São Paulo, Brasil"
+
+def test_interface_abstrata():
+    with pytest.raises(TypeError):
+        geoip.LocationResolver()
+
+def test_tabela_offline(tmp_path):
+    tabela = tmp_path / "geoip.csv"
+    tabela.write_text(
+        "inicio,fim,cidade,regiao,pais\n"
+        "8.8.8.0,8.8.8.255,Mountain View,California,Estados Unidos\n"
+        "2606:4700::,2606:4700::ffff,São Paulo,São Paulo,Brasil\n",
+        encoding="utf-8",
+    )
+    resolvedor = geoip.OfflineRangeResolver(str(tabela))
+    assert resolvedor.resolve("8.8.8.8") == "Mountain View, California, Estados Unidos"
+    assert resolvedor.resolve("2606:4700::1111") == "São Paulo, São Paulo, Brasil"
+    assert resolvedor.resolve("8.8.9.1") is None
+
+def test_sem_tabela_nao_resolve(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(geoip, "GEOIP_CSV_PATH", str(tmp_path / "nao-existe.csv"))
+    assert isinstance(geoip.create_resolver("offline"), geoip.NullResolver)
+    assert "não encontrada" in caplog.text
+    # O ip-api.com só é usado quando escolhido explicitamente
+    assert isinstance(geoip.create_resolver("ip-api"), geoip.IpApiResolver)
+
+def test_falha_nao_fica_em_cache(resolvedor):
+    falho = ResolvedorFalho(falhas=1)
+    resolvedor(falho)
+    assert geoip.resolve_location("8.8.8.8") == geoip.LOCALIZACAO_INDISPONIVEL
+    assert geoip.resolve_location("8.8.8.8") == "Coronel Macedo, São Paulo, Brasil"
+    # Encontrada, a localização passa a vir do cache
+    assert geoip.resolve_location("8.8.8.8") == "Coronel Macedo, São Paulo, Brasil"
+    assert falho.consultas == 2
+
+def test_rede_local_nao_consulta(resolvedor):
+    falho = ResolvedorFalho(falhas=10)
+    resolvedor(falho)
+    assert geoip.resolve_location("192.168.0.10") == geoip.LOCALIZACAO_REDE_LOCAL
+    assert geoip.resolve_location("testclient") == geoip.LOCALIZACAO_INDISPONIVEL
+    assert falho.consultas == 0
@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import inspect, text
+
+import migrate_centavos
+from backend import database, dinheiro
+
+VALORES = [12.34, 0.1, 99.99, 0.3, 7.77]
+
+@pytest.fixture
+def lancamentos_em_reais(db, cadastros):
+    for valor in VALORES:
+        db.add(database.ContaPagar(
+            fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria="Luz",
+            conta_id=cadastros["conta_id"], valor=valor,
+        ))
+    db.commit()
+    db.close()
+
+def ler(banco):
+    """(estado, valores das contas a pagar, saldo da conta) como estão gravados"""
+    with banco.connect() as connection:
+        return (
+            database.armazenamento_dinheiro(connection),
+            connection.execute(text("SELECT valor FROM contas_pagar ORDER BY id")).scalars().all(),
+            connection.execute(text("SELECT saldo_atual FROM contas")).scalar(),
+        )
+
+def tipo_inteiro(banco, tabela, coluna):
+    tipos = {item["name"]: item["type"] for item in inspect(banco).get_columns(tabela)}
+    return tipos[coluna].python_type is int
+
+def falhar_depois(monkeypatch, nome, chamadas):
+    """Faz migrate_centavos.<nome> levantar erro depois de `chamadas` execuções bem-sucedidas"""
+    original = getattr(migrate_centavos, nome)
+    feitas = []
+
+    def substituta(*args, **kwargs):
+        if len(feitas) >= chamadas:
+            raise RuntimeError("falha simulada")
+        feitas.append(1)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(migrate_centavos, nome, substituta)
+
+def test_interrompida_no_meio_continua(banco, lancamentos_em_reais, monkeypatch):
+    with monkeypatch.context() as contexto:
+        falhar_depois(contexto, "converter_tabela", 1)
+        assert not migrate_centavos.converter(lote=2)
+    assert ler(banco)[0] == "convertendo"
+
+    # A nova execução continua do último lote: nenhuma linha é convertida duas vezes
+    assert migrate_centavos.converter(lote=2)
+    assert ler(banco) == ("centavos", [1234, 10, 9999, 30, 777], 100000)
+
+def test_falha_ao_trocar_tipos(banco, lancamentos_em_reais, monkeypatch):
+    with monkeypatch.context() as contexto:
+        # O ALTER roda e a transação falha depois dele: nada do fim da conversão fica gravado
+        original = migrate_centavos.alterar_tipos
+        def alterar_e_falhar(connection, tabelas):
+            original(connection, tabelas)
+            raise RuntimeError("falha simulada")
+        contexto.setattr(migrate_centavos, "alterar_tipos", alterar_e_falhar)
+        assert not migrate_centavos.converter(lote=2)
+    assert ler(banco) == ("convertendo", [1234, 10, 9999, 30, 777], 100000)
+    assert not tipo_inteiro(banco, "contas_pagar", "valor")
+
+    assert migrate_centavos.converter(lote=2)
+    assert ler(banco) == ("centavos", [1234, 10, 9999, 30, 777], 100000)
+    assert tipo_inteiro(banco, "contas_pagar", "valor") == (banco.dialect.name != "sqlite")
+    # Já convertido, executar de novo não muda nada
+    assert migrate_centavos.converter(lote=2)
+    assert ler(banco) == ("centavos", [1234, 10, 9999, 30, 777], 100000)
+
+def test_reverter_conversao_interrompida(banco, lancamentos_em_reais, monkeypatch):
+    with monkeypatch.context() as contexto:
+        falhar_depois(contexto, "converter_tabela", 1)
+        assert not migrate_centavos.converter(lote=2)
+    with monkeypatch.context() as contexto:
+        # A reversão também pode ser interrompida e continuada
+        falhar_depois(contexto, "reverter_tabela", 1)
+        assert not migrate_centavos.reverter(lote=2)
+
+    assert migrate_centavos.reverter(lote=2)
+    assert ler(banco) == ("reais", VALORES, 1000.0)
+    with banco.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM configuracoes WHERE chave LIKE 'dinheiro:%'")).scalar() == 0
+    # A aplicação volta a iniciar com o formato padrão
+    database.verificar_armazenamento_dinheiro()
+
+def test_reverter_sem_conversao(banco, lancamentos_em_reais):
+    assert migrate_centavos.reverter(lote=2)
+    assert ler(banco) == ("reais", VALORES, 1000.0)
+
+def test_meio_centavo_como_na_aplicacao(banco, db, cadastros):
+    db.close()
+    # Gravados sem o tipo Dinheiro, com o erro binário do float (0.285 é 0.28499... em binário)
+    valores = [0.285, 1.005, -0.285, 2.675]
+    with banco.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO contas_pagar (fornecedor_id, status, categoria, conta_id, valor) "
+            "VALUES (:fornecedor_id, 'Pendente', 'Luz', :conta_id, :valor)"
+        ), [dict(fornecedor_id=cadastros["fornecedor_id"], conta_id=cadastros["conta_id"], valor=valor) for valor in valores])
+
+    assert migrate_centavos.converter(lote=3)
+    assert ler(banco)[1] == [dinheiro.para_centavos(valor) for valor in valores] == [29, 101, -29, 268]
@@ -0,0 +1,126 @@
+import pytest
+from sqlalchemy import event, text
+
+from backend import auth, database, saldos
+
+def pagar(cliente, cadastros, valor):
+    resposta = cliente.post("/api/contas-pagar", json={
+        "fornecedor_id": cadastros["fornecedor_id"], "status": "Pago", "categoria": "Luz",
+        "conta_id": cadastros["conta_id"], "data_emissao": "2026-03-01", "data_vencimento": "2026-03-10", "valor": valor,
+    })
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()["id"]
+
+def test_movimentacoes_por_origem(cliente, cadastros):
+    primeira, segunda = pagar(cliente, cadastros, 100.0), pagar(cliente, cadastros, 40.0)
+
+    resposta = cliente.get("/api/movimentacoes", params={"origem_tipo": "CONTA_PAGAR", "origem_id": segunda})
+    assert [(m["origem_id"], m["tipo_movimentacao"], m["valor"]) for m in resposta.json()] == [(segunda, "SAIDA", 40.0)]
+    por_conta = cliente.get("/api/movimentacoes", params={"conta_id": cadastros["conta_id"]}).json()
+    assert sorted(m["origem_id"] for m in por_conta) == [primeira, segunda]
+    assert cliente.get("/api/movimentacoes", params={"origem_id": segunda}).status_code == 400
+
+def test_exclusao_estorna_pela_origem(cliente, cadastros, db):
+    primeira, segunda = pagar(cliente, cadastros, 100.0), pagar(cliente, cadastros, 40.0)
+    assert cliente.delete(f"/api/contas-pagar/{primeira}").status_code == 200
+
+    restantes = cliente.get("/api/movimentacoes", params={"conta_id": cadastros["conta_id"]}).json()
+    assert [m["origem_id"] for m in restantes] == [segunda]
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == 960.0
+
+def dados_lancamento(rota, cadastros, valor=100.0):
+    """Corpo de criação pendente de cada tipo de lançamento"""
+    comuns = {"conta_id": cadastros["conta_id"], "valor": valor}
+    if rota == "doacoes-avulsas":
+        return {**comuns, "nome_doador": "Doador", "data": "2026-03-10", "recebido": False}
+    datas = {"status": "Pendente", "categoria": "Luz", "data_emissao": "2026-03-01", "data_vencimento": "2026-03-10"}
+    if rota == "contas-pagar":
+        return {**comuns, **datas, "fornecedor_id": cadastros["fornecedor_id"]}
+    return {**comuns, **datas, "origem": "Outro", "fornecedor_doador_id": cadastros["fornecedor_id"]}
+
+# rota -> (campos liquidado, campos pendente, origem das movimentações, sinal no saldo)
+LIQUIDACAO = {
+    "contas-pagar": ({"status": "Pago"}, {"status": "Pendente"}, "CONTA_PAGAR", -1),
+    "contas-receber": ({"status": "Recebido"}, {"status": "Pendente"}, "CONTA_RECEBER", 1),
+    "doacoes-avulsas": ({"recebido": True}, {"recebido": False}, "DOACAO", 1),
+}
+
+def commits_durante(operacao):
+    commits = []
+    contar = lambda sessao: commits.append(sessao)
+    event.listen(database.SessionLocal, "after_commit", contar)
+    try:
+        operacao()
+    finally:
+        event.remove(database.SessionLocal, "after_commit", contar)
+    return len(commits)
+
+def movimentacoes_da_origem(cliente, origem, origem_id):
+    resposta = cliente.get("/api/movimentacoes", params={"origem_tipo": origem, "origem_id": origem_id})
+    return [(m["conta_id"], m["valor"]) for m in resposta.json()]
+
+@pytest.mark.parametrize("rota", LIQUIDACAO)
+def test_liquidar_e_desfazer_em_um_commit(cliente, cadastros, db, monkeypatch, rota):
+    # Atividade da sessão só no buffer: os commits contados são os da rota
+    monkeypatch.setattr(auth.activity_buffer, "flush_interval", 3600)
+    liquidado, pendente, origem, sinal = LIQUIDACAO[rota]
+    dados = dados_lancamento(rota, cadastros)
+    origem_id = cliente.post(f"/api/{rota}", json=dados).json()["id"]
+
+    respostas = []
+    assert commits_durante(lambda: respostas.append(cliente.put(f"/api/{rota}/{origem_id}", json={**dados, **liquidado}))) == 1
+    assert respostas[-1].status_code == 200
+    assert movimentacoes_da_origem(cliente, origem, origem_id) == [(cadastros["conta_id"], 100.0)]
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == 1000.0 + sinal * 100.0
+
+    # Voltar a pendente estorna a movimentação e o saldo
+    assert commits_durante(lambda: respostas.append(cliente.put(f"/api/{rota}/{origem_id}", json={**dados, **pendente}))) == 1
+    assert respostas[-1].status_code == 200
+    assert movimentacoes_da_origem(cliente, origem, origem_id) == []
+    db.expire_all()
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == 1000.0
+
+@pytest.mark.parametrize("rota", LIQUIDACAO)
+def test_editar_liquidado_relanca(cliente, cadastros, db, rota):
+    liquidado, _, origem, sinal = LIQUIDACAO[rota]
+    outra = database.Conta(nome_conta="Caixa", tipo="Caixa", saldo_inicial=500.0, saldo_atual=500.0)
+    db.add(outra)
+    db.commit()
+    dados = {**dados_lancamento(rota, cadastros), **liquidado}
+    origem_id = cliente.post(f"/api/{rota}", json=dados).json()["id"]
+
+    # Valor editado: a movimentação é refeita com o valor novo
+    assert cliente.put(f"/api/{rota}/{origem_id}", json={**dados, "valor": 60.0}).status_code == 200
+    assert movimentacoes_da_origem(cliente, origem, origem_id) == [(cadastros["conta_id"], 60.0)]
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == 1000.0 + sinal * 60.0
+
+    # Conta editada: o valor sai de uma conta e entra na outra
+    assert cliente.put(f"/api/{rota}/{origem_id}", json={**dados, "valor": 60.0, "conta_id": outra.id}).status_code == 200
+    [movimentacao] = cliente.get("/api/movimentacoes", params={"origem_tipo": origem, "origem_id": origem_id}).json()
+    assert (movimentacao["conta_id"], movimentacao["valor"]) == (outra.id, 60.0)
+    db.expire_all()
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == 1000.0
+    assert saldos.saldo_atual(db, outra.id) == 500.0 + sinal * 60.0
+
+    # Sem mudar conta nem valor, a movimentação é mantida
+    assert cliente.put(f"/api/{rota}/{origem_id}", json={
+        **dados, "valor": 60.0, "conta_id": outra.id, "observacao": "editada",
+    }).status_code == 200
+    assert cliente.get("/api/movimentacoes", params={"origem_tipo": origem, "origem_id": origem_id}).json()[0]["id"] == movimentacao["id"]
+
+def test_create_indexes_recria_indice_ausente(banco):
+    with banco.begin() as connection:
+        connection.execute(text("DROP INDEX idx_movimentacao_financeira_origem"))
+    assert database.create_indexes(banco) == ["idx_movimentacao_financeira_origem"]
+    assert database.create_indexes(banco) == []
+
+def test_busca_por_origem_usa_indice(banco):
+    consulta = "SELECT id FROM movimentacoes_financeiras WHERE origem_tipo = 'CONTA_PAGAR' AND origem_id = 1"
+    with banco.connect() as connection:
+        if banco.dialect.name == "sqlite":
+            plano = " ".join(str(linha[-1]) for linha in connection.execute(text(f"EXPLAIN QUERY PLAN {consulta}")))
+        else:
+            # Tabela vazia: sem desligar a leitura sequencial o planejador nunca escolhe o índice
+            connection.execute(text("SET enable_seqscan = off"))
+            plano = " ".join(linha[0] for linha in connection.execute(text(f"EXPLAIN {consulta}")))
+    assert "idx_movimentacao_financeira_origem" in plano
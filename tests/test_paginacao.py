@@ -0,0 +1,83 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from backend import database, schemas
+from backend.pagination import decode_cursor, encode_cursor, paginate
+
+# Datas repetidas: o id desempata a chave de ordenação
+DATAS = [date(2026, 3, 2), date(2026, 3, 1), date(2026, 3, 2), date(2026, 3, 5), date(2026, 3, 1), date(2026, 3, 2), date(2026, 3, 4)]
+
+@pytest.fixture
+def doacoes(db, cadastros):
+    for indice, data in enumerate(DATAS):
+        db.add(database.DoacaoAvulsa(nome_doador=f"Doador {indice}", valor=10.0 + indice, conta_id=cadastros["conta_id"], data=data))
+    db.commit()
+    return [(doacao.data, doacao.id) for doacao in db.query(database.DoacaoAvulsa).order_by(database.DoacaoAvulsa.data, database.DoacaoAvulsa.id)]
+
+def percorrer(cliente, url, size, **params):
+    """Todas as páginas por keyset, seguindo next_cursor a partir do cursor vazio"""
+    itens, cursor, paginas = [], "", 0
+    while cursor is not None:
+        resposta = cliente.get(url, params={"cursor": cursor, "size": size, **params})
+        assert resposta.status_code == 200, resposta.text
+        corpo = resposta.json()
+        itens += corpo["items"]
+        cursor = corpo["next_cursor"]
+        paginas += 1
+    return itens, paginas
+
+def test_cursor_ida_e_volta():
+    colunas = [database.DoacaoAvulsa.data, database.DoacaoAvulsa.id]
+    assert decode_cursor(encode_cursor([date(2026, 3, 2), 7]), colunas) == [date(2026, 3, 2), 7]
+
+@pytest.mark.parametrize("cursor", ["nao-e-base64!", encode_cursor([1]), encode_cursor(["ontem", 1])])
+def test_cursor_invalido(cursor):
+    with pytest.raises(HTTPException) as erro:
+        decode_cursor(cursor, [database.DoacaoAvulsa.data, database.DoacaoAvulsa.id])
+    assert erro.value.status_code == 400
+
+def test_paginas_por_keyset(cliente, doacoes):
+    itens, paginas = percorrer(cliente, "/api/doacoes-avulsas", size=2)
+    assert [(date.fromisoformat(item["data"]), item["id"]) for item in itens] == doacoes
+    assert paginas == 4
+
+def test_keyset_estavel_com_insercao(cliente, cadastros, doacoes):
+    primeira = cliente.get("/api/doacoes-avulsas", params={"cursor": "", "size": 3}).json()
+    # Uma doação anterior ao cursor não desloca as páginas seguintes
+    resposta = cliente.post("/api/doacoes-avulsas", json={
+        "nome_doador": "Nova", "valor": 1.0, "conta_id": cadastros["conta_id"], "data": "2026-02-01",
+    })
+    assert resposta.status_code == 200
+    seguinte = cliente.get("/api/doacoes-avulsas", params={"cursor": primeira["next_cursor"], "size": 3}).json()
+    ids = [item["id"] for item in primeira["items"] + seguinte["items"]]
+    assert ids == [id_ for _, id_ in doacoes[:6]]
+
+def test_total_opcional(cliente, doacoes):
+    sem_total = cliente.get("/api/doacoes-avulsas", params={"cursor": "", "size": 2}).json()
+    assert sem_total["total"] is None
+    com_total = cliente.get("/api/doacoes-avulsas", params={"cursor": "", "size": 2, "with_total": True}).json()
+    assert (com_total["total"], com_total["pages"]) == (7, 4)
+
+def test_keyset_decrescente(db, doacoes):
+    colunas = [database.DoacaoAvulsa.data, database.DoacaoAvulsa.id]
+    vistos, cursor = [], None
+    while True:
+        pagina = paginate(
+            db.query(database.DoacaoAvulsa), schemas.PaginationParams(size=3, cursor=cursor),
+            colunas, schemas.DoacaoAvulsa, descending=True,
+        )
+        vistos += [(item.data, item.id) for item in pagina.items]
+        cursor = pagina.next_cursor
+        if cursor is None:
+            break
+    assert vistos == doacoes[::-1]
+
+def test_paginas_por_id(cliente, db):
+    for indice in range(5):
+        db.add(database.FornecedorDoador(tipo="Doador", nome_razao=f"Doador {indice}"))
+    db.commit()
+    itens, _ = percorrer(cliente, "/api/fornecedores-doadores", size=2)
+    assert [item["id"] for item in itens] == sorted(item["id"] for item in itens)
+    assert len(itens) == 5
@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from backend import database, previsao, recorrencia
+
+def conta_pagar(cadastros, vencimento, valor, status="Pendente"):
+    return database.ContaPagar(
+        fornecedor_id=cadastros["fornecedor_id"], status=status, categoria="Luz",
+        conta_id=cadastros["conta_id"], data_vencimento=vencimento, valor=valor,
+    )
+
+def saldos_esperados(saldo, variacoes, dias):
+    """Saldo de cada dia a partir de {dia: variação}, somado à mão"""
+    serie = []
+    for dia in range(dias + 1):
+        saldo += variacoes.get(dia, 0.0)
+        serie.append(saldo)
+    return serie
+
+def test_projecao_acumulada(db, cadastros):
+    hoje = date.today()
+    dias = 70
+    poupanca = database.Conta(nome_conta="Poupança", tipo="Poupança", saldo_inicial=200.0, saldo_atual=200.0)
+    db.add(poupanca)
+    db.flush()
+    db.add_all([
+        conta_pagar(cadastros, hoje - timedelta(days=5), 100.0),  # Vencida e pendente: entra hoje
+        conta_pagar(cadastros, hoje + timedelta(days=1), 999.0, status="Pago"),  # Paga: fora
+        conta_pagar(cadastros, hoje + timedelta(days=dias + 1), 500.0),  # Depois do fim: fora
+        database.ContaReceber(
+            fornecedor_doador_id=cadastros["fornecedor_id"], status="Pendente", categoria="Mensalidade", origem="Outro",
+            conta_id=poupanca.id, data_vencimento=hoje + timedelta(days=2), valor=50.0,
+        ),
+    ])
+    # Série mensal de 3 parcelas de 40,00, todas futuras (virtuais)
+    primeira = hoje + timedelta(days=3)
+    recorrencia.criar_regra(db, "pagar", dict(
+        fornecedor_id=cadastros["fornecedor_id"], beneficiario_id=None, status="Pendente", categoria="Luz",
+        conta_id=cadastros["conta_id"], data_emissao=primeira, data_vencimento=primeira, valor=40.0,
+        observacao=None, recorrente=True, meses_repetir=3,
+    ), "serie-previsao", 3)
+    db.commit()
+    parcelas = [(primeira + relativedelta(months=n) - hoje).days for n in range(3)]
+    assert parcelas[-1] <= dias
+
+    resultado = previsao.projetar_saldos(db, dias, hoje=hoje)
+
+    banco = saldos_esperados(1000.0, {0: -100.0, parcelas[0]: -40.0, parcelas[1]: -40.0, parcelas[2]: -40.0}, dias)
+    poupado = saldos_esperados(200.0, {2: 50.0}, dias)
+    [conta, outra] = resultado["contas"]
+    assert (conta["conta_id"], outra["conta_id"]) == (cadastros["conta_id"], poupanca.id)
+    assert conta["saldos"] == banco
+    assert outra["saldos"] == poupado
+    assert resultado["total"] == [a + b for a, b in zip(banco, poupado)]
+    assert (conta["saldo_final"], conta["saldo_minimo"]) == (780.0, 780.0)
+    assert conta["data_saldo_minimo"] == (hoje + timedelta(days=parcelas[2])).isoformat()
+    assert (outra["saldo_minimo"], outra["data_saldo_minimo"]) == (200.0, hoje.isoformat())
+    assert len(resultado["datas"]) == dias + 1 and resultado["fim"] == (hoje + timedelta(days=dias)).isoformat()
+
+def test_projecao_sem_lancamentos(db, cadastros):
+    hoje = date(2026, 3, 1)
+    resultado = previsao.projetar_saldos(db, 3, hoje=hoje)
+    [conta] = resultado["contas"]
+    assert conta["saldos"] == [1000.0] * 4
+    assert resultado["total"] == [1000.0] * 4
+
+def test_projecao_sem_contas(db):
+    resultado = previsao.projetar_saldos(db, 3, hoje=date(2026, 3, 1))
+    assert resultado["contas"] == []
+    assert resultado["total"] == [0.0] * 4
+    assert resultado["datas"] == ["2026-03-01", "2026-03-02", "2026-03-03", "2026-03-04"]
@@ -0,0 +1,256 @@
+from datetime import date
+
+import pytest
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import event
+
+from backend import database, lancamentos, recorrencia, rollup, saldos
+
+def criar_serie(cliente, cadastros, tipo, meses=6, vencimento="2090-01-10", valor=50.0):
+    """Cria pela API uma conta recorrente pendente de `meses` parcelas; retorna o grupo"""
+    dados = {
+        "status": "Pendente", "categoria": "Luz", "conta_id": cadastros["conta_id"],
+        "data_emissao": vencimento, "data_vencimento": vencimento, "valor": valor,
+        "recorrente": True, "meses_repetir": meses,
+    }
+    if tipo == "pagar":
+        dados["fornecedor_id"] = cadastros["fornecedor_id"]
+    else:
+        dados.update(origem="Outro", fornecedor_doador_id=cadastros["fornecedor_id"])
+    resposta = cliente.post(f"/api/contas-{tipo}", json=dados)
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()["grupo_recorrencia"]
+
+def vencimentos(db, tipo, grupo):
+    """{parcela: vencimento} das parcelas gravadas e virtuais da série"""
+    modelo = recorrencia.MODELOS[tipo]
+    gravadas = {
+        numero: vencimento for numero, vencimento in
+        db.query(modelo.parcela_numero, modelo.data_vencimento).filter(modelo.grupo_recorrencia == grupo)
+    }
+    virtuais = {
+        p["parcela_numero"]: p["data_vencimento"]
+        for p in recorrencia.parcelas_virtuais(db, tipo) if p["grupo_recorrencia"] == grupo
+    }
+    return {**virtuais, **gravadas}
+
+@pytest.mark.parametrize("tipo", ["pagar", "receber"])
+def test_reagendar_serie_pela_rota(cliente, cadastros, db, tipo):
+    # Série futura: só a primeira parcela é gravada ao criar
+    grupo = criar_serie(cliente, cadastros, tipo)
+    # Uma parcela futura já gravada recebe a nova data no UPDATE; as virtuais, pela regra
+    recorrencia.materializar(db, recorrencia.regra_do_grupo(db, grupo), 4)
+    db.commit()
+
+    resposta = cliente.post(
+        f"/api/contas-{tipo}/serie/{grupo}/reagendar", json={"a_partir_de": 3, "data_vencimento": "2090-03-20"}
+    )
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json() == {"grupo_recorrencia": grupo, "parcelas_afetadas": 1}
+
+    db.expire_all()
+    assert vencimentos(db, tipo, grupo) == {
+        1: date(2090, 1, 10), 2: date(2090, 2, 10), 3: date(2090, 3, 20),
+        4: date(2090, 4, 20), 5: date(2090, 5, 20), 6: date(2090, 6, 20),
+    }
+    assert rollup.verificar(db) == []
+
+# tipo -> (status liquidado, função de lançamento, origem das movimentações, sinal no saldo)
+LIQUIDACAO = {
+    "pagar": ("Pago", lancamentos.pagar, lancamentos.ORIGEM_CONTA_PAGAR, -1),
+    "receber": ("Recebido", lancamentos.receber, lancamentos.ORIGEM_CONTA_RECEBER, 1),
+}
+
+def serie_com_segunda_liquidada(cliente, cadastros, db, tipo):
+    """Série de 6 parcelas de 50,00 com as 3 primeiras vencidas (gravadas) e a segunda liquidada"""
+    vencimento = date.today() - relativedelta(months=2)
+    grupo = criar_serie(cliente, cadastros, tipo, meses=6, vencimento=vencimento.isoformat(), valor=50.0)
+    status, liquidar, origem, _ = LIQUIDACAO[tipo]
+    modelo = recorrencia.MODELOS[tipo]
+    segunda = db.query(modelo).filter(modelo.grupo_recorrencia == grupo, modelo.parcela_numero == 2).one()
+    segunda.status = status
+    liquidar(db, segunda, cadastros["usuario_id"])
+    db.commit()
+    return grupo, segunda.id
+
+def parcelas_da_serie(db, tipo, grupo):
+    """{parcela: (status, valor)} das parcelas gravadas e virtuais da série"""
+    modelo = recorrencia.MODELOS[tipo]
+    db.expire_all()
+    gravadas = {
+        numero: (status, valor) for numero, status, valor in
+        db.query(modelo.parcela_numero, modelo.status, modelo.valor).filter(modelo.grupo_recorrencia == grupo)
+    }
+    virtuais = {
+        p["parcela_numero"]: ("virtual", p["valor"])
+        for p in recorrencia.parcelas_virtuais(db, tipo) if p["grupo_recorrencia"] == grupo
+    }
+    return {**virtuais, **gravadas}
+
+def movimentacoes(cliente, tipo, origem_id):
+    _, _, origem, _ = LIQUIDACAO[tipo]
+    resposta = cliente.get("/api/movimentacoes", params={"origem_tipo": origem, "origem_id": origem_id})
+    return [m["valor"] for m in resposta.json()]
+
+@pytest.mark.parametrize("tipo", ["pagar", "receber"])
+def test_atualizar_serie_so_altera_pendentes(cliente, cadastros, db, tipo):
+    grupo, liquidada = serie_com_segunda_liquidada(cliente, cadastros, db, tipo)
+    status, _, _, sinal = LIQUIDACAO[tipo]
+
+    resposta = cliente.put(f"/api/contas-{tipo}/serie/{grupo}", json={"valor": 80.0})
+    assert resposta.json() == {"grupo_recorrencia": grupo, "parcelas_afetadas": 2}
+    resposta = cliente.put(f"/api/contas-{tipo}/serie/{grupo}", json={"a_partir_de": 3, "valor": 90.0})
+    assert resposta.json() == {"grupo_recorrencia": grupo, "parcelas_afetadas": 1}
+
+    assert parcelas_da_serie(db, tipo, grupo) == {
+        1: ("Pendente", 80.0), 2: (status, 50.0), 3: ("Pendente", 90.0),
+        4: ("virtual", 90.0), 5: ("virtual", 90.0), 6: ("virtual", 90.0),
+    }
+    # A liquidada mantém a movimentação e o saldo do valor original
+    assert movimentacoes(cliente, tipo, liquidada) == [50.0]
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == 1000.0 + sinal * 50.0
+    assert rollup.verificar(db) == []
+
+@pytest.mark.parametrize("tipo", ["pagar", "receber"])
+def test_cancelar_serie_mantem_liquidadas(cliente, cadastros, db, tipo):
+    grupo, liquidada = serie_com_segunda_liquidada(cliente, cadastros, db, tipo)
+    status, _, _, sinal = LIQUIDACAO[tipo]
+
+    resposta = cliente.delete(f"/api/contas-{tipo}/serie/{grupo}", params={"a_partir_de": 3})
+    assert resposta.json() == {"grupo_recorrencia": grupo, "parcelas_afetadas": 1}
+    assert parcelas_da_serie(db, tipo, grupo) == {1: ("Pendente", 50.0), 2: (status, 50.0)}
+
+    resposta = cliente.delete(f"/api/contas-{tipo}/serie/{grupo}")
+    assert resposta.json() == {"grupo_recorrencia": grupo, "parcelas_afetadas": 1}
+    assert parcelas_da_serie(db, tipo, grupo) == {2: (status, 50.0)}
+    assert recorrencia.regra_do_grupo(db, grupo).ativa is False
+
+    assert movimentacoes(cliente, tipo, liquidada) == [50.0]
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == 1000.0 + sinal * 50.0
+    assert rollup.verificar(db) == []
+
+def test_reagendar_serie_inexistente(cliente):
+    resposta = cliente.post("/api/contas-pagar/serie/nao-existe/reagendar", json={"data_vencimento": "2090-03-20"})
+    assert resposta.status_code == 404
+
+def test_serie_grava_so_parcelas_vencidas(cliente, cadastros, db):
+    hoje = date.today()
+    grupo = criar_serie(cliente, cadastros, "pagar", meses=36, vencimento=(hoje - relativedelta(months=3)).isoformat())
+
+    gravadas = db.query(database.ContaPagar.data_vencimento).filter(database.ContaPagar.grupo_recorrencia == grupo).all()
+    assert len(gravadas) == 4
+    assert max(vencimento for vencimento, in gravadas) <= hoje
+    regra = recorrencia.regra_do_grupo(db, grupo)
+    assert regra.parcela_gerada == 4
+    assert regra.proximo_vencimento > hoje
+    # As futuras são expandidas da regra na leitura
+    virtuais = recorrencia.parcelas_virtuais(db, "pagar")
+    assert [p["parcela_numero"] for p in virtuais] == list(range(5, 37))
+    assert rollup.verificar(db) == []
+
+def test_materializar_vencidas_avanca(cliente, cadastros, db):
+    hoje = date.today()
+    grupo = criar_serie(cliente, cadastros, "receber", meses=36, vencimento=hoje.isoformat())
+    assert db.query(database.ContaReceber).filter(database.ContaReceber.grupo_recorrencia == grupo).count() == 1
+
+    # Um ano depois, as doze parcelas que venceram são gravadas de uma vez
+    assert recorrencia.materializar_vencidas(hoje + relativedelta(years=1)) == 12
+    assert recorrencia.materializar_vencidas(hoje + relativedelta(years=1)) == 0
+    db.expire_all()
+    assert db.query(database.ContaReceber).filter(database.ContaReceber.grupo_recorrencia == grupo).count() == 13
+    assert rollup.verificar(db) == []
+
+def test_parcelas_virtuais_so_no_periodo(cliente, cadastros, db, monkeypatch):
+    # Série sem fim: um período de dois meses expande só duas parcelas
+    grupo = criar_serie(cliente, cadastros, "pagar", meses=6)
+    regra = recorrencia.regra_do_grupo(db, grupo)
+    regra.total_parcelas = None
+    db.commit()
+    geradas = []
+    linha_da_regra = recorrencia._linha_da_regra
+    monkeypatch.setattr(recorrencia, "_linha_da_regra", lambda r, n: geradas.append(n) or linha_da_regra(r, n))
+
+    parcelas = recorrencia.parcelas_virtuais(db, "pagar", date(2095, 3, 1), date(2095, 4, 30))
+    assert [p["data_vencimento"] for p in parcelas] == [date(2095, 3, 10), date(2095, 4, 10)]
+    assert geradas == [63, 64]
+
+@pytest.mark.parametrize("ordenar_por,direcao", [("data_vencimento", "asc"), ("data_vencimento", "desc"), ("valor", "asc")])
+def test_listagem_pagina_parcelas_virtuais(cliente, cadastros, ordenar_por, direcao):
+    # Parcelas gravadas (a primeira de cada série e contas avulsas) e virtuais intercaladas
+    for indice, valor in enumerate((30.0, 10.0, 20.0)):
+        criar_serie(cliente, cadastros, "pagar", meses=5, vencimento=f"2090-0{indice + 1}-15", valor=valor)
+        resposta = cliente.post("/api/contas-pagar", json={
+            "fornecedor_id": cadastros["fornecedor_id"], "status": "Pendente", "categoria": "Luz",
+            "conta_id": cadastros["conta_id"], "data_emissao": "2090-01-01",
+            "data_vencimento": f"2090-0{indice + 2}-15", "valor": valor + 5,
+        })
+        assert resposta.status_code == 200
+
+    parametros = {"vencimento_fim": "2090-12-31", "ordenar_por": ordenar_por, "direcao": direcao}
+    completa = cliente.get("/api/contas-pagar", params={**parametros, "size": 100}).json()
+    assert completa["total"] == 18
+    assert sum(item["virtual"] for item in completa["items"]) == 12
+    paginas = []
+    for pagina in range(1, 8):
+        paginas += cliente.get("/api/contas-pagar", params={**parametros, "page": pagina, "size": 3}).json()["items"]
+    assert paginas == completa["items"]
+
+def test_listagem_contas_receber_com_parcelas_virtuais(cliente, cadastros):
+    hoje = date.today()
+    grupo = criar_serie(cliente, cadastros, "receber", meses=6, vencimento=hoje.isoformat())
+    criar_serie(cliente, cadastros, "receber", meses=3, vencimento=(hoje - relativedelta(days=1)).isoformat())
+
+    completa = cliente.get("/api/contas-receber").json()
+    # Gravadas (as primeiras de cada série) por id, depois as virtuais por vencimento
+    assert [item["virtual"] for item in completa] == [False] * 2 + [True] * 7
+    vencimentos = [item["data_vencimento"] for item in completa[2:]]
+    assert vencimentos == sorted(vencimentos)
+    assert {item["fornecedor_doador"]["id"] for item in completa} == {cadastros["fornecedor_id"]}
+    assert sum(item["grupo_recorrencia"] == grupo for item in completa) == 6
+
+    paginas = []
+    for skip in range(0, 10, 4):
+        pagina = cliente.get("/api/contas-receber", params={"skip": skip, "limit": 4}).json()
+        assert len(pagina) <= 4
+        paginas += pagina
+    assert paginas == completa
+    assert cliente.get("/api/contas-receber", params={"skip": 20}).json() == []
+
+def test_serie_gravada_em_um_insert(cliente, cadastros, db, banco):
+    db.add(database.CategoriaPagar(nome="Luz"))
+    db.commit()
+    inserts = []
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO CONTAS_PAGAR"):
+            inserts.append(executemany)
+    event.listen(banco, "before_cursor_execute", contar)
+    try:
+        # Série no passado: as 11 parcelas seguintes já venceram
+        grupo = criar_serie(cliente, cadastros, "pagar", meses=12, vencimento=(date.today() - relativedelta(months=11)).isoformat())
+    finally:
+        event.remove(banco, "before_cursor_execute", contar)
+
+    # A primeira parcela pelo ORM e as demais em um único INSERT em lote
+    assert len(inserts) == 2
+    parcelas = db.query(database.ContaPagar).filter(database.ContaPagar.grupo_recorrencia == grupo).all()
+    assert sorted(p.parcela_numero for p in parcelas) == list(range(1, 13))
+    assert {p.categoria_id for p in parcelas} == {db.query(database.CategoriaPagar.id).scalar()}
+    assert rollup.verificar(db) == []
+
+def test_serie_em_uma_transacao(cliente, cadastros, db, monkeypatch):
+    def falhar(*args, **kwargs):
+        raise RuntimeError("falha simulada")
+    monkeypatch.setattr(recorrencia.rollup, "registrar_lancamentos", falhar)
+    with pytest.raises(RuntimeError):
+        criar_serie(cliente, cadastros, "pagar", meses=12, vencimento="2026-01-10")
+    # Nem a primeira parcela nem a regra ficam gravadas
+    assert db.query(database.ContaPagar).count() == 0
+    assert db.query(database.RegraRecorrencia).count() == 0
+
+def test_resumo_anual_com_parcelas_virtuais(cliente, cadastros):
+    criar_serie(cliente, cadastros, "pagar", meses=4, vencimento="2090-11-10", valor=50.0)
+    anual = cliente.get("/api/dashboard/anual", params={"ano": 2090}).json()
+    # A primeira parcela vem do resumo gravado e a segunda é virtual; as de 2091 ficam de fora
+    assert [(item["mes"], item["tipo"], item["status"], item["quantidade"], item["valor"]) for item in anual] == [
+        (11, "pagar", "Pendente", 1, 50.0), (12, "pagar", "Pendente", 1, 50.0),
+    ]
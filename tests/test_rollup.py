@@ -0,0 +1,133 @@
+from datetime import date
+
+from backend import categorias, database, rollup
+
+def resumo(db):
+    """{(mes, conta, categoria_id, categoria, tipo, status): (quantidade, valor)} das linhas com lançamentos"""
+    tabela = database.ResumoMensal.__table__
+    return {
+        (r.mes, r.conta_id, r.categoria_id, r.categoria, r.tipo, r.status): (r.quantidade, round(r.valor, 2))
+        for r in db.execute(tabela.select()).all() if r.quantidade
+    }
+
+def conta_pagar(cadastros, **campos):
+    dados = dict(
+        fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria="Luz", conta_id=cadastros["conta_id"],
+        data_vencimento=date(2026, 3, 10), valor=100.0,
+    )
+    dados.update(campos)
+    return database.ContaPagar(**dados)
+
+def test_inclusao_alteracao_e_exclusao(db, cadastros):
+    conta = cadastros["conta_id"]
+    luz, agua = conta_pagar(cadastros), conta_pagar(cadastros, categoria="Água", valor=40.0)
+    db.add_all([luz, agua])
+    db.add(database.DoacaoAvulsa(nome_doador="Maria", valor=25.0, conta_id=conta, data=date(2026, 3, 5), recebido=True))
+    db.commit()
+    assert resumo(db) == {
+        (date(2026, 3, 1), conta, 0, "Luz", "pagar", "Pendente"): (1, 100.0),
+        (date(2026, 3, 1), conta, 0, "Água", "pagar", "Pendente"): (1, 40.0),
+        (date(2026, 3, 1), conta, 0, "", "doacao", "Recebido"): (1, 25.0),
+    }
+
+    # Valor, status e mês alterados: sai da chave antiga e entra na nova
+    luz.valor, luz.status, luz.data_vencimento = 120.0, "Pago", date(2026, 4, 2)
+    db.commit()
+    db.delete(agua)
+    db.commit()
+    assert resumo(db) == {
+        (date(2026, 4, 1), conta, 0, "Luz", "pagar", "Pago"): (1, 120.0),
+        (date(2026, 3, 1), conta, 0, "", "doacao", "Recebido"): (1, 25.0),
+    }
+    assert rollup.verificar(db) == []
+
+def test_rollback_desfaz_o_resumo(db, cadastros):
+    db.add(conta_pagar(cadastros))
+    db.flush()
+    assert resumo(db)
+    db.rollback()
+    assert resumo(db) == {}
+    assert rollup.verificar(db) == []
+
+def test_alteracao_sem_mudanca_de_valor(db, cadastros):
+    luz = conta_pagar(cadastros)
+    db.add(luz)
+    db.commit()
+    luz.observacao = "Conta de março"
+    db.commit()
+    assert list(resumo(db).values()) == [(1, 100.0)]
+
+def test_lancamentos_em_massa(db, cadastros):
+    linhas = [
+        dict(fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria="Luz", conta_id=cadastros["conta_id"],
+             data_vencimento=date(2026, mes, 10), valor=50.0)
+        for mes in (3, 4, 4)
+    ]
+    db.execute(database.ContaPagar.__table__.insert(), linhas)
+    rollup.registrar_lancamentos(db.connection(), "pagar", linhas)
+    db.commit()
+    assert rollup.verificar(db) == []
+    assert sorted(resumo(db).values()) == [(1, 50.0), (2, 100.0)]
+
+    db.execute(database.ContaPagar.__table__.delete())
+    rollup.registrar_lancamentos(db.connection(), "pagar", linhas, sinal=-1)
+    db.commit()
+    assert resumo(db) == {}
+    assert rollup.verificar(db) == []
+
+def test_reconstruir_corrige_divergencia(db, cadastros):
+    db.add_all([conta_pagar(cadastros), conta_pagar(cadastros, data_vencimento=date(2026, 5, 1))])
+    db.commit()
+    db.execute(database.ResumoMensal.__table__.update().values(valor=1.0))
+    db.commit()
+    assert len(rollup.verificar(db)) == 2
+
+    assert rollup.reconstruir(db) == 2
+    assert rollup.verificar(db) == []
+
+def test_chave_pela_categoria_id(db, cadastros):
+    conta = cadastros["conta_id"]
+    luz = database.CategoriaPagar(nome="Luz")
+    db.add(luz)
+    db.commit()
+    db.add(conta_pagar(cadastros))
+    db.commit()
+
+    # Renomeada, a categoria continua em um único total
+    luz.nome = "Energia"
+    db.commit()
+    db.add(conta_pagar(cadastros, categoria="Energia", valor=30.0))
+    db.commit()
+    assert resumo(db) == {(date(2026, 3, 1), conta, luz.id, "", "pagar", "Pendente"): (2, 130.0)}
+
+    # Trocar o nome do lançamento troca o id, e a contribuição muda de chave
+    agua = database.CategoriaPagar(nome="Água")
+    db.add(agua)
+    db.commit()
+    primeira = db.query(database.ContaPagar).order_by(database.ContaPagar.id).first()
+    primeira.categoria = "Água"
+    db.commit()
+    assert resumo(db) == {
+        (date(2026, 3, 1), conta, luz.id, "", "pagar", "Pendente"): (1, 30.0),
+        (date(2026, 3, 1), conta, agua.id, "", "pagar", "Pendente"): (1, 100.0),
+    }
+    assert rollup.verificar(db) == []
+
+def test_migracao_dos_ids_move_o_resumo(db, cadastros):
+    linhas = [
+        dict(fornecedor_id=cadastros["fornecedor_id"], status="Pendente", categoria=nome, conta_id=cadastros["conta_id"],
+             data_vencimento=date(2026, 3, 10), valor=50.0)
+        for nome in ("Luz", "Luz", "Gás")
+    ]
+    db.execute(database.ContaPagar.__table__.insert(), linhas)
+    rollup.registrar_lancamentos(db.connection(), "pagar", linhas)
+    db.add(database.CategoriaPagar(nome="Luz"))
+    db.commit()
+
+    categorias.migrar(db, lote=2)
+    ids = dict(db.query(database.CategoriaPagar.nome, database.CategoriaPagar.id))
+    assert resumo(db) == {
+        (date(2026, 3, 1), cadastros["conta_id"], ids["Luz"], "", "pagar", "Pendente"): (2, 100.0),
+        (date(2026, 3, 1), cadastros["conta_id"], ids["Gás"], "", "pagar", "Pendente"): (1, 50.0),
+    }
+    assert rollup.verificar(db) == []
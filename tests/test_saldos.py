@@ -0,0 +1,146 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import pytest
+
+from backend import conciliacao, database, lancamentos, saldos
+
+@pytest.fixture
+def fuso(monkeypatch):
+    """Servidor em America/Sao_Paulo (UTC-3), fuso usado por date.today() e pelos dias locais"""
+    monkeypatch.setenv("TZ", "America/Sao_Paulo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def movimentar(db, cadastros, instante_utc, valor, tipo="SAIDA"):
+    db.add(database.MovimentacaoFinanceira(
+        conta_id=cadastros["conta_id"], tipo_movimentacao=tipo, valor=valor, data_movimentacao=instante_utc,
+        descricao="Pagamento", usuario_id=cadastros["usuario_id"],
+    ))
+    db.commit()
+
+def test_limites_do_dia_no_fuso_local(fuso, db, cadastros):
+    assert saldos.inicio_do_dia_utc(date(2026, 3, 31)) == datetime(2026, 3, 31, 3)
+    assert saldos.dia_local(datetime(2026, 4, 1, 2, 30)) == date(2026, 3, 31)
+
+    # 31/03 às 23h30 no horário local já é 01/04 em UTC
+    movimentar(db, cadastros, datetime(2026, 4, 1, 2, 30), 100.0)
+    # 01/04 às 01h no horário local
+    movimentar(db, cadastros, datetime(2026, 4, 1, 4), 10.0)
+    db.add(database.MovimentacaoConta(conta_id=cadastros["conta_id"], tipo="Entrada", valor=5.0, data=date(2026, 3, 31)))
+    db.commit()
+    conta = db.get(database.Conta, cadastros["conta_id"])
+
+    assert saldos.saldo_em(db, conta, date(2026, 3, 30))["saldo"] == 1000.0
+    assert saldos.saldo_em(db, conta, date(2026, 3, 31))["saldo"] == 905.0
+    assert saldos.saldo_em(db, conta, date(2026, 4, 1))["saldo"] == 895.0
+    assert saldos.movimentos_no_intervalo(db, conta.id, apos=date(2026, 3, 31), ate=date(2026, 4, 1)) == -10.0
+
+def test_movimentacao_retroativa_descarta_checkpoint_do_dia_local(fuso, db, cadastros):
+    db.add(database.SaldoCheckpoint(conta_id=cadastros["conta_id"], data=date(2026, 3, 31), saldo=1000.0))
+    db.commit()
+    # Feita no último dia local do período, ainda que em UTC já seja o dia seguinte
+    movimentar(db, cadastros, datetime(2026, 4, 1, 2, 30), 100.0)
+    assert db.query(database.SaldoCheckpoint).count() == 0
+
+@pytest.fixture
+def conta_desde_janeiro(db, cadastros):
+    """Conta com saldo inicial 1000 em 01/01/2026 e movimentações em março e abril"""
+    conta = db.get(database.Conta, cadastros["conta_id"])
+    conta.data_saldo_inicial = date(2026, 1, 1)
+    db.add_all([
+        database.MovimentacaoConta(conta_id=conta.id, tipo="Entrada", valor=50.0, data=date(2026, 3, 10)),
+        database.MovimentacaoConta(conta_id=conta.id, tipo="Saída", valor=20.0, data=date(2026, 4, 5)),
+    ])
+    db.commit()
+    return conta
+
+def checkpoints(db):
+    return [(c.data, c.saldo) for c in db.query(database.SaldoCheckpoint).order_by(database.SaldoCheckpoint.data)]
+
+def test_gravar_checkpoints_por_periodo(db, conta_desde_janeiro):
+    assert saldos.gravar_checkpoints(db, hoje=date(2026, 5, 15)) == 4
+    assert checkpoints(db) == [
+        (date(2026, 1, 31), 1000.0), (date(2026, 2, 28), 1000.0), (date(2026, 3, 31), 1050.0), (date(2026, 4, 30), 1030.0),
+    ]
+    # Só os períodos novos são gravados na execução seguinte
+    assert saldos.gravar_checkpoints(db, hoje=date(2026, 5, 15)) == 0
+    assert saldos.gravar_checkpoints(db, hoje=date(2026, 6, 1)) == 1
+
+def test_saldo_em_data_parte_do_checkpoint(cliente, db, conta_desde_janeiro):
+    saldos.gravar_checkpoints(db, hoje=date(2026, 5, 15))
+    resposta = cliente.get(f"/api/contas/{conta_desde_janeiro.id}/saldo", params={"data": "2026-04-10"})
+    assert resposta.json() == {"conta_id": conta_desde_janeiro.id, "data": "2026-04-10", "saldo": 1030.0, "checkpoint": "2026-03-31"}
+    # Sem checkpoint anterior, parte do saldo inicial
+    resposta = cliente.get(f"/api/contas/{conta_desde_janeiro.id}/saldo", params={"data": "2026-01-15"})
+    assert resposta.json()["saldo"] == 1000.0 and resposta.json()["checkpoint"] is None
+    resposta = cliente.get(f"/api/contas/{conta_desde_janeiro.id}/saldo", params={"data": "2025-12-31"})
+    assert resposta.status_code == 400
+
+def test_alteracao_retroativa_descarta_checkpoints(db, conta_desde_janeiro):
+    saldos.gravar_checkpoints(db, hoje=date(2026, 5, 15))
+    # Objeto expirado pelo commit: a data antiga (10/03) vem do banco
+    marco = db.query(database.MovimentacaoConta).filter_by(data=date(2026, 3, 10)).one()
+    db.commit()
+    marco.data = date(2026, 4, 20)
+    db.commit()
+    assert checkpoints(db) == [(date(2026, 1, 31), 1000.0), (date(2026, 2, 28), 1000.0)]
+
+    saldos.gravar_checkpoints(db, hoje=date(2026, 5, 15))
+    assert checkpoints(db)[2:] == [(date(2026, 3, 31), 1000.0), (date(2026, 4, 30), 1030.0)]
+    assert saldos.saldo_em(db, conta_desde_janeiro, date(2026, 4, 30))["saldo"] == 1030.0
+
+def test_editar_conta_pela_api(cliente, db, cadastros):
+    conta_id = cadastros["conta_id"]
+    lancamentos.movimentar_saldo(db, conta_id, "Saída", 30.0)
+    db.add(database.SaldoCheckpoint(conta_id=conta_id, data=date(2026, 3, 31), saldo=1000.0))
+    db.commit()
+
+    # Sem saldo_inicial no corpo, o saldo inicial e o atual são mantidos
+    resposta = cliente.put(f"/api/contas/{conta_id}", json={"nome_conta": "Banco Novo", "tipo": "Banco"})
+    assert resposta.status_code == 200
+    assert (resposta.json()["nome_conta"], resposta.json()["saldo_inicial"], resposta.json()["saldo_atual"]) == ("Banco Novo", 1000.0, 970.0)
+    assert len(checkpoints(db)) == 1
+
+    # O novo saldo inicial desloca o atual pela diferença e descarta os checkpoints
+    resposta = cliente.put(f"/api/contas/{conta_id}", json={"nome_conta": "Banco Novo", "tipo": "Banco", "saldo_inicial": 1200.0})
+    assert (resposta.json()["saldo_inicial"], resposta.json()["saldo_atual"]) == (1200.0, 1170.0)
+    assert checkpoints(db) == []
+    assert conciliacao.verificar(db) == []
+
+def em_paralelo(operacao, threads=8, vezes=25):
+    """Executa `operacao(sessao)` `vezes` vezes em cada thread, cada uma com sua sessão; retorna os acertos"""
+    def executar(_):
+        sessao = database.SessionLocal()
+        try:
+            acertos = 0
+            for _ in range(vezes):
+                acertos += bool(operacao(sessao))
+                sessao.commit()
+            return acertos
+        finally:
+            sessao.close()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return sum(executor.map(executar, range(threads)))
+
+def test_debitar_saldo_concorrente(db, cadastros):
+    conta_id = cadastros["conta_id"]
+    # 200 tentativas de 30,00 sobre 1000,00: só 33 cabem, e o saldo nunca fica negativo
+    assert em_paralelo(lambda sessao: saldos.debitar_saldo(sessao, conta_id, 30.0)) == 33
+    assert saldos.saldo_atual(db, conta_id) == pytest.approx(10.0)
+
+def test_ajustar_saldo_concorrente(db, cadastros):
+    conta_id = cadastros["conta_id"]
+    # Nenhum incremento se perde entre leituras e gravações concorrentes
+    assert em_paralelo(lambda sessao: saldos.ajustar_saldo(sessao, conta_id, 1.5)) == 200
+    assert saldos.saldo_atual(db, conta_id) == pytest.approx(1300.0)
+
+def test_debitar_saldo_recusa(db, cadastros):
+    assert not saldos.debitar_saldo(db, cadastros["conta_id"], 1000.01)
+    assert not saldos.debitar_saldo(db, 999, 1.0)
+    assert not saldos.ajustar_saldo(db, 999, 1.0)
+    assert saldos.debitar_saldo(db, cadastros["conta_id"], 1000.0)
+    assert saldos.saldo_atual(db, cadastros["conta_id"]) == 0.0
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import time
+
+from backend import auth, workers
+
+def test_senha_no_pool_dedicado():
+    hash_ = auth.get_password_hash("segredo")
+
+    async def verificar():
+        return await workers.run_password_work(
+            lambda senha: (threading.current_thread().name, auth.verify_password(senha, hash_)), "segredo"
+        )
+    thread, valida = asyncio.run(verificar())
+    assert thread.startswith("senha")
+    assert valida
+
+def test_pool_limita_concorrencia():
+    ativos, pico = [0], [0]
+    trava = threading.Lock()
+
+    def trabalho():
+        with trava:
+            ativos[0] += 1
+            pico[0] = max(pico[0], ativos[0])
+        time.sleep(0.05)
+        with trava:
+            ativos[0] -= 1
+        return threading.current_thread().name
+
+    async def disparar():
+        return await asyncio.gather(*(workers.run_db_work(trabalho) for _ in range(workers.DB_WORKERS * 3)))
+    threads = asyncio.run(disparar())
+    assert all(nome.startswith("banco") for nome in threads)
+    assert pico[0] <= workers.DB_WORKERS
+
+def test_event_loop_livre_durante_trabalho_bloqueante():
+    async def cenario():
+        marcas = []
+
+        async def batimento():
+            for _ in range(5):
+                marcas.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+        # O sleep bloqueante roda no pool; o batimento continua no event loop
+        await asyncio.gather(workers.run_password_work(time.sleep, 0.2), batimento())
+        return marcas
+    marcas = asyncio.run(cenario())
+    assert len(marcas) == 5
+    assert marcas[-1] - marcas[0] < 0.2
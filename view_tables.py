@@ -3,48 +3,48 @@
 Script para visualizar estrutura das tabelas do banco de dados
 """
 
-import sqlite3
 import os
 from datetime import datetime
 
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend import database
+
 def conectar_banco():
-    """Conecta ao banco de dados"""
-    db_path = "./financeiro.db"
-    
-    if not os.path.exists(db_path):
-        print(f"❌ Banco de dados não encontrado em: {db_path}")
+    """Conecta ao banco de dados configurado em DATABASE_URL (SQLite por padrão)"""
+    url = database.engine.url
+    if database.E_SQLITE and url.database and not os.path.exists(url.database):
+        print(f"❌ Banco de dados não encontrado em: {url.database}")
         return None
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = database.engine.connect()
         return conn
-    except sqlite3.Error as e:
+    except SQLAlchemyError as e:
         print(f"❌ Erro ao conectar ao banco: {e}")
         return None
 
 def listar_tabelas(conn):
     """Lista todas as tabelas do banco"""
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
-        tabelas = cursor.fetchall()
-        return [tabela[0] for tabela in tabelas]
-    except sqlite3.Error as e:
+        return sorted(inspect(conn).get_table_names())
+    except SQLAlchemyError as e:
         print(f"❌ Erro ao listar tabelas: {e}")
         return []
 
 def mostrar_estrutura_tabela(conn, nome_tabela):
     """Mostra a estrutura de uma tabela específica"""
     try:
-        cursor = conn.cursor()
+        inspetor = inspect(conn)
         
         # Obter informações das colunas
-        cursor.execute(f"PRAGMA table_info({nome_tabela})")
-        colunas = cursor.fetchall()
+        colunas = inspetor.get_columns(nome_tabela)
+        chave_primaria = set(inspetor.get_pk_constraint(nome_tabela).get("constrained_columns") or [])
         
         # Contar registros
-        cursor.execute(f"SELECT COUNT(*) FROM {nome_tabela}")
-        total_registros = cursor.fetchone()[0]
+        tabela = conn.dialect.identifier_preparer.quote(nome_tabela)
+        total_registros = conn.execute(text(f"SELECT COUNT(*) FROM {tabela}")).scalar()
         
         print(f"\n📊 TABELA: {nome_tabela}")
         print(f"📋 Total de registros: {total_registros}")
@@ -53,32 +53,30 @@ def mostrar_estrutura_tabela(conn, nome_tabela):
         print("─" * 60)
         
         for coluna in colunas:
-            cid, nome, tipo, notnull, default, pk = coluna
-            null_str = "NÃO" if notnull else "SIM"
-            pk_str = "PK" if pk else ""
-            print(f"{nome:<25} {tipo:<15} {null_str:<8} {pk_str:<8}")
+            null_str = "SIM" if coluna["nullable"] else "NÃO"
+            pk_str = "PK" if coluna["name"] in chave_primaria else ""
+            print(f"{coluna['name']:<25} {str(coluna['type']):<15} {null_str:<8} {pk_str:<8}")
         
         return True
         
-    except sqlite3.Error as e:
+    except SQLAlchemyError as e:
         print(f"❌ Erro ao mostrar estrutura da tabela {nome_tabela}: {e}")
         return False
 
 def mostrar_dados_exemplo(conn, nome_tabela, limite=3):
     """Mostra alguns registros de exemplo de uma tabela"""
     try:
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT * FROM {nome_tabela} LIMIT {limite}")
-        registros = cursor.fetchall()
+        tabela = conn.dialect.identifier_preparer.quote(nome_tabela)
+        registros = conn.execute(text(f"SELECT * FROM {tabela} LIMIT {int(limite)}")).all()
         
         if registros:
             print(f"\n📝 Exemplos de dados (primeiros {len(registros)} registros):")
             for i, registro in enumerate(registros, 1):
-                print(f"   {i}. {registro}")
+                print(f"   {i}. {tuple(registro)}")
         else:
             print("\n📝 Nenhum dado encontrado na tabela.")
             
-    except sqlite3.Error as e:
+    except SQLAlchemyError as e:
         print(f"❌ Erro ao mostrar dados de exemplo: {e}")
 
 def main():